@@ -2,4 +2,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eswasthya.settings')
-application = get_asgi_application() 
\ No newline at end of file
+# Run under an ASGI server (e.g. ``uvicorn eswasthya.asgi:application``) so
+# streamed chat replies share one event loop instead of pinning a worker
+# thread per open connection.
+django_application = get_asgi_application()
+
+# Emergency alert event streams are served ahead of Django, without a
+# worker thread each, so a process can hold thousands of idle ones. Imported
+# here because it needs the app registry loaded above.
+from main.alert_events import AlertEventsApp
+
+application = AlertEventsApp(django_application)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables
 load_dotenv()
@@ -58,13 +59,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'eswasthya.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Database profile, chosen with DATABASE_PROFILE: 'sqlite' (default) or
+# 'postgres'. Either way connections are reused for DB_CONN_MAX_AGE seconds
+# and health-checked before reuse instead of opened per request
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Applied to every new SQLite connection (main/sqlite_backend). WAL lets
+# readers run alongside the writer; busy_timeout makes writers queue for the
+# lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '20000')),
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
 }
 
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'eswasthya'),
+            'USER': os.getenv('POSTGRES_USER', 'eswasthya'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Behind PgBouncer in transaction mode server-side cursors break
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv('POSTGRES_TRANSACTION_POOLING', 'false').lower() == 'true',
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'main.sqlite_backend',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': '; '.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Take the write lock at BEGIN: a deferred transaction that
+                # reads before writing cannot wait for the lock and fails at once
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}, expected 'sqlite' or 'postgres'")
+
+# One cache shared by every worker process when REDIS_URL is set (needs
+# the redis package); otherwise Django's per-process memory cache
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,4 +158,183 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Google Generative AI settings
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '') 
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
+# System instructions need a Gemini 1.5 (or later) model
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+
+# Chat pipeline: 'sequential' runs the symptom check before the assistant
+# reply, 'concurrent' overlaps them, 'merged' gets both from one model call
+CHAT_MODE = os.getenv('CHAT_MODE', 'concurrent')
+CHAT_EXECUTOR_WORKERS = int(os.getenv('CHAT_EXECUTOR_WORKERS', '8'))
+
+# Per-user conversation history: turns beyond HISTORY_TOKENS are folded into
+# a summary, and sessions idle for IDLE_TIMEOUT seconds are dropped. The
+# history lives in each worker process's memory (see main/chat_sessions.py).
+CHAT_SESSIONS = {
+    'HISTORY_TOKENS': int(os.getenv('CHAT_HISTORY_TOKENS', '1500')),
+    'SUMMARY_CHARS': 600,
+    'IDLE_TIMEOUT': int(os.getenv('CHAT_SESSION_IDLE_TIMEOUT', '1800')),
+    'MAX_SESSIONS': int(os.getenv('CHAT_MAX_SESSIONS', '5000')),
+}
+
+# Cache of model replies keyed on the normalized message, prompt and model.
+# BACKEND is 'local' (per process), 'django' (the CACHES alias below) or 'none'.
+AI_RESPONSE_CACHE = {
+    'BACKEND': os.getenv('AI_CACHE_BACKEND', 'local'),
+    'TTL': int(os.getenv('AI_CACHE_TTL', '3600')),
+    'MAX_ENTRIES': int(os.getenv('AI_CACHE_MAX_ENTRIES', '2048')),
+    'CACHE_ALIAS': 'default',
+}
+
+# Near-duplicate lookup for context-free chat replies: a question whose
+# local embedding scores at least THRESHOLD (cosine) against an answered
+# one reuses that answer, until it is older than AI_RESPONSE_CACHE['TTL'].
+# ENABLED turns it off (AI_SEMANTIC_CACHE=false), as the chat benches do.
+AI_SEMANTIC_CACHE = {
+    'ENABLED': os.getenv('AI_SEMANTIC_CACHE', 'true').lower() == 'true',
+    'THRESHOLD': float(os.getenv('AI_SEMANTIC_CACHE_THRESHOLD', '0.75')),
+    'DIMENSIONS': 256,
+    'MAX_ENTRIES': int(os.getenv('AI_SEMANTIC_CACHE_MAX_ENTRIES', '10000')),
+}
+
+# Uploaded reports are hashed and streamed to storage in CHUNK_SIZE pieces;
+# files over MAX_SIZE bytes are rejected while the request is still arriving
+REPORT_UPLOADS = {
+    'MAX_SIZE': int(os.getenv('REPORT_UPLOAD_MAX_SIZE', str(20 * 1024 * 1024))),
+    'CHUNK_SIZE': 64 * 1024,
+}
+
+# Text extraction for report analysis. Pages are extracted on a pool of
+# WORKERS processes (0 extracts inline); pages with fewer than
+# MIN_TEXT_CHARS characters of embedded text are OCRed with Tesseract
+REPORT_EXTRACTION = {
+    'WORKERS': int(os.getenv('REPORT_EXTRACTION_WORKERS', str(os.cpu_count() or 1))),
+    'OCR_LANG': os.getenv('REPORT_OCR_LANG', 'eng'),
+    'MIN_TEXT_CHARS': 20,
+    'PAGE_TIMEOUT': 120,
+}
+
+# WebP thumbnails/previews of uploaded reports: longest side in pixels per
+# size, served with a CACHE_MAX_AGE seconds Cache-Control header
+REPORT_PREVIEWS = {
+    'SIZES': {'thumbnail': 256, 'preview': 1024},
+    'QUALITY': 80,
+    'CACHE_MAX_AGE': 60 * 60 * 24 * 365,
+}
+
+# Reports with at least MIN_VALUES recognized lab values are analyzed
+# locally (main/lab_values.py); others go to the model when MODEL_FALLBACK
+LAB_EXTRACTION = {
+    'MIN_VALUES': 3,
+    'MODEL_FALLBACK': os.getenv('REPORT_MODEL_FALLBACK', 'true').lower() == 'true',
+    'MODEL_MAX_CHARS': 12000,
+}
+
+# Report search (main/report_search.py) ranks at most a user's
+# MAX_CANDIDATES most recent matches, keeping latency bounded for users
+# with very many reports
+REPORT_SEARCH = {
+    'MAX_CANDIDATES': int(os.getenv('REPORT_SEARCH_MAX_CANDIDATES', '2000')),
+}
+
+# Nearby hospital search (see main/hospital_index.py). Every process keeps
+# the hospitals' coordinates in memory in CELL_DEGREES grid cells and
+# reloads them after MAX_AGE seconds.
+HOSPITAL_SEARCH = {
+    'CELL_DEGREES': float(os.getenv('HOSPITAL_SEARCH_CELL_DEGREES', '0.1')),
+    'MAX_AGE': int(os.getenv('HOSPITAL_SEARCH_MAX_AGE', '3600')),
+    'MAX_RESULTS': 50,
+}
+
+# Batch anchoring of report hashes on chain (see main/report_anchoring.py).
+# Run ``manage.py anchor_reports``; each run anchors the reports uploaded
+# before the current WINDOW (seconds) as Merkle roots of at most MAX_LEAVES.
+# The Web3Anchor backend is EXPERIMENTAL: it and the anchorRoot Truffle
+# tests have not been run against a node yet, so try it on anvil or Ganache
+# before pointing it at a real chain.
+REPORT_ANCHORING = {
+    'WINDOW': int(os.getenv('REPORT_ANCHOR_WINDOW', '600')),
+    'MAX_LEAVES': 100000,
+    'BACKEND': os.getenv('REPORT_ANCHOR_BACKEND', 'main.report_anchoring.Web3Anchor'),
+    'OPTIONS': {
+        'rpc_url': os.getenv('ETHEREUM_RPC_URL', 'http://127.0.0.1:8545'),
+        'contract_address': os.getenv('MEDICAL_RECORD_ADDRESS', ''),
+        'private_key': os.getenv('ETHEREUM_PRIVATE_KEY', ''),
+        'chain_id': int(os.getenv('ETHEREUM_CHAIN_ID', '1337')),
+        'receipt_timeout': 120,
+    },
+}
+
+# Report analysis queue (see main/analysis_queue.py). Run the workers with
+# ``manage.py run_analysis_worker``; EAGER analyzes inside the upload request.
+REPORT_ANALYSIS_QUEUE = {
+    'CONCURRENCY': int(os.getenv('ANALYSIS_WORKERS', '2')),
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 30,
+    'LEASE_SECONDS': 600,
+    'POLL_INTERVAL': 1.0,
+    'EAGER': os.getenv('ANALYSIS_EAGER', 'false').lower() == 'true',
+}
+
+# Emergency alert fan-out (see main/alert_fanout.py). Every channel is tried
+# ATTEMPTS times with a TIMEOUT per attempt, backing off RETRY_BACKOFF
+# seconds (doubled each retry). SLO_SECONDS is the time-to-all-notified
+# target reported on /metrics/. EAGER delivers inside the request.
+# Contact lists are cached in CACHE_ALIAS, if it is shared between processes
+# (see CACHES), and rebuilt on every change.
+# Repeated triggers of the same alert type within DEDUP_WINDOW seconds,
+# and retries carrying an Idempotency-Key seen in the last IDEMPOTENCY_TTL
+# seconds, return the original alert (see main/alert_dedup.py). With
+# several processes use a shared cache (Redis, Memcached) for both.
+EMERGENCY_ALERTS = {
+    'WORKERS': int(os.getenv('EMERGENCY_WORKERS', '4')),
+    'CACHE_ALIAS': 'default',
+    'CONTACTS_CACHE_TTL': int(os.getenv('EMERGENCY_CONTACTS_CACHE_TTL', '300')),
+    'DEDUP_WINDOW': int(os.getenv('EMERGENCY_DEDUP_WINDOW', '60')),
+    'IDEMPOTENCY_TTL': int(os.getenv('EMERGENCY_IDEMPOTENCY_TTL', '86400')),
+    'MAX_CONCURRENCY': 50,
+    'RETRY_BACKOFF': 0.5,
+    'SLO_SECONDS': 30,
+    # Alerts still not final after this many seconds are resent by
+    # ``manage.py recover_emergency_alerts``
+    'RECOVER_AFTER': int(os.getenv('EMERGENCY_RECOVER_AFTER', '120')),
+    'EAGER': os.getenv('EMERGENCY_EAGER', 'false').lower() == 'true',
+    # Status pushed to /emergency-alerts/<id>/events/ (see main/alert_events.py);
+    # HEARTBEAT keeps idle streams open through proxies
+    'EVENTS': {
+        'BACKEND': os.getenv('EMERGENCY_EVENTS_BACKEND', 'main.alert_events.InProcessBroker'),
+        'OPTIONS': {'max_subscribers': int(os.getenv('EMERGENCY_EVENTS_MAX_SUBSCRIBERS', '10000'))},
+        'HEARTBEAT': 15,
+    },
+    # SMS deliveries fail until SMS_GATEWAY_URL is set, and email goes through
+    # Django's EMAIL_BACKEND. StubChannel only records messages in memory and
+    # is for tests and benches.
+    'CHANNELS': {
+        'sms': {
+            'BACKEND': os.getenv('EMERGENCY_SMS_BACKEND', 'main.alert_fanout.SmsChannel'),
+            'TIMEOUT': 5,
+            'ATTEMPTS': 3,
+            'OPTIONS': {
+                'URL': os.getenv('SMS_GATEWAY_URL', ''),
+                'API_KEY': os.getenv('SMS_GATEWAY_API_KEY', ''),
+                'SENDER': os.getenv('SMS_SENDER', 'ESWASTHYA'),
+                'CONTACT_FIELD': 'phone_number',
+            },
+        },
+        'email': {
+            'BACKEND': os.getenv('EMERGENCY_EMAIL_BACKEND', 'main.alert_fanout.EmailChannel'),
+            'TIMEOUT': 10,
+            'ATTEMPTS': 3,
+            'OPTIONS': {'CONTACT_FIELD': 'email'},
+        },
+    },
+}
+
+# Also post every alert to a dispatcher webhook when one is configured
+if os.getenv('EMERGENCY_WEBHOOK_URL'):
+    EMERGENCY_ALERTS['CHANNELS']['webhook'] = {
+        'BACKEND': 'main.alert_fanout.WebhookChannel',
+        'TIMEOUT': 5,
+        'ATTEMPTS': 3,
+        'OPTIONS': {'URL': os.getenv('EMERGENCY_WEBHOOK_URL')},
+    }
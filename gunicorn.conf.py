@@ -0,0 +1,12 @@
+# gunicorn -c gunicorn.conf.py eswasthya.wsgi
+# (or -k uvicorn.workers.UvicornWorker with eswasthya.asgi for streamed chat)
+
+
+def post_worker_init(worker):
+    # Build the Gemini clients in each worker after the fork instead of
+    # sharing the master's, so the first chat request does not pay for it
+    from main.ai_clients import warm_clients
+    try:
+        warm_clients()
+    except Exception as e:
+        worker.log.warning(f"Could not warm AI clients: {e}")
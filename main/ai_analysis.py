@@ -1,39 +1,109 @@
-import os
+import json
+import logging
+from django.conf import settings
+from .ai_clients import get_model
+from .ai_handler import strip_json_fence
+from .lab_values import build_lab_analysis, flag_values, parse_lab_values
+from .report_extraction import extract_report
+from . import metrics
 
-def analyze_medical_report(file_path):
-    """
-    Provide static analysis results for medical reports
-    """
-    try:
-        # Static analysis results
-        analysis_text = """Analysis Results:
+logger = logging.getLogger(__name__)
 
-1. Your overall health indicators are within normal range
-2. Blood pressure and heart rate are stable
-3. No significant abnormalities detected"""
-
-        health_tips = """1. Maintain a balanced diet with plenty of fruits and vegetables
+HEALTH_TIPS = """1. Maintain a balanced diet with plenty of fruits and vegetables
 2. Exercise regularly (30 minutes daily)
 3. Get 7-8 hours of sleep each night
 4. Stay hydrated (8 glasses of water daily)
 5. Practice stress management techniques"""
 
-        yoga_suggestions = """1. Start with Surya Namaskar (Sun Salutation) - 5 rounds daily
+GENERAL_TIPS = [line.split('. ', 1)[1] for line in HEALTH_TIPS.splitlines()]
+
+REPORT_ANALYSIS_PROMPT = """You are a medical report analysis assistant. You are given the text
+extracted from a patient's medical report. Explain the findings in simple
+language, point out anything outside normal ranges and suggest lifestyle
+steps.
+
+Format your response as a JSON with the following structure:
+{
+    "analysis_text": "...",
+    "health_tips": "1. ...\n2. ...",
+    "yoga_suggestions": "1. ...\n2. ..."
+}
+
+Do not make definitive diagnoses and always advise consulting a doctor.
+"""
+
+YOGA_SUGGESTIONS = """1. Start with Surya Namaskar (Sun Salutation) - 5 rounds daily
 2. Practice Pranayama (Breathing exercises) - 10 minutes
 3. Include gentle stretches in your morning routine
 4. Try meditation for 15 minutes daily
 5. End your day with relaxation poses"""
 
+
+def analyze_medical_report(file_path):
+    """
+    Extract the text of a medical report (text layer or OCR, page by page)
+    and build the analysis results from it
+    """
+    extraction = extract_report(file_path)
+    pages = extraction['pages']
+    failed = [page for page in pages if page['error']]
+    if len(failed) == len(pages):
+        # Nothing could be read, let the queue retry the job
+        raise RuntimeError(f"Could not extract text from the report: {failed[0]['error']}")
+
+    logger.info(
+        f"Extracted {len(pages)} page(s) of {file_path} in {extraction['seconds']:.2f}s: "
+        + ', '.join(f"p{page['page'] + 1} {page['method']} {page['seconds']:.2f}s" for page in pages)
+    )
+
+    text = extraction['text']
+    if not text:
+        metrics.increment('report_analysis.unreadable')
+        return {
+            'analysis_text': """Analysis Results:
+
+No readable text was found in your report. Please upload a clearer scan.""",
+            'health_tips': HEALTH_TIPS,
+            'yoga_suggestions': YOGA_SUGGESTIONS,
+            'source': 'unreadable',
+            'extraction': extraction
+        }
+
+    # Standard lab panels are analyzed locally; anything else goes to the model
+    lab_values = parse_lab_values(text)
+    if len(lab_values) >= settings.LAB_EXTRACTION['MIN_VALUES'] or not settings.LAB_EXTRACTION['MODEL_FALLBACK']:
+        metrics.increment('report_analysis.local')
+        if lab_values:
+            analysis_text, health_tips = build_lab_analysis(flag_values(lab_values), GENERAL_TIPS)
+        else:
+            analysis_text = f"""Analysis Results:
+
+Text found in your report ({len(pages)} page(s)):
+
+{text}"""
+            health_tips = HEALTH_TIPS
         return {
             'analysis_text': analysis_text,
             'health_tips': health_tips,
-            'yoga_suggestions': yoga_suggestions
+            'yoga_suggestions': YOGA_SUGGESTIONS,
+            'source': 'local',
+            'extraction': extraction
         }
-        
-    except Exception as e:
-        print(f"Error in analysis: {str(e)}")
-        return {
-            'analysis_text': "Error analyzing the report. Please try again.",
-            'health_tips': "Unable to generate health tips at this time.",
-            'yoga_suggestions': "Unable to generate yoga suggestions at this time."
-        } 
\ No newline at end of file
+
+    metrics.increment('report_analysis.model')
+    result = analyze_with_model(text)
+    result['source'] = 'model'
+    result['extraction'] = extraction
+    return result
+
+
+def analyze_with_model(text):
+    model = get_model(REPORT_ANALYSIS_PROMPT)
+    # Keep the prompt bounded for very long reports
+    response = model.generate_content(f"Medical report text:\n{text[:settings.LAB_EXTRACTION['MODEL_MAX_CHARS']]}")
+    analysis = json.loads(strip_json_fence(response.text))
+    return {
+        'analysis_text': analysis.get('analysis_text') or 'Analysis Results:\n\nNo findings were returned.',
+        'health_tips': analysis.get('health_tips') or HEALTH_TIPS,
+        'yoga_suggestions': analysis.get('yoga_suggestions') or YOGA_SUGGESTIONS
+    }
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from . import metrics
+
+# Sentinel for a cache miss, so a cached falsy value is still a hit
+MISS = object()
+
+
+def normalize_message(message):
+    """Case-fold and collapse whitespace so trivial variants share an entry."""
+    return ' '.join((message or '').casefold().split()).rstrip('?!. ')
+
+
+def make_key(namespace, message, system_prompt, model_name, context=None):
+    payload = json.dumps(
+        [namespace, normalize_message(message), system_prompt, model_name, context],
+        sort_keys=True,
+        default=str
+    )
+    return f"ai:{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class LocalBackend:
+    """In-process store with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Store entries in a Django cache so worker processes can share them."""
+
+    def __init__(self, alias):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key, MISS)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class NullBackend:
+    def get(self, key):
+        return MISS
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    def __init__(self, backend='local', ttl=3600, max_entries=2048, cache_alias='default'):
+        if backend == 'local':
+            self.backend = LocalBackend(max_entries)
+        elif backend == 'django':
+            self.backend = DjangoCacheBackend(cache_alias)
+        elif backend == 'none':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown AI cache backend: {backend}")
+        self.enabled = backend != 'none'
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        if not self.enabled:
+            return MISS
+        value = self.backend.get(key)
+        namespace = key.split(':')[1]
+        with self._stats_lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.increment(f"ai_cache.{namespace}.{'miss' if value is MISS else 'hit'}")
+        return value
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value, self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide cache configured by ``AI_RESPONSE_CACHE``."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                config = settings.AI_RESPONSE_CACHE
+                _response_cache = ResponseCache(
+                    backend=config['BACKEND'],
+                    ttl=config['TTL'],
+                    max_entries=config['MAX_ENTRIES'],
+                    cache_alias=config['CACHE_ALIAS']
+                )
+    return _response_cache
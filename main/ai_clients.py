@@ -0,0 +1,83 @@
+"""
+Per-process registry of the Gemini-backed handlers.
+
+Nothing here touches ``google.generativeai`` until a handler is first
+requested, so ``manage.py`` commands and worker boot stay fast. Clients are
+never shared across ``fork()``: the registry is cleared in the child, and
+``warm_clients()`` can be called from a post-fork hook to build them ahead
+of the first request.
+"""
+import logging
+import os
+import threading
+from django.conf import settings
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_clients = {}
+_pid = os.getpid()
+
+
+def reset_clients():
+    """Forget every client built in this process."""
+    global _lock, _pid
+    # The lock may have been held by another thread at fork time
+    _lock = threading.RLock()
+    _clients.clear()
+    _pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_clients)
+
+
+def _get_or_create(name, factory):
+    if _pid != os.getpid():
+        reset_clients()
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def _build_model(system_instruction=None):
+    import google.generativeai as genai
+
+    load_dotenv()
+    api_key = os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        logger.error("Google API key not found in environment variables")
+        raise ValueError("Google API key not found")
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(settings.GEMINI_MODEL, system_instruction=system_instruction)
+
+
+def get_model(system_instruction=None):
+    """
+    Return the model for ``system_instruction``, so each prompt is set once
+    on the model rather than sent inside every message.
+    """
+    return _get_or_create(('model', system_instruction), lambda: _build_model(system_instruction))
+
+
+def get_ai_handler():
+    from .ai_handler import AIHandler
+    return _get_or_create('ai_handler', AIHandler)
+
+
+def get_symptom_checker():
+    from .symptom_checker import SymptomChecker
+    return _get_or_create('symptom_checker', SymptomChecker)
+
+
+def warm_clients():
+    """Build every client now, e.g. from a post-fork worker hook."""
+    get_ai_handler()
+    get_symptom_checker()
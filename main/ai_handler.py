@@ -1,22 +1,15 @@
-import google.generativeai as genai
-import os
 import json
 import logging
-from dotenv import load_dotenv
+from .ai_clients import get_model
+from .ai_cache import MISS, get_response_cache, make_key
+from .semantic_cache import get_semantic_cache
+from .chat_sessions import estimate_tokens, get_session_store
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
 class AIHandler:
-    def __init__(self):
-        load_dotenv()
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            logger.error("Google API key not found in environment variables")
-            raise ValueError("Google API key not found")
-            
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        
+    def __init__(self, model=None, cache=None, semantic_cache=None, sessions=None):
         self.system_prompt = """You are an AI Health Assistant for the E-Swasthya+ platform. Your role is to provide information about our healthcare services and features:
 
 1. Medical Records Management:
@@ -51,8 +44,17 @@ Important guidelines:
 - Direct users to appropriate sections of the platform
 - Recommend using emergency features when appropriate
 """
+        self.system_tokens = estimate_tokens(self.system_prompt)
 
-    def get_response(self, user_message, symptom_context=None):
+        if model is None:
+            model = get_model(self.system_prompt)
+        self.model = model
+        self.model_name = getattr(model, 'model_name', type(model).__name__)
+        self.cache = cache if cache is not None else get_response_cache()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else get_semantic_cache()
+        self.sessions = sessions if sessions is not None else get_session_store()
+
+    def get_response(self, user_message, symptom_context=None, session_id=None):
         try:
             if not user_message:
                 return {
@@ -60,16 +62,21 @@ Important guidelines:
                     'response': 'Empty message provided'
                 }
 
-            # Prepare the conversation
-            conversation = self.model.start_chat(history=[])
-            
-            # Build the prompt
-            prompt = f"{self.system_prompt}\n\n"
-            
-            if symptom_context and isinstance(symptom_context, dict):
-                prompt += f"Context from symptom analysis:\n{json.dumps(symptom_context, indent=2)}\n\n"
-                
-            prompt += f"User question about E-Swasthya+: {user_message}\n\nProvide a helpful response focusing on our platform's features and services."
+            # Continue the user's conversation
+            history, usage = self.session_history(session_id)
+
+            # Answer repeated opening questions without a model call
+            cache_key = self.cache_key(user_message, symptom_context)
+            cached = self.lookup_cached(cache_key, user_message, symptom_context, history)
+            if cached is not MISS:
+                self.remember_turn(session_id, user_message, cached)
+                return {
+                    'status': 'success',
+                    'response': cached
+                }
+
+            conversation = self.model.start_chat(history=history)
+            prompt = self.build_prompt(user_message, symptom_context)
             
             # Get response from model
             response = conversation.send_message(prompt)
@@ -81,9 +88,12 @@ Important guidelines:
                     'response': 'Failed to generate response'
                 }
                 
+            self.store_cached(cache_key, user_message, symptom_context, response.text, history)
+            self.remember_turn(session_id, user_message, response.text)
             return {
                 'status': 'success',
-                'response': response.text
+                'response': response.text,
+                'usage': self.record_usage(prompt, usage, response)
             }
             
         except Exception as e:
@@ -93,5 +103,175 @@ Important guidelines:
                 'response': f'Failed to process message: {str(e)}'
             }
 
-# Initialize the AI handler
-ai_handler = AIHandler() 
\ No newline at end of file
+    def cache_key(self, user_message, symptom_context=None):
+        if not isinstance(symptom_context, dict):
+            symptom_context = None
+        return make_key('reply', user_message, self.system_prompt, self.model_name, symptom_context)
+
+    def lookup_cached(self, cache_key, user_message, symptom_context=None, history=None):
+        # A reply that follows earlier turns depends on that user's
+        # conversation, which the key does not cover
+        if history:
+            return MISS
+        cached = self.cache.get(cache_key)
+        # Replies that depend on a symptom analysis are never shared
+        # between paraphrases
+        if cached is MISS and self.semantic_cache is not None and not symptom_context:
+            answer = self.semantic_cache.lookup(user_message)
+            if answer is not None:
+                cached = answer
+        return cached
+
+    def store_cached(self, cache_key, user_message, symptom_context, text, history=None):
+        if history:
+            return
+        self.cache.set(cache_key, text)
+        if self.semantic_cache is not None and not symptom_context:
+            self.semantic_cache.add(user_message, text)
+
+    def session_history(self, session_id):
+        if session_id is None:
+            return [], {'history_tokens': 0, 'full_history_tokens': 0, 'turns': 0}
+        return self.sessions.history(session_id)
+
+    def remember_turn(self, session_id, user_message, reply):
+        if session_id is not None:
+            self.sessions.record(session_id, user_message, reply)
+
+    def record_usage(self, prompt, usage, response=None):
+        """
+        Count the prompt tokens sent for one request and those saved against
+        a chat that kept every turn and repeated the system prompt inside
+        each user message.
+        """
+        sent = self.system_tokens + usage['history_tokens'] + estimate_tokens(prompt)
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        sent = getattr(usage_metadata, 'prompt_token_count', None) or sent
+        saved = (
+            self.system_tokens * usage['turns']
+            + usage['full_history_tokens'] - usage['history_tokens']
+        )
+
+        metrics.increment('chat.requests')
+        metrics.increment('chat.prompt_tokens_sent', sent)
+        metrics.increment('chat.prompt_tokens_saved', saved)
+        logger.debug(f"Chat prompt tokens sent={sent} saved={saved}")
+        return {'prompt_tokens': sent, 'prompt_tokens_saved': saved}
+
+    def build_prompt(self, user_message, symptom_context=None):
+        # The system prompt is the model's system instruction
+        prompt = ""
+        
+        if symptom_context and isinstance(symptom_context, dict):
+            prompt += f"Context from symptom analysis:\n{json.dumps(symptom_context, indent=2)}\n\n"
+            
+        prompt += f"User question about E-Swasthya+: {user_message}\n\nProvide a helpful response focusing on our platform's features and services."
+        return prompt
+
+    async def aget_response(self, user_message, symptom_context=None, session_id=None):
+        """Async counterpart of ``get_response`` for ASGI views."""
+        chunks = []
+        try:
+            async for chunk in self.astream_response(user_message, symptom_context, session_id):
+                chunks.append(chunk)
+        except Exception as e:
+            logger.error(f"AI handler error: {str(e)}")
+            return {
+                'status': 'error',
+                'response': f'Failed to process message: {str(e)}'
+            }
+
+        if not chunks:
+            logger.error("Empty response from AI model")
+            return {
+                'status': 'error',
+                'response': 'Failed to generate response'
+            }
+
+        return {
+            'status': 'success',
+            'response': ''.join(chunks)
+        }
+
+    async def astream_response(self, user_message, symptom_context=None, session_id=None):
+        """
+        Yield the reply text chunk by chunk as the model produces it.
+
+        Errors are raised to the caller, which owns the open stream.
+        """
+        if not user_message:
+            raise ValueError('Empty message provided')
+
+        history, usage = self.session_history(session_id)
+        cache_key = self.cache_key(user_message, symptom_context)
+        cached = self.lookup_cached(cache_key, user_message, symptom_context, history)
+        if cached is not MISS:
+            self.remember_turn(session_id, user_message, cached)
+            yield cached
+            return
+
+        conversation = self.model.start_chat(history=history)
+        prompt = self.build_prompt(user_message, symptom_context)
+        response = await conversation.send_message_async(prompt, stream=True)
+        chunks = []
+        async for chunk in response:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+
+        if chunks:
+            reply = ''.join(chunks)
+            self.store_cached(cache_key, user_message, symptom_context, reply, history)
+            self.remember_turn(session_id, user_message, reply)
+            self.record_usage(prompt, usage, response)
+
+    def get_merged_response(self, user_message, symptom_checker):
+        """
+        Answer the user and analyze symptoms with a single model call.
+
+        Returns a ``(symptom_result, ai_response)`` pair shaped like the
+        results of ``symptom_checker.check_symptoms`` and ``get_response``.
+        """
+        if not user_message:
+            return (
+                {'status': 'error', 'message': 'Empty message provided'},
+                {'status': 'error', 'response': 'Empty message provided'}
+            )
+
+        try:
+            conversation = self.model.start_chat(history=[])
+
+            prompt = f"Symptom analysis instructions:\n{symptom_checker.system_prompt}\n\n"
+            prompt += (
+                "Reply with a single JSON object and nothing else, with two keys:\n"
+                "\"response\": your answer to the user about E-Swasthya+ as plain text,\n"
+                "\"symptom_analysis\": the symptom analysis object described above.\n\n"
+                f"User message: {user_message}"
+            )
+
+            response = conversation.send_message(prompt)
+            combined = json.loads(strip_json_fence(response.text))
+            answer = combined.get('response') if isinstance(combined, dict) else None
+            if not answer:
+                logger.error(f"Merged response missing answer: {response.text}")
+                raise ValueError('Invalid merged response format from AI')
+
+        except Exception as e:
+            logger.error(f"AI handler merged error: {str(e)}")
+            return (
+                {'status': 'error', 'message': f'Failed to analyze symptoms: {str(e)}'},
+                {'status': 'error', 'response': f'Failed to process message: {str(e)}'}
+            )
+
+        symptom_result = symptom_checker.validate_analysis(combined.get('symptom_analysis'))
+        return symptom_result, {'status': 'success', 'response': answer}
+
+
+def strip_json_fence(text):
+    """Remove the markdown code fence Gemini often wraps around JSON."""
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+    return text.strip()
@@ -0,0 +1,108 @@
+"""
+De-duplication of emergency triggers.
+
+A trigger reserves up to two cache keys before it writes anything: one
+for the client's ``Idempotency-Key`` (kept ``IDEMPOTENCY_TTL`` seconds) and
+one for the user and alert type (kept ``DEDUP_WINDOW`` seconds). Once the
+alert exists the keys hold its id, so a retried POST or a repeated press
+of the SOS button gets the original alert back from the cache alone and
+no contact is notified twice.
+
+Reservations use ``cache.add()``, which is atomic in every Django cache
+backend, so only one of several simultaneous presses creates an alert. A
+reservation lives ``PENDING_TTL`` seconds, so a worker dying before its
+alert exists blocks retries only briefly; the full timeouts apply once the
+alert id is stored. An alert nobody could be told about releases its keys,
+so pressing SOS again after adding a contact notifies them; one whose
+deliveries all failed releases the user and type key, so pressing again
+retries (a retried Idempotency-Key still gets the original alert).
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+PENDING = 'pending'
+
+# How long a duplicate waits for the first request to create its alert
+PENDING_WAIT = 2.0
+
+# How long a reservation outlives a request that never stores its alert
+PENDING_TTL = 10
+
+MAX_KEY_LENGTH = 255
+
+
+class TriggerInProgress(Exception):
+    pass
+
+
+def get_cache():
+    return caches[settings.EMERGENCY_ALERTS['CACHE_ALIAS']]
+
+
+def dedup_key(user_id, alert_type):
+    return f'emergency_dedup:{user_id}:{alert_type}'
+
+
+def trigger_keys(user, alert_type, idempotency_key=None):
+    """Return the ``(cache_key, timeout)`` pairs a trigger must reserve."""
+    owner = user.id if user else 'anonymous'
+    keys = []
+    if idempotency_key:
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        keys.append((f'emergency_idempotency:{owner}:{digest}', settings.EMERGENCY_ALERTS['IDEMPOTENCY_TTL']))
+    # Anonymous presses can't be told apart, so they only dedupe by key
+    if user and settings.EMERGENCY_ALERTS['DEDUP_WINDOW'] > 0:
+        keys.append((dedup_key(owner, alert_type), settings.EMERGENCY_ALERTS['DEDUP_WINDOW']))
+    return keys
+
+
+def claim_trigger(keys):
+    """
+    Reserve every key and return None, or return the id of the alert
+    already holding one of them. Raises ``TriggerInProgress`` when that
+    alert is still being created after ``PENDING_WAIT`` seconds.
+    """
+    cache = get_cache()
+    deadline = time.monotonic() + PENDING_WAIT
+    while True:
+        claimed, held = [], None
+        for key, timeout in keys:
+            if not cache.add(key, PENDING, min(timeout, PENDING_TTL)):
+                held = key
+                break
+            claimed.append(key)
+        if held is None:
+            return None
+        cache.delete_many(claimed)
+
+        original = cache.get(held)
+        if original not in (None, PENDING):
+            return original
+        if time.monotonic() >= deadline:
+            raise TriggerInProgress('An identical alert is still being triggered')
+        # Either the first request hasn't saved its alert yet or it failed
+        # and released the key; look again shortly
+        time.sleep(0.01)
+
+
+def remember_trigger(keys, alert_id):
+    cache = get_cache()
+    for key, timeout in keys:
+        cache.set(key, alert_id, timeout)
+
+
+def release_trigger(keys):
+    get_cache().delete_many([key for key, _ in keys])
+
+
+def release_failed_alert(alert):
+    """Let the user's next press of the same alert type create a new alert."""
+    if alert.user_id is None:
+        return
+    cache = get_cache()
+    key = dedup_key(alert.user_id, alert.alert_type)
+    # Only while it still answers with this alert, not a newer one
+    if cache.get(key) == alert.id:
+        cache.delete(key)
@@ -0,0 +1,395 @@
+"""
+Push emergency alert status to subscribed clients.
+
+The fan-out publishes a snapshot of the alert (status and delivery
+counts) on every transition; ``/emergency-alerts/<id>/events/`` streams
+them as server-sent events instead of clients polling the database.
+
+Under ASGI that path is answered by ``AlertEventsApp`` (wrapped around
+Django in ``eswasthya/asgi.py``) straight on the event loop: Django's
+handler keeps a worker thread per open request, too much for thousands
+of idle streams. The Django view serves the same stream under WSGI.
+
+The default broker is in-process. A subscriber holds only the latest
+snapshot of its alert, never a backlog, so an idle or slow client costs
+a few hundred bytes however many transitions it misses, and the final
+status always arrives. Publishing is thread-safe: deliveries run on
+worker threads while subscribers wait on the ASGI event loop.
+
+With several processes the publisher and the subscriber may live in
+different ones. An ``AlertPoller`` thread per process therefore reads,
+every HEARTBEAT, the alerts this process has subscribers for in one query
+and publishes those that changed, so every stream still reaches the final
+status, only later. A stream authorizes its requester once, when it opens.
+For live updates across processes set
+``EMERGENCY_ALERTS['EVENTS']['BACKEND']`` to a broker backed by a shared
+message bus (e.g. Redis pub/sub) with the same ``subscribe``/
+``unsubscribe``/``publish``/``subscribed_alerts``/``stats`` methods.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from importlib import import_module
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.db import close_old_connections, connection
+from django.db.models import Count, Q
+from django.http import HttpRequest, parse_cookie
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+from .models import EmergencyAlert
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ('completed', 'partial', 'failed')
+
+# Session key listing the alerts an anonymous visitor raised, the only
+# anonymous alerts they can see
+ANONYMOUS_ALERTS_KEY = 'emergency_alerts'
+MAX_ANONYMOUS_ALERTS = 20
+
+_broker = None
+_broker_lock = threading.Lock()
+_poller = None
+_poller_lock = threading.Lock()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    __slots__ = ('alert_id', 'latest', 'unread', 'loop', 'ready')
+
+    def __init__(self, alert_id):
+        self.alert_id = alert_id
+        self.latest = None
+        self.unread = False
+        # Bound to the loop that waits, which under WSGI isn't the one
+        # that subscribed
+        self.loop = None
+        self.ready = None
+
+    def notify(self, snapshot):
+        # Called from any thread; a newer snapshot replaces an unread one
+        self.latest = snapshot
+        self.unread = True
+        loop, ready = self.loop, self.ready
+        if loop is not None:
+            loop.call_soon_threadsafe(ready.set)
+
+    async def next(self, timeout):
+        """Return the newest unread snapshot, or None after ``timeout`` seconds."""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.ready = asyncio.Event()
+            self.loop = loop
+        deadline = loop.time() + timeout
+        while not self.unread:
+            try:
+                await asyncio.wait_for(self.ready.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                return None
+            self.ready.clear()
+        self.unread = False
+        return self.latest
+
+
+class InProcessBroker:
+    def __init__(self, max_subscribers=10000):
+        self.max_subscribers = max_subscribers
+        self.subscribers = defaultdict(set)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, alert_id):
+        subscription = Subscription(alert_id)
+        with self.lock:
+            if self.count >= self.max_subscribers:
+                raise TooManySubscribers('Too many open alert streams')
+            self.subscribers[alert_id].add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.alert_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.alert_id]
+            self.count -= 1
+
+    def publish(self, alert_id, snapshot):
+        with self.lock:
+            subscribers = list(self.subscribers.get(alert_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.notify(snapshot)
+            except RuntimeError:
+                # Its event loop has shut down
+                self.unsubscribe(subscription)
+        metrics.increment('emergency.events.published')
+        return len(subscribers)
+
+    def subscribed_alerts(self):
+        """Ids of the alerts with a subscriber in this process."""
+        with self.lock:
+            return list(self.subscribers)
+
+    def stats(self):
+        with self.lock:
+            return {'subscribers': self.count, 'alerts': len(self.subscribers)}
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = settings.EMERGENCY_ALERTS['EVENTS']
+                _broker = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _broker
+
+
+class AlertPoller:
+    """
+    Publishes the database state of every alert that has subscribers in
+    this process, reading them all in one query per ``interval``. Only
+    alerts whose state changed since the last poll are published.
+    """
+
+    def __init__(self, broker, interval):
+        self.broker = broker
+        self.interval = interval
+        self.seen = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='alert-poller', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                close_old_connections()
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning(f"Polling alert status failed: {e}")
+        finally:
+            close_old_connections()
+
+    def poll(self):
+        """Publish the subscribed alerts that changed; returns how many."""
+        alert_ids = self.broker.subscribed_alerts()
+        # Forget alerts nobody follows any more
+        self.seen = {alert_id: self.seen[alert_id] for alert_id in alert_ids if alert_id in self.seen}
+        if not alert_ids:
+            return 0
+        alerts = EmergencyAlert.objects.filter(id__in=alert_ids).annotate(
+            pending=Count('deliveries', filter=Q(deliveries__status='pending')),
+            sent=Count('deliveries', filter=Q(deliveries__status='sent')),
+            failed=Count('deliveries', filter=Q(deliveries__status='failed')),
+        )
+        published = 0
+        for alert in alerts:
+            snapshot = snapshot_json(alert, {'pending': alert.pending, 'sent': alert.sent, 'failed': alert.failed})
+            if self.seen.get(alert.id) != snapshot:
+                self.seen[alert.id] = snapshot
+                self.broker.publish(alert.id, snapshot)
+                published += 1
+        return published
+
+
+def get_poller():
+    """The process-wide ``AlertPoller``, started on first use."""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = AlertPoller(get_broker(), settings.EMERGENCY_ALERTS['EVENTS']['HEARTBEAT'])
+    _poller.start()
+    return _poller
+
+
+def alert_snapshot(alert, deliveries):
+    """Status of ``alert`` given its ``AlertDelivery`` rows, as sent to clients."""
+    counts = {'pending': 0, 'sent': 0, 'failed': 0}
+    for delivery in deliveries:
+        counts[delivery.status] += 1
+    return snapshot_json(alert, counts)
+
+
+def snapshot_json(alert, counts):
+    return {
+        'alert_id': alert.id,
+        'status': alert.status,
+        'deliveries': sum(counts.values()),
+        'sent': counts['sent'],
+        'failed': counts['failed'],
+        'completed_at': alert.completed_at.isoformat() if alert.completed_at else None,
+    }
+
+
+def publish_alert(alert, deliveries=()):
+    get_broker().publish(alert.id, alert_snapshot(alert, deliveries))
+
+
+def remember_anonymous_alert(session, alert_id):
+    """Let the anonymous visitor holding ``session`` follow the alert they raised."""
+    alert_ids = session.get(ANONYMOUS_ALERTS_KEY, [])
+    session[ANONYMOUS_ALERTS_KEY] = (alert_ids + [alert_id])[-MAX_ANONYMOUS_ALERTS:]
+
+
+def visible_alerts(user, session):
+    """The alerts ``user``, or an anonymous visitor with ``session``, may see."""
+    if user is not None:
+        return EmergencyAlert.objects.filter(user=user)
+    alert_ids = session.get(ANONYMOUS_ALERTS_KEY, []) if session is not None else []
+    return EmergencyAlert.objects.filter(user=None, id__in=alert_ids)
+
+
+def load_snapshot(alert_id, user, session=None):
+    """The alert's current snapshot from the database, or None if the requester can't see it."""
+    alert = visible_alerts(user, session).filter(id=alert_id).first()
+    if alert is None:
+        return None
+    counts = alert.deliveries.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        sent=Count('id', filter=Q(status='sent')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    return snapshot_json(alert, counts)
+
+
+def status_event(snapshot):
+    return f"event: status\ndata: {json.dumps(snapshot)}\n\n"
+
+
+async def stream_alert_events(broker, subscription, snapshot):
+    """
+    Yield the alert's status as server-sent events until it is final. The
+    requester was authorized for ``snapshot``; updates come from the broker,
+    fed by the fan-out in this process and by the ``AlertPoller``.
+    """
+    try:
+        yield status_event(snapshot)
+        while snapshot['status'] not in FINAL_STATUSES:
+            update = await subscription.next(settings.EMERGENCY_ALERTS['EVENTS']['HEARTBEAT'])
+            if update is None:
+                # Keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            if update != snapshot:
+                snapshot = update
+                yield status_event(snapshot)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def load_session_snapshot(session_key, alert_id):
+    """``load_snapshot()`` for whoever is logged in to the session, if anyone."""
+    try:
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = auth.get_user(request)
+        return load_snapshot(alert_id, user if user.is_authenticated else None, request.session)
+    finally:
+        # Idle streams must not each hold a database connection
+        connection.close()
+
+
+class AlertEventsApp:
+    """ASGI middleware serving alert event streams without Django's handler."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            alert_id = self.alert_id(scope['path'])
+            if alert_id is not None:
+                return await self.stream(scope, receive, send, alert_id)
+        return await self.application(scope, receive, send)
+
+    def alert_id(self, path):
+        if not path.endswith('/events/'):
+            return None
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        return match.kwargs['alert_id'] if match.url_name == 'emergency_alert_events' else None
+
+    async def stream(self, scope, receive, send, alert_id):
+        cookies = parse_cookie(dict(scope['headers']).get(b'cookie', b'').decode('latin-1'))
+        broker = get_broker()
+        try:
+            # Subscribe before reading the current state so no change is missed
+            subscription = broker.subscribe(alert_id)
+        except TooManySubscribers as e:
+            return await self.respond(send, 503, {'status': 'error', 'message': str(e)})
+        try:
+            # Off Django's per-request thread, on the shared executor
+            snapshot = await sync_to_async(load_session_snapshot, thread_sensitive=False)(
+                cookies.get(settings.SESSION_COOKIE_NAME), alert_id
+            )
+        except Exception:
+            broker.unsubscribe(subscription)
+            raise
+        if snapshot is None:
+            broker.unsubscribe(subscription)
+            return await self.respond(send, 404, {'status': 'error', 'message': 'Alert not found'})
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stop nginx from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        get_poller()
+        events = stream_alert_events(broker, subscription, snapshot)
+        sending = asyncio.create_task(self.send_events(events, send))
+        disconnected = asyncio.create_task(self.wait_for_disconnect(receive))
+        try:
+            await asyncio.wait([sending, disconnected], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sending, disconnected):
+                task.cancel()
+            await asyncio.gather(sending, disconnected, return_exceptions=True)
+            await events.aclose()
+
+    async def send_events(self, events, send):
+        async for event in events:
+            await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def respond(self, send, status, data):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
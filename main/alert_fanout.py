@@ -0,0 +1,414 @@
+"""
+Emergency alert fan-out.
+
+Triggering an alert is a single INSERT: recipients come from the user's
+contact list, which is precomputed in the cache and rebuilt whenever a
+contact is added or deleted. The list is only cached in a cache every
+worker process shares; with a per-process one (the default LocMem) it is
+read from the database on every alert, so no worker alerts an outdated
+list. ``dispatch_alert()`` then records one
+``AlertDelivery`` per recipient and channel and sends them all
+concurrently with asyncio on a background thread (or inline when
+``EMERGENCY_ALERTS['EAGER']``). Each attempt is bounded by the channel's
+TIMEOUT and failed attempts are retried with exponential backoff, so one
+slow gateway never holds up the other recipients.
+
+Channels are configured in ``settings.EMERGENCY_ALERTS['CHANNELS']`` and
+loaded by dotted path; ``StubChannel`` keeps messages in memory for local
+runs, tests and benchmarks. Every status change is published to
+subscribed clients through ``main.alert_events``.
+
+Deliveries are planned on the background thread, so a worker that dies
+first leaves its alert without any. ``recover_alerts()`` (run by
+``manage.py recover_emergency_alerts``) plans and sends those, and
+finishes deliveries left pending, once an alert has waited RECOVER_AFTER
+seconds.
+"""
+import asyncio
+import logging
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .alert_dedup import release_failed_alert
+from .alert_events import FINAL_STATUSES, publish_alert
+from .health_summary import alert_added, alert_closed, alert_opened
+from .models import AlertDelivery, EmergencyAlert, EmergencyContact
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CONTACT_FIELDS = ('id', 'name', 'phone_number', 'email', 'relationship')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class DeliveryError(Exception):
+    pass
+
+
+class Channel:
+    """
+    A way of reaching recipients. Subclasses implement ``send()`` and raise
+    on failure; the fan-out handles timeouts and retries.
+    """
+    # EmergencyContact field holding the recipient's address; channels
+    # without one notify OPTIONS['URL'] once per alert
+    contact_field = None
+
+    def __init__(self, name, timeout=5, attempts=3, options=None):
+        self.name = name
+        self.timeout = timeout
+        self.attempts = attempts
+        self.options = options or {}
+
+    def configuration_error(self):
+        """Why this channel cannot send at all, or None."""
+        return None
+
+    def recipients(self, contacts):
+        """Return ``(contact_id, address)`` pairs this channel notifies."""
+        if self.contact_field is None:
+            return [(None, self.options['URL'])]
+        return [
+            (contact['id'], contact[self.contact_field])
+            for contact in contacts
+            if contact.get(self.contact_field)
+        ]
+
+    async def send(self, recipient, text, payload):
+        raise NotImplementedError
+
+
+class SmsChannel(Channel):
+    """POSTs ``{'to', 'message', 'sender'}`` to an HTTP SMS gateway."""
+    contact_field = 'phone_number'
+
+    def configuration_error(self):
+        return None if self.options.get('URL') else 'SMS gateway URL is not configured'
+
+    async def send(self, recipient, text, payload):
+        import requests
+
+        response = await asyncio.to_thread(
+            requests.post,
+            self.options['URL'],
+            json={'to': recipient, 'message': text, 'sender': self.options.get('SENDER', '')},
+            headers={'Authorization': f"Bearer {self.options.get('API_KEY', '')}"},
+            timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise DeliveryError(f"SMS gateway returned {response.status_code}")
+
+
+class EmailChannel(Channel):
+    """Sends through Django's configured email backend."""
+    contact_field = 'email'
+
+    async def send(self, recipient, text, payload):
+        from django.core.mail import send_mail
+
+        await asyncio.to_thread(
+            send_mail, f"Emergency alert: {payload['type_label']}", text, None, [recipient]
+        )
+
+
+class WebhookChannel(Channel):
+    """POSTs the alert as JSON to a dispatcher endpoint."""
+
+    async def send(self, recipient, text, payload):
+        import requests
+
+        response = await asyncio.to_thread(
+            requests.post, recipient, json=dict(payload, text=text), timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise DeliveryError(f"Webhook returned {response.status_code}")
+
+
+class StubChannel(Channel):
+    """
+    Appends messages to ``StubChannel.outbox`` after DELAY (+/- JITTER)
+    seconds, failing FAILURE_RATE of the attempts.
+    """
+    outbox = deque(maxlen=1000)
+
+    def __init__(self, name, timeout=5, attempts=3, options=None):
+        super().__init__(name, timeout, attempts, options)
+        self.contact_field = self.options.get('CONTACT_FIELD', 'phone_number')
+
+    async def send(self, recipient, text, payload):
+        delay = self.options.get('DELAY', 0.0)
+        await asyncio.sleep(max(0.0, random.gauss(delay, self.options.get('JITTER', 0.0))))
+        if random.random() < self.options.get('FAILURE_RATE', 0.0):
+            raise DeliveryError('Stub delivery failed')
+        self.outbox.append({'channel': self.name, 'to': recipient, 'text': text})
+
+
+def build_channels():
+    """Instantiate the configured channels, keyed by name."""
+    return {
+        name: import_string(config['BACKEND'])(
+            name, config.get('TIMEOUT', 5), config.get('ATTEMPTS', 3), config.get('OPTIONS')
+        )
+        for name, config in settings.EMERGENCY_ALERTS['CHANNELS'].items()
+    }
+
+
+def alert_payload(alert):
+    return {
+        'alert_id': alert.id,
+        'type': alert.alert_type,
+        'type_label': alert.get_alert_type_display(),
+        'location': alert.location or '',
+        'message': alert.message or '',
+        'user': (alert.user.get_full_name() or alert.user.username) if alert.user else '',
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def alert_text(payload):
+    sender = payload['user'] or 'an E-Swasthya user'
+    text = f"SOS from {sender}: {payload['type_label']}."
+    if payload['location']:
+        text += f" Location: {payload['location']}."
+    if payload['message']:
+        text += f" {payload['message']}"
+    return text
+
+
+def contacts_cache_key(user):
+    return f"emergency_contacts:{user.id}"
+
+
+def contacts_cache():
+    """The cache for contact lists, or None when each process would have its own."""
+    cache = caches[settings.EMERGENCY_ALERTS['CACHE_ALIAS']]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def refresh_contact_list(user):
+    """Rebuild and cache ``user``'s contacts; call after every change to them."""
+    if user is None:
+        return []
+    contacts = list(EmergencyContact.objects.filter(user=user).order_by('id').values(*CONTACT_FIELDS))
+    cache = contacts_cache()
+    if cache is not None:
+        cache.set(contacts_cache_key(user), contacts, settings.EMERGENCY_ALERTS['CONTACTS_CACHE_TTL'])
+    return contacts
+
+
+def contact_list(user):
+    """
+    ``user``'s contacts as dicts, from the cache when it has them. Anonymous
+    visitors have none: contacts belong to an account.
+    """
+    if user is None:
+        return []
+    cache = contacts_cache()
+    contacts = cache.get(contacts_cache_key(user)) if cache is not None else None
+    if contacts is None:
+        contacts = refresh_contact_list(user)
+    return contacts
+
+
+def plan_recipients(contacts):
+    """Return ``(channel, contact_id, address)`` for every notification to send."""
+    return [
+        (name, contact_id, address)
+        for name, channel in build_channels().items()
+        for contact_id, address in channel.recipients(contacts)
+    ]
+
+
+def plan_deliveries(alert, recipients):
+    """Create a pending delivery for every planned recipient."""
+    return AlertDelivery.objects.bulk_create([
+        AlertDelivery(alert=alert, contact_id=contact_id, channel=name, recipient=address)
+        for name, contact_id, address in recipients
+    ])
+
+
+async def deliver(channel, delivery, text, payload, semaphore):
+    backoff = settings.EMERGENCY_ALERTS['RETRY_BACKOFF']
+    for attempt in range(1, channel.attempts + 1):
+        delivery.attempts = attempt
+        try:
+            async with semaphore:
+                await asyncio.wait_for(channel.send(delivery.recipient, text, payload), channel.timeout)
+        except Exception as e:
+            delivery.last_error = str(e) or e.__class__.__name__
+            if attempt < channel.attempts:
+                metrics.increment('emergency.delivery.retried')
+                await delivery.asave(update_fields=['attempts', 'last_error', 'updated_at'])
+                await asyncio.sleep(backoff * 2 ** (attempt - 1))
+                continue
+            delivery.status = 'failed'
+            logger.warning(f"{channel.name} delivery to {delivery.recipient} failed: {delivery.last_error}")
+        else:
+            delivery.status = 'sent'
+            delivery.sent_at = timezone.now()
+        break
+    metrics.increment(f'emergency.delivery.{delivery.status}')
+    await delivery.asave(update_fields=['status', 'attempts', 'last_error', 'sent_at', 'updated_at'])
+
+
+async def deliver_alert(alert_id, max_concurrency=None):
+    """Send every pending delivery of the alert at once and record the outcome."""
+    alert = await EmergencyAlert.objects.select_related('user').aget(id=alert_id)
+    # Deliveries already finished count towards the outcome of a resumed alert
+    deliveries = [delivery async for delivery in alert.deliveries.order_by('id')]
+    channels = build_channels()
+    payload = alert_payload(alert)
+    text = alert_text(payload)
+    semaphore = asyncio.Semaphore(max_concurrency or settings.EMERGENCY_ALERTS['MAX_CONCURRENCY'])
+
+    async def deliver_and_publish(channel, delivery):
+        await deliver(channel, delivery, text, payload, semaphore)
+        publish_alert(alert, deliveries)
+
+    # A recovered alert may have been opened by the worker that died
+    opened = alert.status == 'sending'
+    alert.status = 'sending'
+    await alert.asave(update_fields=['status'])
+    if not opened:
+        await sync_to_async(alert_opened)(alert)
+    tasks = []
+    for delivery in deliveries:
+        if delivery.status != 'pending':
+            continue
+        channel = channels.get(delivery.channel)
+        error = 'Channel is not configured' if channel is None else channel.configuration_error()
+        if error:
+            delivery.status = 'failed'
+            delivery.last_error = error
+            metrics.increment('emergency.delivery.failed')
+            await delivery.asave(update_fields=['status', 'last_error', 'updated_at'])
+            continue
+        tasks.append(deliver_and_publish(channel, delivery))
+    publish_alert(alert, deliveries)
+    await asyncio.gather(*tasks)
+
+    sent = sum(1 for delivery in deliveries if delivery.status == 'sent')
+    if deliveries and sent == len(deliveries):
+        alert.status = 'completed'
+    else:
+        alert.status = 'partial' if sent else 'failed'
+    alert.completed_at = timezone.now()
+    await alert.asave(update_fields=['status', 'completed_at'])
+    await sync_to_async(alert_closed)(alert)
+    if alert.status == 'failed':
+        await sync_to_async(release_failed_alert)(alert)
+    publish_alert(alert, deliveries)
+    record_slo(alert)
+    return alert
+
+
+def record_slo(alert):
+    seconds = (alert.completed_at - alert.created_at).total_seconds()
+    if alert.status == 'completed' and seconds <= settings.EMERGENCY_ALERTS['SLO_SECONDS']:
+        metrics.increment('emergency.alert.within_slo')
+    else:
+        metrics.increment('emergency.alert.slo_missed')
+    logger.info(f"Alert {alert.id} {alert.status} in {seconds:.2f}s")
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.EMERGENCY_ALERTS['WORKERS'],
+                    thread_name_prefix='alert-fanout'
+                )
+    return _executor
+
+
+def run_delivery(alert, recipients):
+    try:
+        plan_deliveries(alert, recipients)
+        # Keep the ORM calls on this thread and its connection
+        async_to_sync(deliver_alert)(alert.id)
+    except Exception as e:
+        logger.error(f"Delivering alert {alert.id} failed: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def dispatch_alert(alert, recipients):
+    """Deliver the alert in the background, or inline when EAGER."""
+    if settings.EMERGENCY_ALERTS['EAGER']:
+        plan_deliveries(alert, recipients)
+        return async_to_sync(deliver_alert)(alert.id)
+    get_executor().submit(run_delivery, alert, recipients)
+    return alert
+
+
+def recover_alerts(older_than=None):
+    """
+    Deliver every alert older than ``older_than`` (default RECOVER_AFTER)
+    seconds that is not final: a worker stopped before planning or sending
+    its deliveries. Returns the alerts, with their new status.
+    """
+    older_than = settings.EMERGENCY_ALERTS['RECOVER_AFTER'] if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    alerts = list(
+        EmergencyAlert.objects
+        .filter(created_at__lt=cutoff)
+        .exclude(status__in=FINAL_STATUSES)
+        .select_related('user')
+        .order_by('id')
+    )
+    recovered = []
+    for alert in alerts:
+        if not alert.deliveries.exists():
+            recipients = plan_recipients(contact_list(alert.user))
+            if not recipients:
+                alert.status = 'failed'
+                alert.completed_at = timezone.now()
+                alert.save(update_fields=['status', 'completed_at'])
+                alert_added(alert)
+                record_slo(alert)
+                recovered.append(alert)
+                continue
+            plan_deliveries(alert, recipients)
+        metrics.increment('emergency.alert.recovered')
+        logger.warning(f"Recovering alert {alert.id}, {alert.status} since {alert.created_at.isoformat()}")
+        recovered.append(async_to_sync(deliver_alert)(alert.id))
+    return recovered
+
+
+def alert_slo_stats(limit=1000):
+    """Time-to-all-notified over the most recent finished alerts."""
+    finished = list(
+        EmergencyAlert.objects
+        .filter(completed_at__isnull=False)
+        .order_by('-id')
+        .values_list('status', 'created_at', 'completed_at')[:limit]
+    )
+    seconds = sorted((completed_at - created_at).total_seconds() for _, created_at, completed_at in finished)
+    slo = settings.EMERGENCY_ALERTS['SLO_SECONDS']
+    within = sum(
+        1 for status, created_at, completed_at in finished
+        if status == 'completed' and (completed_at - created_at).total_seconds() <= slo
+    )
+    return {
+        'alerts': len(finished),
+        'slo_seconds': slo,
+        'within_slo': within / len(finished) if finished else None,
+        'p50_seconds': seconds[len(seconds) // 2] if seconds else None,
+        'p99_seconds': seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))] if seconds else None,
+    }
@@ -0,0 +1,271 @@
+"""
+Database-backed queue for report analysis.
+
+``upload_report`` only enqueues an ``AnalysisJob``; a pool of worker threads
+(``manage.py run_analysis_worker``) claims jobs with a conditional UPDATE,
+so any number of workers can share the queue without an external broker.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from .models import AnalysisJob, ReportAnalysis
+from .ai_analysis import analyze_medical_report
+from .health_summary import report_status_changed
+from .report_previews import warm_derivatives
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def reuse_analysis(report):
+    """
+    Copy the analysis of an earlier report with identical bytes onto
+    ``report``. Returns the copied analysis, or None if there is none yet.
+    """
+    if not report.content_hash:
+        return None
+    source = ReportAnalysis.objects.filter(
+        report__content_hash=report.content_hash
+    ).exclude(report=report).first()
+    if source is None:
+        return None
+    analysis, _ = ReportAnalysis.objects.update_or_create(
+        report=report,
+        defaults={
+            'analysis_text': source.analysis_text,
+            'health_tips': source.health_tips,
+            'yoga_suggestions': source.yoga_suggestions,
+            'extracted_text': source.extracted_text,
+            'source': source.source
+        }
+    )
+    metrics.increment('analysis_queue.reused')
+    return analysis
+
+
+def enqueue_analysis(report):
+    if reuse_analysis(report) is not None:
+        # Nothing to compute, record the job as already done
+        job = AnalysisJob.objects.create(
+            report=report,
+            status='done',
+            max_attempts=settings.REPORT_ANALYSIS_QUEUE['MAX_ATTEMPTS']
+        )
+        report_status_changed(report, 'done')
+        return job
+
+    job = AnalysisJob.objects.create(
+        report=report,
+        max_attempts=settings.REPORT_ANALYSIS_QUEUE['MAX_ATTEMPTS']
+    )
+    metrics.increment('analysis_queue.enqueued')
+    if settings.REPORT_ANALYSIS_QUEUE['EAGER']:
+        job = claim_job(f'eager-{os.getpid()}', job_id=job.id)
+        if job is not None:
+            run_job(job)
+    return job
+
+
+def claim_job(worker_id, job_id=None):
+    """
+    Atomically move the next due job to ``running`` and return it, or None.
+
+    Running jobs whose lease has expired (their worker died) are claimable
+    again while they have attempts left, and failed once they have none.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=settings.REPORT_ANALYSIS_QUEUE['LEASE_SECONDS'])
+    fail_exhausted_jobs(now - lease)
+    claimable = (
+        Q(status='pending', run_after__lte=now)
+        | Q(status='running', locked_at__lt=now - lease, attempts__lt=F('max_attempts'))
+    )
+    candidates = AnalysisJob.objects.filter(claimable)
+    if job_id is not None:
+        candidates = candidates.filter(id=job_id)
+
+    for candidate_id in candidates.order_by('run_after', 'id').values_list('id', flat=True)[:5]:
+        claimed = AnalysisJob.objects.filter(claimable, id=candidate_id).update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related('report').get(id=candidate_id)
+    return None
+
+
+def fail_exhausted_jobs(expired_before):
+    """Fail the jobs whose last attempt's lease expired before ``expired_before``."""
+    exhausted = AnalysisJob.objects.filter(
+        status='running', locked_at__lt=expired_before, attempts__gte=F('max_attempts')
+    )
+    for job in exhausted.select_related('report'):
+        failed = AnalysisJob.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(
+            status='failed',
+            last_error='Lease expired on the last attempt',
+            locked_by='',
+            locked_at=None,
+            updated_at=timezone.now()
+        )
+        if failed:
+            metrics.increment('analysis_queue.failed')
+            report_status_changed(job.report, 'failed')
+
+
+def release_job(job, **fields):
+    """
+    Save ``fields`` on ``job`` and unlock it, but only while this worker
+    still holds its lease: once the lease expired and another worker
+    reclaimed the job, that worker owns its outcome. Returns whether it did.
+    """
+    released = AnalysisJob.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(
+        locked_by='',
+        locked_at=None,
+        updated_at=timezone.now(),
+        **fields
+    )
+    if not released:
+        logger.warning(f"Analysis job {job.id} lost its lease to another worker, dropping its outcome")
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.locked_by = ''
+    job.locked_at = None
+    return True
+
+
+def run_job(job):
+    report = job.report
+    # Render the thumbnails while we are here, so the first list view is fast
+    warm_derivatives(report)
+    try:
+        # An identical upload may have been analyzed since this job was queued
+        if reuse_analysis(report) is not None:
+            return finish_job(job)
+        analysis_result = analyze_medical_report(report.file.path)
+        ReportAnalysis.objects.update_or_create(
+            report=report,
+            defaults={
+                'analysis_text': analysis_result['analysis_text'],
+                'health_tips': analysis_result['health_tips'],
+                'yoga_suggestions': analysis_result['yoga_suggestions'],
+                'extracted_text': analysis_result.get('extraction', {}).get('text', ''),
+                'source': analysis_result.get('source', '')
+            }
+        )
+    except Exception as e:
+        logger.error(f"Analysis job {job.id} for report {report.id} failed: {str(e)}")
+        if job.attempts < job.max_attempts:
+            # Exponential backoff before the next attempt
+            delay = settings.REPORT_ANALYSIS_QUEUE['RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            if release_job(job, status='pending', run_after=timezone.now() + timedelta(seconds=delay),
+                           last_error=str(e)):
+                metrics.increment('analysis_queue.retried')
+        elif release_job(job, status='failed', last_error=str(e)):
+            metrics.increment('analysis_queue.failed')
+            report_status_changed(report, 'failed')
+        return False
+
+    if not finish_job(job):
+        return False
+    metrics.increment('analysis_queue.done')
+    return True
+
+
+def finish_job(job):
+    if not release_job(job, status='done', last_error=''):
+        return False
+    report_status_changed(job.report, 'done')
+    return True
+
+
+def queue_stats():
+    """Job counts by status plus the age of the oldest due job (the backlog)."""
+    counts = dict(
+        AnalysisJob.objects.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    oldest = AnalysisJob.objects.filter(
+        status='pending', run_after__lte=timezone.now()
+    ).aggregate(oldest=Min('run_after'))['oldest']
+    return {
+        'pending': counts.get('pending', 0),
+        'running': counts.get('running', 0),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'backlog': counts.get('pending', 0) + counts.get('running', 0),
+        'oldest_pending_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def analysis_source_stats():
+    """
+    How many analyses the local extractor produced versus the model.
+    Documents with no readable text are counted apart and left out of
+    ``local_fraction``.
+    """
+    counts = dict(
+        ReportAnalysis.objects.exclude(source='').values_list('source').annotate(total=Count('id')).order_by()
+    )
+    local, model = counts.get('local', 0), counts.get('model', 0)
+    return {
+        'local': local,
+        'model': model,
+        'unreadable': counts.get('unreadable', 0),
+        'local_fraction': local / (local + model) if local + model else 0.0,
+    }
+
+
+class AnalysisWorkerPool:
+    """A fixed number of threads that claim and run analysis jobs."""
+
+    def __init__(self, concurrency=None, poll_interval=None):
+        config = settings.REPORT_ANALYSIS_QUEUE
+        self.concurrency = concurrency or config['CONCURRENCY']
+        self.poll_interval = poll_interval if poll_interval is not None else config['POLL_INTERVAL']
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _work(self, worker_id, burst):
+        try:
+            while not self._stop.is_set():
+                close_old_connections()
+                job = claim_job(worker_id)
+                if job is None:
+                    if burst:
+                        break
+                    self._stop.wait(self.poll_interval)
+                    continue
+                run_job(job)
+        finally:
+            close_old_connections()
+
+    def start(self, burst=False):
+        """Start the workers; with ``burst`` they exit once the queue is empty."""
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._work,
+                args=(f"{self.worker_prefix}:{i}", burst),
+                name=f'analysis-worker-{i}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,32 @@
+from django.apps import AppConfig
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+class MainConfig(AppConfig):
+    name = 'main'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from .report_search import repair_search_index
+
+        # SQLite drops the search triggers when a migration rebuilds their table
+        post_migrate.connect(repair_search_index, sender=self)
+        register(check_search_index, Tags.database)
+
+
+def check_search_index(app_configs=None, databases=None, **kwargs):
+    from .report_search import missing_search_objects
+
+    warnings = []
+    for alias in databases or []:
+        missing = missing_search_objects(connections[alias])
+        if missing:
+            # Not an Error: migrate runs this check first and then repairs it
+            warnings.append(Warning(
+                f"The report search index is missing {', '.join(missing)}",
+                hint="Run 'manage.py migrate' or 'manage.py rebuild_search_index'.",
+                id='main.W001',
+            ))
+    return warnings
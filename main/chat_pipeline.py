@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODES = ('sequential', 'concurrent', 'merged')
+
+# Messages that mention any of these are answered with the symptom analysis
+# as context; everything else is answered without waiting for it.
+SYMPTOM_PATTERN = re.compile(
+    r'\b(symptoms?|pain|pains|ache|aches|aching|hurts?|fever|cough|coughing|'
+    r'headache|migraine|nausea|vomit\w*|dizz\w*|bleed\w*|breath\w*|rash|'
+    r'swell\w*|chest|injur\w*|fatigue|tired|sore|cold|flu|allerg\w*|'
+    r'infection|diarrh\w*|burn\w*|sick|unwell|faint\w*|throat|stomach)\b',
+    re.IGNORECASE
+)
+
+_executor = None
+_executor_slots = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide executor used for symptom checks."""
+    global _executor, _executor_slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = settings.CHAT_EXECUTOR_WORKERS
+                # Cap queued work as well as running work so a burst of
+                # requests cannot build an unbounded backlog of model calls
+                _executor_slots = threading.BoundedSemaphore(workers * 2)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat')
+    return _executor
+
+
+def needs_symptom_context(user_message):
+    return bool(SYMPTOM_PATTERN.search(user_message))
+
+
+def check_symptoms(symptom_checker, user_message):
+    try:
+        symptom_result = symptom_checker.check_symptoms(user_message)
+        if symptom_result['status'] == 'error':
+            logger.error(f"Symptom checker error: {symptom_result['message']}")
+    except Exception as e:
+        logger.error(f"Symptom checker exception: {str(e)}")
+        symptom_result = {'status': 'error', 'message': str(e)}
+    return symptom_result
+
+
+def symptom_context(symptom_result):
+    return symptom_result if symptom_result['status'] == 'success' else None
+
+
+def run_sequential(user_message, symptom_checker, ai_handler, session_id=None):
+    symptom_result = check_symptoms(symptom_checker, user_message)
+    ai_response = ai_handler.get_response(user_message, symptom_context(symptom_result), session_id)
+    return symptom_result, ai_response
+
+
+def run_concurrent(user_message, symptom_checker, ai_handler, session_id=None):
+    """
+    Start the symptom check on the executor and produce the reply on the
+    calling thread. The reply only waits for the symptom result when the
+    message looks symptom related.
+
+    The reply is deliberately not submitted to the executor as well: a reply
+    task blocking on a symptom task inside the same pool can deadlock once
+    every worker is busy.
+    """
+    executor = get_executor()
+    if not _executor_slots.acquire(blocking=False):
+        logger.warning("Chat executor saturated, running sequentially")
+        return run_sequential(user_message, symptom_checker, ai_handler, session_id)
+
+    try:
+        symptom_future = executor.submit(check_symptoms, symptom_checker, user_message)
+    except RuntimeError:
+        _executor_slots.release()
+        raise
+    symptom_future.add_done_callback(lambda future: _executor_slots.release())
+
+    if needs_symptom_context(user_message):
+        symptom_result = symptom_future.result()
+        ai_response = ai_handler.get_response(user_message, symptom_context(symptom_result), session_id)
+    else:
+        ai_response = ai_handler.get_response(user_message, session_id=session_id)
+        symptom_result = symptom_future.result()
+
+    return symptom_result, ai_response
+
+
+def run_merged(user_message, symptom_checker, ai_handler, session_id=None):
+    # The merged prompt is a one-off JSON exchange, so it is not added to
+    # the conversation history
+    return ai_handler.get_merged_response(user_message, symptom_checker)
+
+
+def run_chat(user_message, symptom_checker, ai_handler, mode=None, session_id=None):
+    """
+    Produce ``(symptom_result, ai_response)`` for a chat message using the
+    configured ``CHAT_MODE``, continuing the conversation ``session_id``.
+    """
+    mode = mode or settings.CHAT_MODE
+    if mode == 'merged':
+        return run_merged(user_message, symptom_checker, ai_handler, session_id)
+    if mode == 'concurrent':
+        return run_concurrent(user_message, symptom_checker, ai_handler, session_id)
+    return run_sequential(user_message, symptom_checker, ai_handler, session_id)
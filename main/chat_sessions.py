@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class ConversationSession:
+    __slots__ = ('turns', 'summary', 'history_tokens', 'total_tokens', 'total_turns', 'last_used')
+
+    def __init__(self):
+        # (user message, reply, tokens) per turn, oldest first
+        self.turns = []
+        self.summary = ''
+        self.history_tokens = 0
+        # Every turn ever recorded, including those folded into the summary
+        self.total_tokens = 0
+        self.total_turns = 0
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Bounded per-user chat history kept in process memory.
+
+    Each worker process has its own store: with several gunicorn workers a
+    conversation keeps its history only while its requests reach the same
+    worker, and starts over on another one.
+
+    Turns beyond the token budget are folded into a short running summary
+    of what the user asked about, built locally so trimming never costs a
+    model call. Sessions idle for longer than ``idle_timeout`` seconds are
+    evicted, as are the least recently used ones beyond ``max_sessions``.
+    """
+
+    def __init__(self, history_tokens=1500, summary_chars=600, idle_timeout=1800, max_sessions=5000):
+        self.history_token_budget = history_tokens
+        self.summary_chars = summary_chars
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_used < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+
+    def _touch(self, session_id):
+        now = time.monotonic()
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = ConversationSession()
+        self._sessions.move_to_end(session_id)
+        session.last_used = now
+        return session
+
+    def history(self, session_id):
+        """
+        Return ``(contents, usage)`` where ``contents`` is the history for
+        ``start_chat(history=...)``: the summary of older turns, if any, then
+        the recent turns.
+        """
+        with self._lock:
+            session = self._touch(session_id)
+            contents = []
+            tokens = session.history_tokens
+            if session.summary:
+                contents.append({'role': 'user', 'parts': [f"Summary of our earlier conversation: {session.summary}"]})
+                contents.append({'role': 'model', 'parts': ['Understood.']})
+                tokens += estimate_tokens(session.summary)
+            for user_message, reply, _ in session.turns:
+                contents.append({'role': 'user', 'parts': [user_message]})
+                contents.append({'role': 'model', 'parts': [reply]})
+            return contents, {
+                'history_tokens': tokens,
+                'full_history_tokens': session.total_tokens,
+                'turns': session.total_turns,
+            }
+
+    def record(self, session_id, user_message, reply):
+        """
+        Append a turn and trim the session to its token budget. Returns the
+        number of history tokens dropped into the summary.
+        """
+        tokens = estimate_tokens(user_message) + estimate_tokens(reply)
+        dropped = 0
+        with self._lock:
+            session = self._touch(session_id)
+            session.turns.append((user_message, reply, tokens))
+            session.history_tokens += tokens
+            session.total_tokens += tokens
+            session.total_turns += 1
+            while session.history_tokens > self.history_token_budget and len(session.turns) > 1:
+                old_message, _, old_tokens = session.turns.pop(0)
+                session.history_tokens -= old_tokens
+                dropped += old_tokens
+                topic = ' '.join(old_message.split())[:120]
+                summary = f"{session.summary}; {topic}" if session.summary else f"The user asked about: {topic}"
+                session.summary = summary[-self.summary_chars:]
+        return dropped
+
+    def clear(self, session_id=None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide store configured by ``CHAT_SESSIONS``."""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                config = settings.CHAT_SESSIONS
+                _session_store = SessionStore(
+                    history_tokens=config['HISTORY_TOKENS'],
+                    summary_chars=config['SUMMARY_CHARS'],
+                    idle_timeout=config['IDLE_TIMEOUT'],
+                    max_sessions=config['MAX_SESSIONS']
+                )
+    return _session_store
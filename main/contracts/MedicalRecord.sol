@@ -10,12 +10,20 @@ contract MedicalRecord {
         bool isValid;
     }
     
+    struct Anchor {
+        uint256 timestamp;
+        uint256 leafCount;
+    }
+    
     mapping(string => mapping(string => Record)) private records;
+    // Merkle roots over batches of report hashes (see main/report_anchoring.py)
+    mapping(bytes32 => Anchor) private anchors;
     address private owner;
     
     event RecordStored(string patientId, string reportHash, uint256 timestamp);
     event RecordUpdated(string patientId, string reportHash, uint256 timestamp);
     event RecordInvalidated(string patientId, string reportHash);
+    event RootAnchored(bytes32 indexed root, uint256 leafCount, uint256 timestamp);
     
     constructor() {
         owner = msg.sender;
@@ -95,4 +103,42 @@ contract MedicalRecord {
     ) public view returns (bool) {
         return records[_patientId][_reportHash].isValid;
     }
-} 
\ No newline at end of file
+    
+    function anchorRoot(bytes32 _root, uint256 _leafCount) public onlyOwner {
+        require(_root != bytes32(0), "Root cannot be empty");
+        require(_leafCount > 0, "Batch cannot be empty");
+        require(anchors[_root].timestamp == 0, "Root already anchored");
+        
+        anchors[_root] = Anchor({
+            timestamp: block.timestamp,
+            leafCount: _leafCount
+        });
+        
+        emit RootAnchored(_root, _leafCount, block.timestamp);
+    }
+    
+    function getAnchor(bytes32 _root) public view returns (uint256 timestamp, uint256 leafCount) {
+        Anchor memory anchor = anchors[_root];
+        return (anchor.timestamp, anchor.leafCount);
+    }
+    
+    // Leaves are sha256(0x00 || contentHash) and nodes sha256(0x01 || lower || higher),
+    // so a proof is just the sibling hashes from the leaf up to the root
+    function verifyInclusion(
+        bytes32 _root,
+        bytes32 _contentHash,
+        bytes32[] memory _proof
+    ) public view returns (bool) {
+        if (anchors[_root].timestamp == 0) {
+            return false;
+        }
+        bytes32 node = sha256(abi.encodePacked(bytes1(0x00), _contentHash));
+        for (uint256 i = 0; i < _proof.length; i++) {
+            bytes32 sibling = _proof[i];
+            node = node <= sibling
+                ? sha256(abi.encodePacked(bytes1(0x01), node, sibling))
+                : sha256(abi.encodePacked(bytes1(0x01), sibling, node));
+        }
+        return node == _root;
+    }
+}
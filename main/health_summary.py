@@ -0,0 +1,228 @@
+"""
+Denormalized per-user health summary.
+
+The dashboard reads one ``HealthSummary`` row by primary key instead of
+counting and joining reports, analyses, alerts and contacts on every page
+load. Each write path updates the row as it goes, under a row lock:
+
+- ``upload_report`` calls ``report_added()`` in the report's transaction;
+- the analysis queue calls ``report_status_changed()`` when a job is done
+  or has failed for good;
+- the fan-out calls ``alert_opened()`` and ``alert_closed()`` around the
+  deliveries, so triggering an alert stays a single write (an alert
+  nobody can be told about is closed at once and goes through
+  ``alert_added()``);
+- the contact views call ``contacts_changed()``.
+
+A user without a row yet gets one computed from scratch on their first
+write or read. ``manage.py rebuild_health_summaries`` backfills them and
+``manage.py check_health_summaries`` compares stored rows with fresh ones.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch
+from .alert_events import FINAL_STATUSES
+from .households import count_of
+from .models import EmergencyAlert, EmergencyContact, HealthSummary, MedicalReport
+from .report_listing import related_or_none
+
+LATEST_REPORTS = 5
+OPEN_ALERTS = 5
+
+SUMMARY_FIELDS = ['report_count', 'latest_reports', 'alert_count', 'open_alert_count', 'open_alerts', 'contact_count']
+
+
+def report_entry(report, analysis_status):
+    return {
+        'id': report.id,
+        'title': report.title,
+        'uploaded_at': report.uploaded_at.isoformat(),
+        'analysis_status': analysis_status,
+    }
+
+
+def alert_entry(alert):
+    return {
+        'id': alert.id,
+        'type': alert.alert_type,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def report_analysis_status(report):
+    """'done', 'failed' or 'pending', as ``list_reports`` shows it."""
+    if related_or_none(report, 'reportanalysis') is not None:
+        return 'done'
+    job = related_or_none(report, 'analysisjob')
+    return 'failed' if job is not None and job.status == 'failed' else 'pending'
+
+
+def newest_open_alerts(user_id):
+    alerts = (
+        EmergencyAlert.objects.filter(user_id=user_id).exclude(status__in=FINAL_STATUSES)
+        .order_by('-created_at', '-id')[:OPEN_ALERTS]
+    )
+    return [alert_entry(alert) for alert in alerts]
+
+
+def compute_summaries(user_ids):
+    """Fresh, unsaved summaries of ``user_ids`` from the source tables, in five queries."""
+    users = (
+        User.objects
+        .filter(id__in=user_ids)
+        .only('id')
+        .annotate(
+            report_count=count_of(MedicalReport.objects.filter(user=OuterRef('id')), 'user'),
+            alert_count=count_of(EmergencyAlert.objects.filter(user=OuterRef('id')), 'user'),
+            open_alert_count=count_of(
+                EmergencyAlert.objects.filter(user=OuterRef('id')).exclude(status__in=FINAL_STATUSES), 'user'
+            ),
+            contact_count=count_of(EmergencyContact.objects.filter(user=OuterRef('id')), 'user'),
+        )
+        .prefetch_related(
+            Prefetch(
+                'medicalreport_set',
+                queryset=MedicalReport.objects
+                .select_related('reportanalysis', 'analysisjob')
+                .only('id', 'user_id', 'title', 'uploaded_at', 'reportanalysis__id', 'analysisjob__status')
+                .order_by('-uploaded_at', '-id')[:LATEST_REPORTS],
+                to_attr='newest_reports',
+            ),
+            Prefetch(
+                'emergencyalert_set',
+                queryset=EmergencyAlert.objects.exclude(status__in=FINAL_STATUSES)
+                .order_by('-created_at', '-id')[:OPEN_ALERTS],
+                to_attr='newest_open_alerts',
+            ),
+        )
+    )
+    return {
+        user.id: HealthSummary(
+            user_id=user.id,
+            report_count=user.report_count,
+            latest_reports=[report_entry(report, report_analysis_status(report)) for report in user.newest_reports],
+            alert_count=user.alert_count,
+            open_alert_count=user.open_alert_count,
+            open_alerts=[alert_entry(alert) for alert in user.newest_open_alerts],
+            contact_count=user.contact_count,
+        )
+        for user in users
+    }
+
+
+def rebuild_summaries(user_ids):
+    """Recompute and store the summaries of ``user_ids``; returns them by user id."""
+    summaries = compute_summaries(user_ids)
+    HealthSummary.objects.bulk_create(
+        summaries.values(),
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=SUMMARY_FIELDS + ['updated_at'],
+    )
+    return summaries
+
+
+def get_summary(user):
+    """``user``'s summary, computed and stored first if they have none yet."""
+    summary = HealthSummary.objects.filter(user=user).first()
+    if summary is None:
+        summary = rebuild_summaries([user.id])[user.id]
+    return summary
+
+
+def update_summary(user_id, change):
+    """
+    Apply ``change(summary)`` to the stored summary under a row lock. A user
+    without one gets it computed instead, which already counts the change.
+    """
+    if user_id is None:
+        return
+    with transaction.atomic():
+        summary = HealthSummary.objects.select_for_update().filter(user_id=user_id).first()
+        if summary is None:
+            rebuild_summaries([user_id])
+            return
+        change(summary)
+        summary.save()
+
+
+def report_added(report):
+    def change(summary):
+        summary.report_count += 1
+        summary.latest_reports = [report_entry(report, 'pending')] + summary.latest_reports[:LATEST_REPORTS - 1]
+    update_summary(report.user_id, change)
+
+
+def report_status_changed(report, analysis_status):
+    def change(summary):
+        for entry in summary.latest_reports:
+            if entry['id'] == report.id:
+                entry['analysis_status'] = analysis_status
+    update_summary(report.user_id, change)
+
+
+def alert_added(alert):
+    """Count an alert that was final as soon as it was created."""
+    def change(summary):
+        summary.alert_count += 1
+    update_summary(alert.user_id, change)
+
+
+def alert_opened(alert):
+    def change(summary):
+        if any(entry['id'] == alert.id for entry in summary.open_alerts):
+            # Already counted by a rebuild since the alert was created
+            return
+        summary.alert_count += 1
+        summary.open_alert_count += 1
+        summary.open_alerts = [alert_entry(alert)] + summary.open_alerts[:OPEN_ALERTS - 1]
+    update_summary(alert.user_id, change)
+
+
+def alert_closed(alert):
+    def change(summary):
+        listed = any(entry['id'] == alert.id for entry in summary.open_alerts)
+        if not listed and len(summary.open_alerts) < OPEN_ALERTS:
+            # The list holds every open alert, so this one is not counted
+            return
+        summary.open_alert_count = max(summary.open_alert_count - 1, 0)
+        summary.open_alerts = [entry for entry in summary.open_alerts if entry['id'] != alert.id]
+        if len(summary.open_alerts) < min(summary.open_alert_count, OPEN_ALERTS):
+            # An older open alert moves up into the list
+            summary.open_alerts = newest_open_alerts(alert.user_id)
+    update_summary(alert.user_id, change)
+
+
+def contacts_changed(user, contacts):
+    """Record ``user``'s current contact list (as ``refresh_contact_list()`` returns it)."""
+    def change(summary):
+        summary.contact_count = len(contacts)
+    update_summary(user.id if user else None, change)
+
+
+def check_summaries(user_ids):
+    """Return ``(user_id, field, stored, expected)`` for every stored value that is out of date."""
+    expected = compute_summaries(user_ids)
+    stored = HealthSummary.objects.in_bulk(list(expected))
+    differences = []
+    for user_id, fresh in expected.items():
+        summary = stored.get(user_id)
+        for field in SUMMARY_FIELDS:
+            value = getattr(summary, field) if summary else None
+            if value != getattr(fresh, field):
+                differences.append((user_id, field, value, getattr(fresh, field)))
+    return differences
+
+
+def user_id_batches(batch_size=500, user_ids=None):
+    """Every user id (or ``user_ids``) in ascending batches."""
+    users = User.objects.order_by('id').values_list('id', flat=True)
+    if user_ids:
+        users = users.filter(id__in=user_ids)
+    last_id = 0
+    while True:
+        batch = list(users.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
@@ -0,0 +1,272 @@
+"""
+Bulk import of public hospital/facility datasets.
+
+Rows stream out of a CSV file or a GeoJSON FeatureCollection one at a time
+(the file is never loaded whole) and are normalized and written in
+batches, one transaction each. Rows are keyed on (source, source_id), so
+importing a newer dump of the same dataset updates hospitals in place
+instead of duplicating them.
+
+On PostgreSQL a batch is COPYed into a temporary table and merged with
+INSERT ... ON CONFLICT; elsewhere the same INSERT runs once per row as a
+single prepared statement (``executemany``).
+"""
+import csv
+import hashlib
+import io
+import json
+import math
+from itertools import islice
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Hospital
+
+# Column names (lower case) accepted for each field, as found in common dumps
+FIELD_ALIASES = {
+    'source_id': ('source_id', 'id', 'facility_id', 'hospital_id', 'osm_id', 'uuid'),
+    'name': ('name', 'facility_name', 'hospital_name', 'hospital'),
+    'address': ('address', 'addr:full', 'full_address', 'location'),
+    'city': ('city', 'addr:city', 'district', 'town'),
+    'state': ('state', 'addr:state', 'state_name'),
+    'phone': ('phone', 'telephone', 'contact:phone', 'contact_number', 'mobile_number'),
+    'latitude': ('latitude', 'lat', 'y'),
+    'longitude': ('longitude', 'lon', 'lng', 'long', 'x'),
+    'has_emergency': ('has_emergency', 'emergency', 'emergency_services', 'casualty'),
+}
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', '24x7', '24/7'}
+TEXT_FIELDS = ('name', 'address', 'city', 'state', 'phone')
+UPDATE_FIELDS = ['name', 'address', 'city', 'state', 'phone', 'latitude', 'longitude', 'has_emergency', 'updated_at']
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def iter_csv_rows(f):
+    yield from csv.DictReader(f)
+
+
+def iter_geojson_features(f, chunk_size=64 * 1024):
+    """Yield the features of a FeatureCollection without parsing the file at once."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        start = buffer.find('"features"')
+        if start != -1 and buffer.find('[', start) != -1:
+            pos = buffer.find('[', start) + 1
+            break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            raise ValueError('No "features" array in the GeoJSON file')
+        buffer += chunk
+
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The feature runs past the buffer: read on, doubling the read
+            # so a huge feature is not re-parsed once per chunk
+            if eof:
+                raise ValueError('Truncated or malformed GeoJSON feature') from None
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(max(chunk_size, len(buffer)))
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield feature
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_geojson_rows(f):
+    """Features flattened into rows: their properties plus id and coordinates."""
+    for feature in iter_geojson_features(f):
+        row = dict(feature.get('properties') or {})
+        if feature.get('id') is not None:
+            row.setdefault('id', feature['id'])
+        point = feature_point(feature.get('geometry'))
+        if point is not None:
+            row['longitude'], row['latitude'] = point
+        yield row
+
+
+def feature_point(geometry):
+    """A Point's coordinates, or the mean vertex of a (Multi)Polygon's outer ring."""
+    if not geometry:
+        return None
+    coordinates = geometry.get('coordinates')
+    if geometry.get('type') == 'Point':
+        return coordinates[:2]
+    if geometry.get('type') == 'Polygon':
+        ring = coordinates[0]
+    elif geometry.get('type') == 'MultiPolygon':
+        ring = coordinates[0][0]
+    else:
+        return None
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        # Rings are closed by repeating the first vertex
+        ring = ring[:-1]
+    return sum(p[0] for p in ring) / len(ring), sum(p[1] for p in ring) / len(ring)
+
+
+def read_rows(path, file_format=None):
+    """Stream the rows of a CSV or GeoJSON file, by extension unless ``file_format`` is given."""
+    file_format = file_format or ('geojson' if path.lower().endswith(('.geojson', '.json')) else 'csv')
+    # utf-8-sig drops the byte order mark spreadsheet exports start with
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        yield from (iter_geojson_rows(f) if file_format == 'geojson' else iter_csv_rows(f))
+
+
+def field_columns(columns):
+    """Map each field to the first of ``columns`` that is one of its aliases."""
+    lowered = {str(column).strip().lower(): column for column in columns}
+    mapping = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered[alias]
+                break
+    return mapping
+
+
+def clean_text(value, max_length):
+    return ' '.join(str(value or '').split())[:max_length]
+
+
+def normalize_row(row, mapping):
+    """The Hospital field values for a raw row; raises InvalidRow naming the problem."""
+    def get(field):
+        column = mapping.get(field)
+        return row.get(column) if column is not None else None
+
+    values = {field: clean_text(get(field), Hospital._meta.get_field(field).max_length) for field in TEXT_FIELDS}
+    if not values['name']:
+        raise InvalidRow('missing name')
+    try:
+        latitude, longitude = float(get('latitude')), float(get('longitude'))
+    except (TypeError, ValueError):
+        raise InvalidRow('missing coordinates') from None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)) or not (
+        -90 <= latitude <= 90 and -180 <= longitude <= 180
+    ):
+        raise InvalidRow('coordinates out of range')
+    if latitude == 0 and longitude == 0:
+        raise InvalidRow('coordinates out of range')
+    values['latitude'] = round(latitude, 6)
+    values['longitude'] = round(longitude, 6)
+    values['has_emergency'] = str(get('has_emergency') or '').strip().lower() in TRUE_VALUES
+
+    source_id = clean_text(get('source_id'), 100)
+    if not source_id:
+        # No id column: a re-import matches the same name at the same spot
+        key = f"{values['name'].lower()}|{values['latitude']:.5f}|{values['longitude']:.5f}"
+        source_id = 'h:' + hashlib.sha1(key.encode()).hexdigest()
+    values['source_id'] = source_id
+    return values
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def normalize_batch(rows, mapping, source, rejected):
+    """Valid rows of a batch keyed by source_id (the last copy of an id wins); counts the rest in ``rejected``."""
+    cleaned = {}
+    for row in rows:
+        try:
+            values = normalize_row(row, mapping)
+        except InvalidRow as e:
+            rejected[str(e)] = rejected.get(str(e), 0) + 1
+            continue
+        values['source'] = source
+        cleaned[values['source_id']] = values
+    return list(cleaned.values())
+
+
+COLUMNS = ['source', 'source_id'] + UPDATE_FIELDS
+
+
+def batch_values(rows):
+    """Rows of a batch as tuples in ``COLUMNS`` order, adapted for the database."""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    return [
+        tuple(now if column == 'updated_at' else values[column] for column in COLUMNS)
+        for values in rows
+    ]
+
+
+def upsert_statement(rows_sql):
+    """INSERT of ``rows_sql`` (VALUES or a SELECT) that updates rows already imported."""
+    quote = connection.ops.quote_name
+    updates = ', '.join(f'{quote(field)} = EXCLUDED.{quote(field)}' for field in UPDATE_FIELDS)
+    return (
+        f'INSERT INTO {quote(Hospital._meta.db_table)} ({", ".join(quote(column) for column in COLUMNS)}) '
+        f'{rows_sql} ON CONFLICT ({quote("source")}, {quote("source_id")}) DO UPDATE SET {updates}'
+    )
+
+
+def upsert_batch(rows):
+    # One prepared statement run per row: bulk_create builds SQL for every
+    # field of every row, and on SQLite splits a batch into ~90-row statements
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    with connection.cursor() as cursor:
+        cursor.executemany(upsert_statement(f'VALUES ({placeholders})'), batch_values(rows))
+
+
+def copy_batch(rows):
+    """``upsert_batch()`` for PostgreSQL through COPY into a temporary table."""
+    column_list = ', '.join(connection.ops.quote_name(column) for column in COLUMNS)
+    buffer = io.StringIO()
+    # Quoted so empty strings stay strings: COPY reads a bare empty field as NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(batch_values(rows))
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE hospital_import ON COMMIT DROP AS '
+            f'SELECT {column_list} FROM {connection.ops.quote_name(Hospital._meta.db_table)} WITH NO DATA'
+        )
+        copy_sql = f'COPY hospital_import ({column_list}) FROM STDIN WITH (FORMAT csv)'
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):
+            # psycopg 3
+            with raw.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            raw.copy_expert(copy_sql, buffer)
+        cursor.execute(upsert_statement(f'SELECT {column_list} FROM hospital_import'))
+
+
+def import_hospitals(rows, source, batch_size=5000, method=None, on_batch=None):
+    """
+    Upsert the hospitals in ``rows`` (dicts keyed by column name) under
+    ``source``. ``method`` is 'copy' or 'insert' (the default picks COPY
+    on PostgreSQL). ``on_batch(read, written)`` is called after each batch.
+    Returns ``(read, written, rejected)``, ``rejected`` counting rows by reason.
+    """
+    method = method or ('copy' if connection.vendor == 'postgresql' else 'insert')
+    if method == 'copy' and connection.vendor != 'postgresql':
+        raise ValueError('COPY loading needs PostgreSQL')
+    write = copy_batch if method == 'copy' else upsert_batch
+    read = written = 0
+    rejected = {}
+    for batch in batched(rows, batch_size):
+        # GeoJSON features need not all carry the same properties
+        mapping = field_columns(set().union(*batch))
+        cleaned = normalize_batch(batch, mapping, source, rejected)
+        if cleaned:
+            with transaction.atomic():
+                write(cleaned)
+        read += len(batch)
+        written += len(cleaned)
+        if on_batch:
+            on_batch(read, written)
+    return read, written, rejected
@@ -0,0 +1,184 @@
+"""
+Nearest-hospital lookups from an in-memory grid index.
+
+Each process loads the coordinates of every hospital once into numpy
+arrays sorted by ``HOSPITAL_SEARCH['CELL_DEGREES']`` latitude/longitude
+cells (a few MB for 100k+ facilities). A query scans rings of cells
+outwards from the point and stops as soon as its k-th nearest candidate is
+closer than anything outside the scanned rings can be, so it measures a
+few hundred distances instead of one per hospital. Results are exact
+great-circle (haversine) distances.
+
+The index is rebuilt after ``HOSPITAL_SEARCH['MAX_AGE']`` seconds, and at
+once in the process that calls ``reload_hospital_index()`` (the importer
+does).
+"""
+import math
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from .models import Hospital
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Past this many rings (with few enough neighbours nearby, e.g. far out at
+# sea) scanning every point is cheaper than visiting more cells
+MAX_RINGS = 50
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distances in km from one point to arrays of points, all in radians."""
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    def __init__(self, ids, lats, lons, cell_degrees):
+        self.cell = cell_degrees
+        self.rows = math.ceil(180 / cell_degrees)
+        self.columns = math.ceil(360 / cell_degrees)
+        keys = self.row_of(lats) * self.columns + self.column_of(lons)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.lats = np.radians(lats[order])
+        self.lons = np.radians(lons[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_of(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell), 0, self.rows - 1).astype(np.int64)
+
+    def column_of(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell).astype(np.int64) % self.columns
+
+    def row_span(self, row, first, last):
+        """Key ranges covering columns ``first..last`` of ``row``, wrapping at 180 degrees."""
+        base = row * self.columns
+        if last - first + 1 >= self.columns:
+            return [(base, base + self.columns - 1)]
+        first, last = first % self.columns, last % self.columns
+        if first <= last:
+            return [(base + first, base + last)]
+        return [(base + first, base + self.columns - 1), (base, base + last)]
+
+    def ring(self, row, column, radius):
+        """Positions of the points in the cells exactly ``radius`` cells from (row, column)."""
+        spans = []
+        for edge in {row - radius, row + radius}:
+            if 0 <= edge < self.rows:
+                spans += self.row_span(edge, column - radius, column + radius)
+        if radius:
+            for middle in range(max(row - radius + 1, 0), min(row + radius, self.rows)):
+                spans += self.row_span(middle, column - radius, column - radius)
+                spans += self.row_span(middle, column + radius, column + radius)
+        lows, highs = np.array(spans).T
+        starts = np.searchsorted(self.keys, lows, 'left')
+        ends = np.searchsorted(self.keys, highs, 'right')
+        positions = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+
+    def outside_km(self, lat, lon, row, column, radius):
+        """A lower bound on the distance to any point outside the scanned square."""
+        bounds = []
+        south, north = (row - radius) * self.cell - 90, (row + radius + 1) * self.cell - 90
+        if south > -90:
+            bounds.append(math.radians(lat - south) * EARTH_RADIUS_KM)
+        if north < 90:
+            bounds.append(math.radians(north - lat) * EARTH_RADIUS_KM)
+        if 2 * radius + 1 < self.columns:
+            west, east = (column - radius) * self.cell - 180, (column + radius + 1) * self.cell - 180
+            lon = (lon + 180) % 360 - 180
+            gap = math.radians(min(min(lon - west, east - lon), 90))
+            bounds.append(math.asin(math.cos(math.radians(lat)) * math.sin(gap)) * EARTH_RADIUS_KM)
+        return min(bounds) if bounds else math.inf
+
+    def nearest(self, lat, lon, k):
+        """Return ``(ids, distances_km)`` of the ``k`` points nearest to (lat, lon), closest first."""
+        if len(self) <= k:
+            return self.scan(lat, lon, k)
+        row, column = int(self.row_of(lat)), int(self.column_of(lon))
+        lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+        found = np.empty(0, dtype=np.int64)
+        distances = np.empty(0)
+        for radius in range(MAX_RINGS + 1):
+            positions = self.ring(row, column, radius)
+            if len(positions):
+                if 2 * radius + 1 > self.columns:
+                    # The square wraps onto cells it has already scanned
+                    positions = np.setdiff1d(positions, found)
+                found = np.concatenate([found, positions])
+                distances = np.concatenate([
+                    distances, haversine_km(lat_rad, lon_rad, self.lats[positions], self.lons[positions])
+                ])
+                if len(found) > k:
+                    nearest = np.argpartition(distances, k - 1)[:k]
+                    found, distances = found[nearest], distances[nearest]
+            if len(found) == k and distances.max() <= self.outside_km(lat, lon, row, column, radius):
+                order = np.argsort(distances, kind='stable')
+                return self.ids[found[order]], distances[order]
+        return self.scan(lat, lon, k)
+
+    def scan(self, lat, lon, k):
+        """``nearest()`` by measuring the distance to every point."""
+        distances = haversine_km(math.radians(lat), math.radians(lon), self.lats, self.lons)
+        if len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+        else:
+            nearest = np.arange(len(distances))
+        order = nearest[np.argsort(distances[nearest], kind='stable')]
+        return self.ids[order], distances[order]
+
+
+class HospitalIndex:
+    """Grids over every hospital and over those with an emergency department."""
+
+    def __init__(self, ids, lats, lons, emergency, cell_degrees):
+        self.all = GridIndex(ids, lats, lons, cell_degrees)
+        self.emergency = GridIndex(ids[emergency], lats[emergency], lons[emergency], cell_degrees)
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, cell_degrees=None):
+        rows = Hospital.objects.values_list('id', 'latitude', 'longitude', 'has_emergency')
+        ids, lats, lons, emergency = zip(*rows) if rows else ((), (), (), ())
+        return cls(
+            np.array(ids, dtype=np.int64), np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64),
+            np.array(emergency, dtype=bool), cell_degrees or settings.HOSPITAL_SEARCH['CELL_DEGREES']
+        )
+
+    def nearest(self, lat, lon, k, emergency=False):
+        return (self.emergency if emergency else self.all).nearest(lat, lon, k)
+
+
+def get_hospital_index():
+    global _index
+    max_age = settings.HOSPITAL_SEARCH['MAX_AGE']
+    if _index is None or time.monotonic() - _index.loaded_at > max_age:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index.loaded_at > max_age:
+                _index = HospitalIndex.load()
+    return _index
+
+
+def reload_hospital_index():
+    global _index
+    with _index_lock:
+        _index = HospitalIndex.load()
+    return _index
+
+
+def nearest_hospitals(lat, lon, k=10, emergency=False):
+    """Return ``[(hospital, distance_km)]`` for the ``k`` hospitals nearest to (lat, lon)."""
+    ids, distances = get_hospital_index().nearest(lat, lon, k, emergency)
+    hospitals = Hospital.objects.in_bulk(ids.tolist())
+    return [
+        (hospitals[hospital_id], float(distance))
+        for hospital_id, distance in zip(ids.tolist(), distances)
+        if hospital_id in hospitals
+    ]
@@ -0,0 +1,73 @@
+"""
+The family health dashboard: every member of a household with their report
+count, latest analysis and recent emergency alerts.
+
+Adding someone to a household only invites them. Until they accept, they
+are left off the dashboard and cannot open it themselves.
+
+Whatever the household's size the dashboard takes four queries: the
+household (checking the viewer belongs to it), the members with their
+counts and latest analysed report as correlated subqueries, the latest
+analyses by primary key, and the recent alerts of every member through
+one windowed prefetch.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import EmergencyAlert, Household, HouseholdMember, MedicalReport, ReportAnalysis
+
+# Alerts shown per member
+ALERT_HISTORY = 5
+
+MAX_MEMBERS = 50
+
+ANALYSIS_FIELDS = ('id', 'report_id', 'analysis_text', 'health_tips', 'source', 'created_at', 'report__title')
+
+
+def household_for(user, household_id):
+    """The household, or None unless ``user`` has accepted to be one of its members."""
+    return Household.objects.filter(
+        id=household_id, members__user=user, members__accepted_at__isnull=False
+    ).first()
+
+
+def count_of(queryset, field):
+    """A correlated ``COUNT(*)`` of ``queryset`` grouped on ``field``, 0 when empty."""
+    counts = queryset.order_by().values(field).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def dashboard_members(household):
+    """
+    The household's accepted members, each annotated with ``report_count``,
+    ``last_report_at``, ``alert_count``, ``latest_analysis`` (or None) and
+    ``user.recent_alerts`` (newest first).
+    """
+    reports = MedicalReport.objects.filter(user=OuterRef('user_id'))
+    newest_reports = reports.order_by('-uploaded_at', '-id')
+    members = list(
+        HouseholdMember.objects
+        .filter(household=household, accepted_at__isnull=False)
+        .select_related('user')
+        .only('id', 'relationship', 'role', 'joined_at', 'user__id', 'user__username',
+              'user__first_name', 'user__last_name')
+        .annotate(
+            report_count=count_of(reports, 'user'),
+            last_report_at=Subquery(newest_reports.values('uploaded_at')[:1]),
+            latest_report_id=Subquery(newest_reports.filter(reportanalysis__isnull=False).values('id')[:1]),
+            alert_count=count_of(EmergencyAlert.objects.filter(user=OuterRef('user_id')), 'user'),
+        )
+        .prefetch_related(Prefetch(
+            'user__emergencyalert_set',
+            # Sliced per user with a window function, not per member queries
+            queryset=EmergencyAlert.objects.order_by('-created_at', '-id')[:ALERT_HISTORY],
+            to_attr='recent_alerts',
+        ))
+        .order_by('joined_at', 'id')[:MAX_MEMBERS]
+    )
+
+    analyses = ReportAnalysis.objects.select_related('report').only(*ANALYSIS_FIELDS).in_bulk(
+        [member.latest_report_id for member in members if member.latest_report_id], field_name='report_id'
+    )
+    for member in members:
+        member.latest_analysis = analyses.get(member.latest_report_id)
+    return members
@@ -0,0 +1,254 @@
+"""
+Local extraction of lab values from report text.
+
+Standard panels (CBC, lipid profile, diabetes, thyroid, kidney) are read
+with one compiled pattern over every analyte alias, values are converted to
+a canonical unit, and all of them are checked against their reference
+ranges in a single vectorized comparison. A report with enough recognized
+values is analyzed here without calling the model.
+"""
+import re
+import numpy as np
+
+# canonical name: label, panel, canonical unit, default reference range,
+# aliases, unit conversion factors to the canonical unit, and tips for
+# values below / above the range
+ANALYTES = {
+    'hemoglobin': {
+        'label': 'Haemoglobin', 'panel': 'CBC', 'unit': 'g/dL', 'range': (12.0, 17.5),
+        'aliases': ['haemoglobin', 'hemoglobin', 'hgb', 'hb'],
+        'units': {'g/dl': 1, 'gm/dl': 1, 'gm%': 1, 'g%': 1, 'g/l': 0.1},
+        'tips': ('Include iron-rich foods such as leafy greens, lentils, jaggery and dates, with vitamin C to help absorption',
+                 'High haemoglobin can come with dehydration; drink enough water and discuss the result with your doctor'),
+    },
+    'rbc': {
+        'label': 'RBC Count', 'panel': 'CBC', 'unit': 'million/uL', 'range': (4.2, 5.9),
+        'aliases': ['total rbc count', 'rbc count', 'red blood cells', 'rbc'],
+        'units': {'million/ul': 1, 'million/cumm': 1, 'mill/cumm': 1, 'x10^6/ul': 1, 'x10^12/l': 1, '10^6/ul': 1},
+        'tips': ('A low red cell count may point to anaemia; eat iron, folate and B12 rich foods',
+                 'A high red cell count should be reviewed by a doctor, especially if you smoke'),
+    },
+    'wbc': {
+        'label': 'WBC Count', 'panel': 'CBC', 'unit': 'x10^3/uL', 'range': (4.0, 11.0),
+        'aliases': ['total wbc count', 'total leucocyte count', 'total leukocyte count', 'wbc count', 'tlc', 'wbc'],
+        'units': {'x10^3/ul': 1, '10^3/ul': 1, 'k/ul': 1, 'x10^9/l': 1, '/cumm': 0.001, 'cells/cumm': 0.001, '/ul': 0.001, 'cells/ul': 0.001},
+        'tips': ('A low white cell count can lower immunity; avoid sick contacts and eat protein-rich meals',
+                 'A high white cell count often means an infection; see a doctor if you have fever or pain'),
+    },
+    'platelets': {
+        'label': 'Platelet Count', 'panel': 'CBC', 'unit': 'x10^3/uL', 'range': (150.0, 400.0),
+        'aliases': ['platelet count', 'platelets', 'plt'],
+        'units': {'x10^3/ul': 1, '10^3/ul': 1, 'k/ul': 1, 'x10^9/l': 1, 'lakhs/cumm': 100, 'lakh/cumm': 100, 'lakhs': 100, '/cumm': 0.001, '/ul': 0.001},
+        'tips': ('Low platelets raise the risk of bleeding; avoid painkillers like aspirin unless prescribed',
+                 'High platelets should be reviewed by a doctor'),
+    },
+    'hematocrit': {
+        'label': 'Haematocrit (PCV)', 'panel': 'CBC', 'unit': '%', 'range': (36.0, 50.0),
+        'aliases': ['packed cell volume', 'haematocrit', 'hematocrit', 'pcv', 'hct'],
+        'units': {'%': 1},
+        'tips': ('A low haematocrit often goes with anaemia; eat iron-rich foods',
+                 'A high haematocrit can come with dehydration; drink enough water'),
+    },
+    'glucose_fasting': {
+        'label': 'Fasting Blood Sugar', 'panel': 'Diabetes', 'unit': 'mg/dL', 'range': (70.0, 100.0),
+        'aliases': ['fasting blood sugar', 'fasting blood glucose', 'fasting plasma glucose', 'fasting glucose', 'fbs', 'fbg'],
+        'units': {'mg/dl': 1, 'mmol/l': 18.016},
+        'tips': ('Low blood sugar: eat regular meals and keep a quick source of sugar at hand',
+                 'Cut down on sugar and refined carbohydrates, and walk for 30 minutes after meals'),
+    },
+    'glucose_pp': {
+        'label': 'Post Prandial Blood Sugar', 'panel': 'Diabetes', 'unit': 'mg/dL', 'range': (70.0, 140.0),
+        'aliases': ['post prandial blood sugar', 'postprandial blood sugar', 'post prandial glucose', 'ppbs', 'ppbg'],
+        'units': {'mg/dl': 1, 'mmol/l': 18.016},
+        'tips': ('Low blood sugar after meals should be discussed with your doctor',
+                 'Eat smaller meals with more fibre and walk after eating to lower sugar spikes'),
+    },
+    'hba1c': {
+        'label': 'HbA1c', 'panel': 'Diabetes', 'unit': '%', 'range': (4.0, 5.6),
+        'aliases': ['glycated haemoglobin', 'glycated hemoglobin', 'glycosylated hemoglobin', 'hba1c', 'a1c'],
+        'units': {'%': 1},
+        'tips': ('A low HbA1c is rarely a concern; mention it to your doctor',
+                 'Your average blood sugar is raised; limit sweets, stay active and get checked for diabetes'),
+    },
+    'total_cholesterol': {
+        'label': 'Total Cholesterol', 'panel': 'Lipid profile', 'unit': 'mg/dL', 'range': (0.0, 200.0),
+        'aliases': ['total cholesterol', 'serum cholesterol', 'cholesterol total', 'cholesterol'],
+        'units': {'mg/dl': 1, 'mmol/l': 38.67},
+        'tips': ('Very low cholesterol should be discussed with your doctor',
+                 'Reduce fried and processed foods, prefer whole grains, nuts and fish, and exercise regularly'),
+    },
+    'ldl': {
+        'label': 'LDL Cholesterol', 'panel': 'Lipid profile', 'unit': 'mg/dL', 'range': (0.0, 100.0),
+        'aliases': ['ldl cholesterol', 'ldl-c', 'ldl'],
+        'units': {'mg/dl': 1, 'mmol/l': 38.67},
+        'tips': ('Low LDL is generally good',
+                 'Lower saturated fats (ghee, butter, red meat) and add oats, beans and more fibre to your diet'),
+    },
+    'hdl': {
+        'label': 'HDL Cholesterol', 'panel': 'Lipid profile', 'unit': 'mg/dL', 'range': (40.0, 100.0),
+        'aliases': ['hdl cholesterol', 'hdl-c', 'hdl'],
+        'units': {'mg/dl': 1, 'mmol/l': 38.67},
+        'tips': ('Raise your "good" cholesterol with regular aerobic exercise and by avoiding smoking',
+                 'High HDL is generally good'),
+    },
+    'triglycerides': {
+        'label': 'Triglycerides', 'panel': 'Lipid profile', 'unit': 'mg/dL', 'range': (0.0, 150.0),
+        'aliases': ['triglycerides', 'triglyceride', 'tg'],
+        'units': {'mg/dl': 1, 'mmol/l': 88.57},
+        'tips': ('Low triglycerides are generally not a concern',
+                 'Cut down on sugar, sweet drinks and alcohol to bring triglycerides down'),
+    },
+    'tsh': {
+        'label': 'TSH', 'panel': 'Thyroid', 'unit': 'mIU/L', 'range': (0.4, 4.0),
+        'aliases': ['thyroid stimulating hormone', 'tsh'],
+        'units': {'miu/l': 1, 'uiu/ml': 1, 'mu/l': 1, 'miu/ml': 1000},
+        'tips': ('A low TSH can mean an overactive thyroid; see a doctor if you have palpitations or weight loss',
+                 'A high TSH can mean an underactive thyroid; consult a doctor and use iodised salt'),
+    },
+    't3': {
+        'label': 'T3', 'panel': 'Thyroid', 'unit': 'ng/dL', 'range': (80.0, 200.0),
+        'aliases': ['total t3', 'triiodothyronine', 't3'],
+        'units': {'ng/dl': 1, 'nmol/l': 65.1},
+        'tips': ('A low T3 should be reviewed together with your TSH by a doctor',
+                 'A high T3 should be reviewed together with your TSH by a doctor'),
+    },
+    't4': {
+        'label': 'T4', 'panel': 'Thyroid', 'unit': 'ug/dL', 'range': (5.0, 12.0),
+        'aliases': ['total t4', 'thyroxine', 't4'],
+        'units': {'ug/dl': 1, 'mcg/dl': 1, 'nmol/l': 0.0777},
+        'tips': ('A low T4 should be reviewed together with your TSH by a doctor',
+                 'A high T4 should be reviewed together with your TSH by a doctor'),
+    },
+    'creatinine': {
+        'label': 'Serum Creatinine', 'panel': 'Kidney function', 'unit': 'mg/dL', 'range': (0.6, 1.3),
+        'aliases': ['serum creatinine', 'creatinine'],
+        'units': {'mg/dl': 1, 'umol/l': 1 / 88.4},
+        'tips': ('Low creatinine is usually linked to low muscle mass and is rarely a concern',
+                 'Drink enough water, limit salt and painkillers, and have your kidney function reviewed'),
+    },
+    'urea': {
+        'label': 'Blood Urea', 'panel': 'Kidney function', 'unit': 'mg/dL', 'range': (15.0, 45.0),
+        'aliases': ['blood urea nitrogen', 'blood urea', 'bun', 'urea'],
+        'units': {'mg/dl': 1, 'mmol/l': 6.006},
+        'tips': ('Low urea can come with a low-protein diet',
+                 'Drink enough water and moderate protein intake until a doctor reviews your kidney function'),
+    },
+}
+
+# Aliases longest first, so 'ldl cholesterol' wins over 'cholesterol' and
+# the alternation behaves like a trie lookup
+_ALIASES = {
+    alias: name
+    for name, analyte in ANALYTES.items()
+    for alias in analyte['aliases']
+}
+
+# Aliases that are also ordinary words or abbreviations ("bun", "tg"): they
+# only count directly followed by a value in one of the analyte's units
+CONTEXT_ALIASES = frozenset(['hb', 'plt', 'tg', 'bun'])
+SEPARATOR_NOTE = re.compile(r'[\s:=.\-]*')
+
+LAB_LINE_PATTERN = re.compile(
+    r'(?<![a-z0-9])(?P<name>' + '|'.join(re.escape(a) for a in sorted(_ALIASES, key=len, reverse=True)) + r')(?![a-z0-9])'
+    # Method or specimen notes between the name and the value, which may
+    # carry a collection date: "(collected 12/03/2024)"
+    r'(?P<note>(?:[^0-9\n]|\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}){0,40}?)'
+    # A number running on into "/03" or "-17" is a date or a range, not a value
+    r'(?P<value>\d+(?:\.\d+)?)(?!\d|[/.-]\d)'
+    r'[ \t]*(?P<unit>[a-zµμ%/^*0-9.]*[a-zµμ%])?'
+    # Optional printed reference range: "13.0 - 17.0" or "< 200"
+    r'(?:[ \t:]*(?:(?P<low>\d+(?:\.\d+)?)[ \t]*(?:-|to)[ \t]*(?P<high>\d+(?:\.\d+)?)|<[ \t]*(?P<below>\d+(?:\.\d+)?)))?',
+    re.IGNORECASE
+)
+
+
+def normalize_unit(unit):
+    if not unit:
+        return ''
+    unit = unit.lower().replace('µ', 'u').replace('μ', 'u').replace('*', '').replace(' ', '')
+    return unit.replace('cu.mm', 'cumm').replace('mm3', 'cumm').rstrip('.')
+
+
+def parse_lab_values(text):
+    """
+    Return one dict per recognized value: ``name``, ``value`` in the
+    canonical unit, ``unit``, ``low`` and ``high``. The range printed on the
+    report is preferred over the default one. Values in unknown units are
+    skipped rather than guessed.
+    """
+    values = {}
+    position = 0
+    while (match := LAB_LINE_PATTERN.search(text, position)) is not None:
+        position = match.end()
+        alias = match.group('name').lower()
+        unit = normalize_unit(match.group('unit'))
+        if alias in CONTEXT_ALIASES and (not unit or not SEPARATOR_NOTE.fullmatch(match.group('note'))):
+            # Not a lab value, but a real name may follow ("Hb (Haemoglobin) 13 g/dL")
+            position = match.end('name')
+            continue
+        name = _ALIASES[alias]
+        if name in values or 'ratio' in match.group('note').lower():
+            continue
+        analyte = ANALYTES[name]
+        factor = analyte['units'].get(unit, 1 if not unit else None)
+        if factor is None:
+            continue
+
+        low, high = analyte['range']
+        if match.group('low') and match.group('high'):
+            low, high = float(match.group('low')) * factor, float(match.group('high')) * factor
+        elif match.group('below'):
+            low, high = 0.0, float(match.group('below')) * factor
+        values[name] = {
+            'name': name,
+            'value': float(match.group('value')) * factor,
+            'unit': analyte['unit'],
+            'low': low,
+            'high': high,
+        }
+    return list(values.values())
+
+
+def flag_values(lab_values):
+    """Mark each value 'low', 'normal' or 'high' in one vectorized pass."""
+    if not lab_values:
+        return lab_values
+    values = np.fromiter((v['value'] for v in lab_values), dtype=np.float64, count=len(lab_values))
+    lows = np.fromiter((v['low'] for v in lab_values), dtype=np.float64, count=len(lab_values))
+    highs = np.fromiter((v['high'] for v in lab_values), dtype=np.float64, count=len(lab_values))
+    flags = np.where(values < lows, 0, np.where(values > highs, 2, 1))
+    for lab_value, flag in zip(lab_values, flags):
+        lab_value['flag'] = ('low', 'normal', 'high')[flag]
+    return lab_values
+
+
+def format_number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def build_lab_analysis(lab_values, general_tips):
+    """Build ``analysis_text`` and ``health_tips`` from flagged lab values."""
+    panels = list(dict.fromkeys(ANALYTES[v['name']]['panel'] for v in lab_values))
+    abnormal = [v for v in lab_values if v['flag'] != 'normal']
+
+    lines = []
+    for i, v in enumerate(lab_values, 1):
+        analyte = ANALYTES[v['name']]
+        status = 'normal' if v['flag'] == 'normal' else v['flag'].upper()
+        lines.append(
+            f"{i}. {analyte['label']}: {format_number(v['value'])} {v['unit']} "
+            f"({status}, reference {format_number(v['low'])}-{format_number(v['high'])})"
+        )
+    if abnormal:
+        summary = f"{len(abnormal)} of {len(lab_values)} values are outside the reference range. Please review them with your doctor."
+    else:
+        summary = f"All {len(lab_values)} values are within the reference range."
+    analysis_text = "Analysis Results:\n\nLab values found ({}):\n{}\n\n{}".format(
+        ', '.join(panels), '\n'.join(lines), summary
+    )
+
+    tips = [ANALYTES[v['name']]['tips'][0 if v['flag'] == 'low' else 1] for v in abnormal]
+    tips = list(dict.fromkeys(tips))
+    tips += general_tips[:max(0, 5 - len(tips))]
+    health_tips = '\n'.join(f"{i}. {tip}" for i, tip in enumerate(tips, 1))
+    return analysis_text, health_tips
@@ -0,0 +1,211 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.test import override_settings
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Summarize latencies in seconds as milliseconds."""
+    return {
+        'n': len(samples),
+        'p50': percentile(samples, 50) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'mean': (sum(samples) / len(samples) * 1000) if samples else 0.0,
+    }
+
+
+def format_summary(label, samples):
+    stats = summarize(samples)
+    return f"{label:<24} n={stats['n']:<6} p50={stats['p50']:9.2f}ms  p99={stats['p99']:9.2f}ms  mean={stats['mean']:9.2f}ms"
+
+
+def semantic_cache_disabled():
+    """Settings under which new ``AIHandler``s skip the semantic cache."""
+    return override_settings(AI_SEMANTIC_CACHE=dict(settings.AI_SEMANTIC_CACHE, ENABLED=False))
+
+
+STUB_ANALYSIS = {
+    'identified_symptoms': [{'symptom': 'headache', 'severity': 'Low'}],
+    'possible_conditions': ['tension headache'],
+    'recommended_action': 'self-care',
+    'additional_notes': 'Consult a doctor if it persists.',
+}
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubStreamResponse:
+    def __init__(self, model, text):
+        self.model = model
+        self.text = text
+
+    async def __aiter__(self):
+        words = self.text.split(' ')
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.model.token_delay)
+            yield StubResponse(word if i == 0 else ' ' + word)
+
+
+class StubChat:
+    def __init__(self, model):
+        self.model = model
+        self.last = None
+
+    def reply_for(self, prompt):
+        self.model.calls += 1
+        if 'Analyze this message' in prompt:
+            return json.dumps(STUB_ANALYSIS)
+        if '"symptom_analysis"' in prompt:
+            return json.dumps({'response': self.model.answer, 'symptom_analysis': STUB_ANALYSIS})
+        return self.model.answer
+
+    def send_message(self, prompt):
+        text = self.reply_for(prompt)
+        # A blocking call returns only once every token has been generated
+        self.model.sleep(len(text.split(' ')))
+        self.last = StubResponse(text)
+        return self.last
+
+    async def send_message_async(self, prompt, stream=False):
+        text = self.reply_for(prompt)
+        if stream:
+            await asyncio.sleep(self.model.latency())
+            return StubStreamResponse(self.model, text)
+        await asyncio.sleep(self.model.latency(len(text.split(' '))))
+        return StubResponse(text)
+
+
+class StubChatModel:
+    """Stand-in for ``genai.GenerativeModel`` with an injected delay."""
+
+    def __init__(self, delay=0.2, jitter=0.05, token_delay=0.0, answer='Stub answer.'):
+        self.delay = delay
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.answer = answer
+        self.calls = 0
+
+    def latency(self, tokens=1):
+        return max(0.0, random.gauss(self.delay, self.jitter)) + self.token_delay * (tokens - 1)
+
+    def sleep(self, tokens=1):
+        time.sleep(self.latency(tokens))
+
+    def start_chat(self, history=None):
+        return StubChat(self)
+
+
+SAMPLE_REPORT_LINES = [
+    'COMPLETE BLOOD COUNT',
+    'Haemoglobin 13.5 g/dL 13.0 - 17.0',
+    'Total WBC Count 7200 /cumm 4000 - 11000',
+    'Platelet Count 2.5 lakhs/cumm 1.5 - 4.0',
+    'Fasting Blood Sugar 112 mg/dL 70 - 100',
+    'Serum Creatinine 0.9 mg/dL 0.7 - 1.3',
+    'Total Cholesterol 215 mg/dL < 200',
+]
+
+
+def write_text_pdf(path, pages, lines=SAMPLE_REPORT_LINES):
+    """Write a PDF with a real text layer, one copy of ``lines`` per page."""
+    def escape(text):
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in once the page ids are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    page_ids = []
+    for number in range(pages):
+        body = ' '.join(f'({escape(line)}) Tj T*' for line in [f'Page {number + 1}'] + list(lines))
+        stream = f'BT /F1 11 Tf 14 TL 72 720 Td {body} ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {pages} >>'.encode()
+
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b'%d 0 obj\n%s\nendobj\n' % (number, obj))
+        xref = f.tell()
+        f.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b'%010d 00000 n \n' % offset)
+        f.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+
+
+# (latitude, longitude, share of the hospitals) around which facilities are seeded
+INDIA_CITIES = [
+    (28.61, 77.21, 0.12), (19.08, 72.88, 0.12), (12.97, 77.59, 0.09), (13.08, 80.27, 0.08),
+    (22.57, 88.36, 0.08), (17.39, 78.49, 0.07), (18.52, 73.86, 0.06), (23.02, 72.57, 0.05),
+    (26.91, 75.79, 0.04), (26.85, 80.95, 0.04), (21.15, 79.09, 0.03), (25.59, 85.14, 0.03),
+    (30.73, 76.78, 0.03), (9.93, 76.27, 0.03), (11.02, 76.96, 0.02), (34.08, 74.80, 0.01),
+]
+# Rural facilities spread over the rest of the country
+RURAL_SHARE = 0.10
+INDIA_BOUNDS = ((8.0, 35.0), (68.0, 97.0))
+
+
+def hospital_points(rng, count):
+    """``(latitude, longitude)`` of ``count`` facilities, mostly clustered around big cities."""
+    points = []
+    for _ in range(count):
+        if rng.random() < RURAL_SHARE:
+            (south, north), (west, east) = INDIA_BOUNDS
+            points.append((rng.uniform(south, north), rng.uniform(west, east)))
+        else:
+            lat, lon, _ = rng.choices(INDIA_CITIES, weights=[city[2] for city in INDIA_CITIES])[0]
+            points.append((rng.gauss(lat, 0.15), rng.gauss(lon, 0.15)))
+    return points
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run the body against a freshly migrated throwaway database, never the
+    configured one. SQLite uses a temporary file so large seeds do not have
+    to fit in memory.
+    """
+    from django.db import connection
+
+    workdir = None
+    if connection.vendor == 'sqlite':
+        workdir = tempfile.mkdtemp()
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,38 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main.report_anchoring import AnchorError, anchor_pending, cut_batches, get_anchor
+
+
+class Command(BaseCommand):
+    help = 'Anchor the reports of every closed window on chain as Merkle roots, one transaction per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--now', action='store_true', help='Also batch reports of the current, still open window')
+        parser.add_argument('--loop', action='store_true', help='Keep running, once per window')
+
+    def handle(self, *args, **options):
+        try:
+            get_anchor()
+        except (ImportError, AnchorError) as e:
+            raise CommandError(f'No chain to anchor to: {e}')
+        while True:
+            self.run_once(options['now'])
+            if not options['loop']:
+                return
+            window = settings.REPORT_ANCHORING['WINDOW']
+            time.sleep(window - time.time() % window + 1)
+
+    def run_once(self, include_open_window):
+        batches = cut_batches(until=timezone.now() if include_open_window else None)
+        for batch in batches:
+            self.stdout.write(f"Batched {batch.leaf_count} report hashes under {batch.root}")
+        for batch in anchor_pending():
+            if batch.status == 'anchored':
+                self.stdout.write(
+                    f"Anchored {batch.root} in block {batch.block_number} "
+                    f"(tx {batch.tx_hash or 'sent earlier'}, gas {batch.gas_used})"
+                )
+            else:
+                self.stderr.write(f"Anchoring {batch.root} failed (attempt {batch.attempts}): {batch.last_error}")
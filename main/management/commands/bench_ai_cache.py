@@ -0,0 +1,47 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from main.ai_cache import ResponseCache
+from main.ai_handler import AIHandler
+from main.symptom_checker import SymptomChecker
+from ._bench import StubChatModel, format_summary, semantic_cache_disabled
+
+FAQ = [
+    'How do I add an emergency contact?',
+    'how do i add an emergency contact',
+    'I have a headache',
+    'How can I upload my medical report?',
+    'Where can I find nearby hospitals?',
+    'What does the SOS button do?',
+]
+
+
+class Command(BaseCommand):
+    help = 'Replay FAQ-style chat traffic through the AI response cache against a stub model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--delay', type=float, default=0.05, help='Stub model latency in seconds')
+        parser.add_argument('--backend', choices=['local', 'django'], default='local')
+
+    def handle(self, *args, **options):
+        model = StubChatModel(options['delay'], 0.0)
+        cache = ResponseCache(backend=options['backend'], ttl=3600)
+        cache.clear()
+        with semantic_cache_disabled():
+            ai_handler = AIHandler(model=model, cache=cache)
+        symptom_checker = SymptomChecker(model=model, cache=cache)
+
+        misses, hits = [], []
+        for _ in range(options['requests']):
+            message = random.choice(FAQ)
+            calls = model.calls
+            started = time.perf_counter()
+            symptom_checker.check_symptoms(message)
+            ai_handler.get_response(message)
+            elapsed = time.perf_counter() - started
+            (hits if model.calls == calls else misses).append(elapsed)
+
+        self.stdout.write(format_summary('miss (model call)', misses))
+        self.stdout.write(format_summary('hit', hits))
+        self.stdout.write(f"cache stats: {cache.stats()}  model_calls={model.calls}")
@@ -0,0 +1,120 @@
+import asyncio
+import copy
+import gc
+import threading
+import time
+import tracemalloc
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client, override_settings
+from django.utils import timezone
+from main.alert_events import AlertEventsApp, get_broker, publish_alert
+from main.models import EmergencyAlert
+from ._bench import format_summary, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Hold thousands of idle alert event streams on one ASGI event loop and time a status change reaching them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000)
+        parser.add_argument('--alerts', type=int, default=100, help='Alerts the subscribers are spread over')
+        parser.add_argument('--idle', type=float, default=2.0, help='Seconds to hold the streams idle')
+        parser.add_argument('--apps', default='django,asgi', help='The Django view and/or the ASGI app in front of it')
+
+    def handle(self, *args, **options):
+        config = copy.deepcopy(settings.EMERGENCY_ALERTS)
+        config['EVENTS']['OPTIONS'] = dict(config['EVENTS'].get('OPTIONS', {}), max_subscribers=options['subscribers'])
+        with scratch_database(), override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], EMERGENCY_ALERTS=config):
+            user = User.objects.create(username='bench')
+            client = Client()
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            alerts = EmergencyAlert.objects.bulk_create([
+                EmergencyAlert(alert_type='family', user=user, status='sending') for _ in range(options['alerts'])
+            ])
+            django_application = get_asgi_application()
+            applications = {'django': django_application, 'asgi': AlertEventsApp(django_application)}
+            for name in options['apps'].split(','):
+                EmergencyAlert.objects.filter(id__in=[alert.id for alert in alerts]).update(status='sending')
+                for alert in alerts:
+                    alert.status = 'sending'
+                self.stdout.write(f"== {name}")
+                asyncio.run(self.run(applications[name], cookie, alerts, options))
+                close_old_connections()
+
+    async def run(self, application, cookie, alerts, options):
+        count = options['subscribers']
+        streams = [Stream(application, cookie, alerts[i % len(alerts)].id) for i in range(count)]
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(stream.run()) for stream in streams]
+        while sum(len(stream.events) for stream in streams) < count:
+            await asyncio.sleep(0.05)
+        connected = time.perf_counter() - started
+        await asyncio.sleep(options['idle'])
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{count} streams open in {connected:.1f}s, {get_broker().stats()['subscribers']} subscribed; "
+            f"idle for {options['idle']}s holding {held / 1024 / 1024:.1f}MB ({held / count / 1024:.1f}KB per stream) "
+            f"and {threading.active_count()} threads"
+        )
+
+        # Finish every alert from a worker thread, as the fan-out does
+        def finish():
+            published = time.perf_counter()
+            for alert in alerts:
+                alert.status = 'completed'
+                alert.completed_at = timezone.now()
+                publish_alert(alert)
+            return published
+
+        published = await asyncio.to_thread(finish)
+        await asyncio.wait_for(asyncio.gather(*tasks), 60)
+        self.stdout.write(format_summary('publish to client', [stream.finished - published for stream in streams]))
+        self.stdout.write(
+            f"{sum(stream.status == 200 for stream in streams)}/{count} streams ended with the final status, "
+            f"{get_broker().stats()['subscribers']} still subscribed"
+        )
+
+
+class Stream:
+    """One SSE client talking to the ASGI application in-process."""
+
+    def __init__(self, application, cookie, alert_id):
+        self.application = application
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': f'/emergency-alerts/{alert_id}/events/', 'raw_path': b'',
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        }
+        self.requested = False
+        self.status = None
+        self.events = []
+        self.finished = None
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Never disconnects
+        await asyncio.Event().wait()
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message.get('body', b'').startswith(b'event:'):
+            self.events.append(message['body'])
+            self.finished = time.perf_counter()
+
+    async def run(self):
+        await self.application(self.scope, self.receive, self.send)
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from main.ai_cache import ResponseCache
+from main.ai_handler import AIHandler
+from main.symptom_checker import SymptomChecker
+from main.chat_pipeline import CHAT_MODES, run_chat
+from ._bench import StubChatModel, format_summary, semantic_cache_disabled
+
+MESSAGES = [
+    'How do I add an emergency contact?',
+    'I have a headache and a mild fever since yesterday',
+    'How can I upload my medical report?',
+    'My chest hurts when I breathe deeply',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure process_chat latency per CHAT_MODE against a stub model with injected delay'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent requests in flight')
+        parser.add_argument('--delay', type=float, default=0.2, help='Mean model latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.05)
+        parser.add_argument('--modes', nargs='+', choices=CHAT_MODES, default=list(CHAT_MODES))
+
+    def handle(self, *args, **options):
+        for mode in options['modes']:
+            model = StubChatModel(options['delay'], options['jitter'])
+            with semantic_cache_disabled():
+                ai_handler = AIHandler(model=model, cache=ResponseCache(backend='none'))
+            symptom_checker = SymptomChecker(model=model, cache=ResponseCache(backend='none'))
+
+            def one_request(i):
+                started = time.perf_counter()
+                run_chat(MESSAGES[i % len(MESSAGES)], symptom_checker, ai_handler, mode=mode)
+                return time.perf_counter() - started
+
+            with ThreadPoolExecutor(max_workers=options['clients']) as clients:
+                samples = list(clients.map(one_request, range(options['requests'])))
+
+            self.stdout.write(
+                format_summary(mode, samples) + f"  model_calls={model.calls}"
+            )
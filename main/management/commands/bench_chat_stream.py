@@ -0,0 +1,53 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from main.ai_cache import ResponseCache
+from main.ai_handler import AIHandler
+from ._bench import StubChatModel, format_summary, semantic_cache_disabled
+
+ANSWER = ' '.join(['token'] * 60)
+
+
+class Command(BaseCommand):
+    help = 'Compare time-to-first-byte of blocking and streamed chat replies against a stub model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=500, help='Concurrent streams on one event loop')
+        parser.add_argument('--delay', type=float, default=0.3, help='Model latency before the first token')
+        parser.add_argument('--jitter', type=float, default=0.05)
+        parser.add_argument('--token-delay', type=float, default=0.02)
+
+    def handle(self, *args, **options):
+        model = StubChatModel(options['delay'], options['jitter'], options['token_delay'], ANSWER)
+        with semantic_cache_disabled():
+            ai_handler = AIHandler(model=model, cache=ResponseCache(backend='none'))
+
+        # Blocking path: the first byte is only sent once the reply is complete
+        blocking = []
+        for _ in range(20):
+            started = time.perf_counter()
+            ai_handler.get_response('How do I upload a report?')
+            blocking.append(time.perf_counter() - started)
+        self.stdout.write(format_summary('blocking ttfb', blocking))
+
+        first_token, complete = [], []
+
+        async def one_stream():
+            started = time.perf_counter()
+            first = None
+            async for _ in ai_handler.astream_response('How do I upload a report?'):
+                if first is None:
+                    first = time.perf_counter() - started
+            first_token.append(first)
+            complete.append(time.perf_counter() - started)
+
+        async def run_streams():
+            await asyncio.gather(*(one_stream() for _ in range(options['streams'])))
+
+        started = time.perf_counter()
+        asyncio.run(run_streams())
+        wall = time.perf_counter() - started
+
+        self.stdout.write(format_summary('streamed ttfb', first_token))
+        self.stdout.write(format_summary('streamed complete', complete))
+        self.stdout.write(f"{options['streams']} concurrent streams on one event loop finished in {wall:.2f}s")
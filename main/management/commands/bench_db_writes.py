@@ -0,0 +1,148 @@
+import copy
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from main.analysis_queue import claim_job, finish_job
+from main.models import ReportAnalysis
+from ._bench import format_summary, scratch_database
+from .bench_report_search import analysis_texts
+
+# What settings.py used before the database profiles: stock backend,
+# rollback journal, default 5s busy timeout, a connection per request
+STOCK_SQLITE = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}
+
+
+class Command(BaseCommand):
+    help = 'Hammer the upload, emergency and listing views from concurrent clients under each database profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=60, help='Requests per client')
+        parser.add_argument('--workers', type=int, default=2, help='Analysis workers writing results meanwhile')
+        parser.add_argument('--profiles', default='stock,configured', help='stock (old SQLite settings) and/or configured')
+
+    def handle(self, *args, **options):
+        configured = connections.settings['default']
+        profiles = {'stock': dict(configured, **STOCK_SQLITE), 'configured': configured}
+        for name in options['profiles'].split(','):
+            self.stdout.write(f"== {name}: {profiles[name]['ENGINE']} {profiles[name]['OPTIONS']}")
+            self.run_profile(profiles[name], configured, options)
+
+    def run_profile(self, settings_dict, configured, options):
+        # Swap the default database for this profile; each client thread
+        # opens its own connection from these settings
+        connections['default'].close()
+        connections.settings['default'] = copy.deepcopy(settings_dict)
+        del connections['default']
+
+        opened = Counter()
+
+        def count_connection(sender, connection, **kwargs):
+            opened[connection.alias] += 1
+
+        connection_created.connect(count_connection)
+        try:
+            with scratch_database(), tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['testserver']):
+                users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['clients'])])
+                opened.clear()
+                started = time.perf_counter()
+                stop = threading.Event()
+                with ThreadPoolExecutor(options['clients'] + options['workers']) as pool:
+                    workers = [pool.submit(self.analysis_worker, f'bench-{i}', stop) for i in range(options['workers'])]
+                    results = list(pool.map(lambda user: self.client_session(user, options['requests']), users))
+                    elapsed = time.perf_counter() - started
+                    stop.set()
+                    results += [worker.result() for worker in workers]
+        finally:
+            connection_created.disconnect(count_connection)
+            connections['default'].close()
+            connections.settings['default'] = configured
+            del connections['default']
+
+        latencies, errors = {}, Counter()
+        for client_latencies, client_errors in results:
+            for kind, samples in client_latencies.items():
+                latencies.setdefault(kind, []).extend(samples)
+            errors.update(client_errors)
+        total = sum(len(samples) for samples in latencies.values())
+        self.stdout.write(
+            f"{total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s), "
+            f"{sum(errors.values())} failed, {opened['default']} connections opened"
+        )
+        for kind, samples in sorted(latencies.items()):
+            self.stdout.write(format_summary(kind, samples))
+        for message, count in errors.most_common(3):
+            self.stdout.write(f"  {count} x {message}")
+
+    def client_session(self, user, requests):
+        rng = random.Random(user.id)
+        client = Client()
+        client.force_login(user)
+        latencies, errors = {}, Counter()
+        try:
+            for i in range(requests):
+                kind = rng.choices(['upload', 'emergency', 'list'], weights=[5, 3, 2])[0]
+                started = time.perf_counter()
+                try:
+                    if kind == 'upload':
+                        body = f'{user.id}-{i}-{rng.random()}'.encode() * 32
+                        response = client.post('/upload-report/', {'report': SimpleUploadedFile(f'{i}.png', body)})
+                    elif kind == 'emergency':
+                        response = client.post(
+                            '/trigger-emergency/',
+                            json.dumps({'type': 'family', 'location': '12.97,77.59'}),
+                            content_type='application/json'
+                        )
+                    else:
+                        response = client.get('/reports/?limit=20')
+                    if response.status_code >= 400:
+                        errors[f"{kind}: {response.json().get('message')}"] += 1
+                except Exception as e:
+                    errors[f"{kind}: {e}"] += 1
+                finally:
+                    # The test client keeps connections open; a WSGI server
+                    # closes the obsolete ones at the end of every request
+                    close_old_connections()
+                latencies.setdefault(kind, []).append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+        return latencies, errors
+
+    def analysis_worker(self, worker_id, stop):
+        """Claim jobs and write their results like the analysis queue, without the OCR."""
+        rng = random.Random(worker_id)
+        texts = analysis_texts(rng, 20)
+        latencies, errors = {'analysis': []}, Counter()
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    job = claim_job(worker_id)
+                    if job is None:
+                        time.sleep(0.01)
+                        continue
+                    analysis_text, health_tips = rng.choice(texts)
+                    ReportAnalysis.objects.update_or_create(
+                        report=job.report,
+                        defaults={'analysis_text': analysis_text, 'health_tips': health_tips, 'source': 'local'}
+                    )
+                    finish_job(job)
+                except Exception as e:
+                    errors[f"analysis: {e}"] += 1
+                finally:
+                    close_old_connections()
+                latencies['analysis'].append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+        return latencies, errors
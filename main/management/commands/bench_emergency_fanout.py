@@ -0,0 +1,69 @@
+import copy
+import time
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from main.alert_fanout import contact_list, deliver_alert, plan_deliveries, plan_recipients
+from main.models import EmergencyAlert, EmergencyContact
+from ._bench import format_summary, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Measure time-to-all-notified for sequential and concurrent alert delivery over stub channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contacts', default='5,20,100', help='Comma separated contact counts (each has SMS and email)')
+        parser.add_argument('--alerts', type=int, default=20, help='Alerts per contact count, concurrent delivery')
+        parser.add_argument('--sequential-alerts', type=int, default=3)
+        parser.add_argument('--delay', type=float, default=0.3, help='Mean seconds per stub send')
+        parser.add_argument('--jitter', type=float, default=0.1)
+        parser.add_argument('--failure-rate', type=float, default=0.1)
+        parser.add_argument('--timeout', type=float, default=1.0, help='Per-attempt channel timeout')
+
+    def handle(self, *args, **options):
+        config = copy.deepcopy(settings.EMERGENCY_ALERTS)
+        stub = {'DELAY': options['delay'], 'JITTER': options['jitter'], 'FAILURE_RATE': options['failure_rate']}
+        config['CHANNELS'] = {
+            name: {
+                'BACKEND': 'main.alert_fanout.StubChannel',
+                'TIMEOUT': options['timeout'],
+                'ATTEMPTS': 3,
+                'OPTIONS': dict(stub, CONTACT_FIELD=field),
+            }
+            for name, field in (('sms', 'phone_number'), ('email', 'email'))
+        }
+        slo = config['SLO_SECONDS']
+        self.stdout.write(
+            f"stub send {options['delay']}s +/- {options['jitter']}s, {options['failure_rate']:.0%} failures, "
+            f"{options['timeout']}s timeout, 3 attempts, SLO {slo}s"
+        )
+
+        with scratch_database(), override_settings(EMERGENCY_ALERTS=config):
+            for count in (int(c) for c in options['contacts'].split(',')):
+                user = User.objects.create(username=f'bench{count}')
+                EmergencyContact.objects.bulk_create([
+                    EmergencyContact(user=user, name=f'Contact {i}', phone_number=f'98{i:08d}',
+                                     email=f'contact{i}@example.com', relationship='family')
+                    for i in range(count)
+                ])
+                recipients = plan_recipients(contact_list(user))
+                self.stdout.write(f"== {count} contacts ({len(recipients)} deliveries per alert)")
+                for label, alerts, concurrency in (
+                    ('sequential', options['sequential_alerts'], 1),
+                    ('concurrent', options['alerts'], None),
+                ):
+                    samples, completed = [], 0
+                    for _ in range(alerts):
+                        alert = EmergencyAlert.objects.create(alert_type='family', user=user, location='12.97,77.59')
+                        plan_deliveries(alert, recipients)
+                        started = time.perf_counter()
+                        alert = async_to_sync(deliver_alert)(alert.id, max_concurrency=concurrency)
+                        samples.append(time.perf_counter() - started)
+                        completed += alert.status == 'completed'
+                    within = sum(1 for seconds in samples if seconds <= slo)
+                    self.stdout.write(
+                        format_summary(label, samples)
+                        + f"  within SLO {within}/{alerts}, all delivered {completed}/{alerts}"
+                    )
@@ -0,0 +1,145 @@
+import copy
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.alert_fanout import (
+    CONTACT_FIELDS, deliver_alert, get_executor, plan_deliveries, plan_recipients, refresh_contact_list
+)
+from main.models import AlertDelivery, EmergencyAlert, EmergencyContact
+from main.views import trigger_emergency
+from ._bench import format_summary, scratch_database
+
+
+def deliver_planned(alert_id):
+    try:
+        async_to_sync(deliver_alert)(alert_id)
+    finally:
+        close_old_connections()
+
+
+def previous_trigger(request):
+    """The trigger view before contact lists were cached, reduced to its database work."""
+    data = json.loads(request.body)
+    alert = EmergencyAlert.objects.create(
+        alert_type=data['type'], location=data.get('location'), message=data.get('message', ''), user=request.user
+    )
+    contacts = list(EmergencyContact.objects.filter(user=request.user).values(*CONTACT_FIELDS))
+    deliveries = plan_deliveries(alert, plan_recipients(contacts))
+    if deliveries:
+        get_executor().submit(deliver_planned, alert.id)
+    else:
+        alert.status = 'failed'
+        alert.completed_at = timezone.now()
+        alert.save(update_fields=['status', 'completed_at'])
+    return JsonResponse({'status': 'success', 'alert_id': alert.id, 'deliveries': len(deliveries)})
+
+
+class Command(BaseCommand):
+    help = 'Measure emergency trigger latency from concurrent users: before and after caching contacts, then repeated presses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--triggers', type=int, default=50, help='Triggers per client')
+        parser.add_argument('--contacts', type=int, default=5, help='Contacts per user (each has SMS and email)')
+
+    def handle(self, *args, **options):
+        config = copy.deepcopy(settings.EMERGENCY_ALERTS)
+        config['EAGER'] = False
+        # Every trigger is meant to create an alert until the storm below
+        dedup_window = config['DEDUP_WINDOW']
+        config['DEDUP_WINDOW'] = 0
+        for name, field in (('sms', 'phone_number'), ('email', 'email')):
+            config['CHANNELS'][name] = {
+                'BACKEND': 'main.alert_fanout.StubChannel', 'TIMEOUT': 1.0, 'ATTEMPTS': 1,
+                'OPTIONS': {'CONTACT_FIELD': field},
+            }
+        views = (('previous', previous_trigger), ('cached contacts', trigger_emergency))
+
+        with scratch_database(), override_settings(EMERGENCY_ALERTS=config):
+            users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['clients'])])
+            EmergencyContact.objects.bulk_create([
+                EmergencyContact(user=user, name=f'Contact {i}', phone_number=f'98{i:08d}',
+                                 email=f'contact{i}@example.com', relationship='family')
+                for user in users for i in range(options['contacts'])
+            ])
+            # Steady state: every list was cached when its contacts were saved
+            caches[config['CACHE_ALIAS']].clear()
+            for user in users:
+                refresh_contact_list(user)
+            self.stdout.write(
+                f"{options['clients']} concurrent users x {options['triggers']} triggers, "
+                f"{options['contacts']} contacts each"
+            )
+            for label, view in views:
+                with CaptureQueriesContext(connection) as queries:
+                    view(self.trigger_request(users[0]))
+                self.wait_for_deliveries()
+                writes = sum(1 for query in queries if not query['sql'].lstrip().upper().startswith('SELECT'))
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(options['clients']) as pool:
+                    results = list(pool.map(lambda user: self.client_session(view, user, options['triggers']), users))
+                elapsed = time.perf_counter() - started
+                samples = [sample for client_samples, _ in results for sample in client_samples]
+                failed = sum(client_failed for _, client_failed in results)
+                self.stdout.write(
+                    format_summary(label, samples)
+                    + f"  {len(samples) / elapsed:.0f}/s, {failed} failed, {len(queries)} queries ({writes} writes)"
+                )
+                self.wait_for_deliveries()
+
+            # The same presses as a panicking user would make them, with
+            # repeats inside the dedup window answered from the cache
+            config['DEDUP_WINDOW'] = dedup_window or 60
+            alerts, deliveries = EmergencyAlert.objects.count(), AlertDelivery.objects.count()
+            with ThreadPoolExecutor(options['clients']) as pool:
+                results = list(pool.map(
+                    lambda user: self.client_session(trigger_emergency, user, options['triggers']), users
+                ))
+            self.wait_for_deliveries()
+            samples = [sample for client_samples, _ in results for sample in client_samples]
+            self.stdout.write(
+                format_summary('repeated presses', samples)
+                + f"  {EmergencyAlert.objects.count() - alerts} alerts, "
+                f"{AlertDelivery.objects.count() - deliveries} notifications"
+            )
+
+    def trigger_request(self, user):
+        request = RequestFactory().post(
+            '/trigger-emergency/', json.dumps({'type': 'family', 'location': '12.97,77.59'}),
+            content_type='application/json'
+        )
+        request.user = user
+        return request
+
+    def client_session(self, view, user, triggers):
+        samples, failed = [], 0
+        try:
+            for _ in range(triggers):
+                request = self.trigger_request(user)
+                started = time.perf_counter()
+                try:
+                    response = view(request)
+                    failed += response.status_code >= 400
+                except Exception:
+                    failed += 1
+                samples.append(time.perf_counter() - started)
+                close_old_connections()
+        finally:
+            connections.close_all()
+        return samples, failed
+
+    def wait_for_deliveries(self):
+        # Let the background fan-out finish so it doesn't load the next run
+        while EmergencyAlert.objects.filter(completed_at__isnull=True).exists():
+            time.sleep(0.05)
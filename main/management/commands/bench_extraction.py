@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from main.report_extraction import IMAGE_EXTENSIONS, PDF_EXTENSIONS, extract_report
+from ._bench import format_summary, write_text_pdf
+
+
+def report_files(root):
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in PDF_EXTENSIONS + IMAGE_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+class Command(BaseCommand):
+    help = 'Time report text extraction inline and on process pools of different sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='Directory of reports (default MEDIA_ROOT/reports)')
+        parser.add_argument('--workers', default=f'0,{os.cpu_count() or 1}', help='Comma separated pool sizes, 0 is inline')
+        parser.add_argument('--synthetic-pages', type=int, default=40, help='Also extract a generated text PDF of this many pages (0 to skip)')
+
+    def handle(self, *args, **options):
+        files = list(report_files(options['path'] or os.path.join(settings.MEDIA_ROOT, 'reports')))
+        with tempfile.TemporaryDirectory() as workdir:
+            if options['synthetic_pages']:
+                synthetic = os.path.join(workdir, f"synthetic_{options['synthetic_pages']}p.pdf")
+                write_text_pdf(synthetic, options['synthetic_pages'])
+                files.append(synthetic)
+
+            for workers in (int(w) for w in options['workers'].split(',')):
+                executor = None
+                if workers:
+                    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+                    # Start the workers before timing anything
+                    list(executor.map(abs, range(workers)))
+                self.stdout.write(f"== {'inline' if not workers else f'{workers} worker process(es)'}")
+                started = time.perf_counter()
+                page_times = {}
+                for path in files:
+                    result = extract_report(path, executor, workers) if executor else self.extract_inline(path)
+                    errors = sum(1 for page in result['pages'] if page['error'])
+                    self.stdout.write(
+                        f"  {os.path.basename(path)[:40]:<40} pages={len(result['pages']):<3} "
+                        f"chars={len(result['text']):<6} errors={errors:<3} {result['seconds'] * 1000:9.1f}ms"
+                    )
+                    for page in result['pages']:
+                        page_times.setdefault(page['method'], []).append(page['seconds'])
+                for method, samples in sorted(page_times.items()):
+                    self.stdout.write('  ' + format_summary(f'per page ({method})', samples))
+                self.stdout.write(f"  total {time.perf_counter() - started:.2f}s")
+                if executor:
+                    executor.shutdown()
+
+    def extract_inline(self, path):
+        with override_settings(REPORT_EXTRACTION=dict(settings.REPORT_EXTRACTION, WORKERS=0)):
+            return extract_report(path)
@@ -0,0 +1,117 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from main.health_summary import (
+    alert_closed, alert_opened, check_summaries, compute_summaries, contacts_changed, rebuild_summaries,
+    report_added, user_id_batches
+)
+from main.models import EmergencyAlert, EmergencyContact, MedicalReport
+from ._bench import format_summary, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Time the health summary read against computing it per request, and the cost it adds to writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reports', type=int, default=100, help='Reports per user')
+        parser.add_argument('--heavy-reports', type=int, default=10000, help='Reports of the heaviest user')
+        parser.add_argument('--writes', type=int, default=500, help='Writes through the hooks before the consistency check')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            users = self.seed(rng, options)
+            self.stdout.write(f"seeded {len(users)} users in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            rebuilt = sum(len(rebuild_summaries(batch)) for batch in user_id_batches(500))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"rebuilt {rebuilt} summaries in {elapsed:.1f}s ({rebuilt / elapsed:.0f} users/s)")
+
+            for label, user in (('typical user', users[1]), ('heavy user', users[0])):
+                client = Client()
+                client.force_login(user)
+                with CaptureQueriesContext(connection) as queries:
+                    client.get('/health-summary/')
+                read_queries = len(queries)
+                with CaptureQueriesContext(connection) as queries:
+                    compute_summaries([user.id])
+                self.stdout.write(
+                    f"-- {label}: {read_queries} queries per request (session and user included), "
+                    f"{len(queries)} to compute the summary"
+                )
+                for name, run in (
+                    ('summary read', lambda: client.get('/health-summary/')),
+                    ('computed per request', lambda: compute_summaries([user.id])),
+                ):
+                    samples = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        run()
+                        samples.append(time.perf_counter() - started)
+                    self.stdout.write(format_summary(name, samples))
+
+            self.write_workload(rng, users, options['writes'])
+            differences = check_summaries([user.id for user in users])
+            if differences:
+                raise CommandError(f"{len(differences)} summary fields drifted, e.g. {differences[0]}")
+            self.stdout.write(f"OK: every summary matches the source tables after {options['writes']} writes")
+
+    def write_workload(self, rng, users, count):
+        """Writes through the same hooks as the views, timing what the summary adds to each."""
+        samples = {'report_added': [], 'alert_opened': [], 'alert_closed': [], 'contacts_changed': []}
+        open_alerts = []
+
+        def timed(name, hook, *args):
+            started = time.perf_counter()
+            hook(*args)
+            samples[name].append(time.perf_counter() - started)
+
+        for i in range(count):
+            user = rng.choice(users)
+            kind = rng.random()
+            if kind < 0.5:
+                with transaction.atomic():
+                    report = MedicalReport.objects.create(user=user, title=f'New {i}', report_type='pdf', file=f'medical_reports/new_{i}.pdf')
+                    timed('report_added', report_added, report)
+            elif kind < 0.75:
+                alert = EmergencyAlert.objects.create(user=user, alert_type='family', status='sending')
+                timed('alert_opened', alert_opened, alert)
+                open_alerts.append(alert)
+            elif kind < 0.9 and open_alerts:
+                alert = open_alerts.pop(rng.randrange(len(open_alerts)))
+                alert.status = 'completed'
+                alert.save(update_fields=['status'])
+                timed('alert_closed', alert_closed, alert)
+            else:
+                EmergencyContact.objects.create(user=user, name='Contact', phone_number='+911234567890', relationship='friend')
+                timed('contacts_changed', contacts_changed, user, list(EmergencyContact.objects.filter(user=user).values('id')))
+        for name, values in samples.items():
+            self.stdout.write(format_summary(name, values))
+
+    def seed(self, rng, options):
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['users'])])
+        reports = []
+        for i, user in enumerate(users):
+            count = options['heavy_reports'] if i == 0 else options['reports']
+            reports += [
+                MedicalReport(user=user, title=f'Report {n}', report_type='pdf', file=f'medical_reports/{user.id}_{n}.pdf')
+                for n in range(count)
+            ]
+        MedicalReport.objects.bulk_create(reports, batch_size=5000)
+        EmergencyAlert.objects.bulk_create([
+            EmergencyAlert(user=user, alert_type='family', status=rng.choice(['completed', 'completed', 'failed', 'sending']))
+            for user in users for _ in range(rng.randint(0, 20))
+        ], batch_size=5000)
+        EmergencyContact.objects.bulk_create([
+            EmergencyContact(user=user, name='Contact', phone_number='+911234567890', relationship='family')
+            for user in users for _ in range(rng.randint(0, 5))
+        ], batch_size=5000)
+        return users
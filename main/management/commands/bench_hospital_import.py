@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from main.hospital_import import field_columns, import_hospitals, normalize_row, read_rows
+from main.models import Hospital
+from ._bench import hospital_points, scratch_database
+
+COLUMNS = ['Facility_ID', 'Facility_Name', 'Address', 'District', 'State_Name', 'Contact_Number',
+           'Latitude', 'Longitude', 'Emergency_Services']
+
+
+def facility_rows(rng, count):
+    """Rows shaped like a public facility registry export, with a share of unusable ones."""
+    for i, (lat, lon) in enumerate(hospital_points(rng, count)):
+        row = {
+            'Facility_ID': f'IN{i:08d}', 'Facility_Name': f'  Primary Health Centre  {i} ',
+            'Address': f'{rng.randint(1, 999)} Main Road', 'District': 'District', 'State_Name': 'State',
+            'Contact_Number': f'+91 {rng.randint(6000000000, 9999999999)}',
+            'Latitude': f'{lat:.6f}', 'Longitude': f'{lon:.6f}', 'Emergency_Services': rng.choice(['Yes', 'No', '']),
+        }
+        if rng.random() < 0.01:
+            row['Latitude'] = ''
+        yield row
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_geojson(path, rows):
+    with open(path, 'w') as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for i, row in enumerate(rows):
+            lat, lon = row.pop('Latitude'), row.pop('Longitude')
+            feature = {
+                'type': 'Feature', 'id': row.pop('Facility_ID'), 'properties': row,
+                'geometry': {'type': 'Point', 'coordinates': [float(lon), float(lat)]} if lat else None,
+            }
+            f.write((',\n' if i else '') + json.dumps(feature))
+        f.write('\n]}\n')
+
+
+class Command(BaseCommand):
+    help = 'Time streaming batched hospital imports against creating the rows one by one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--batch-sizes', default='500,5000,20000', help='Comma separated batch sizes to compare')
+        parser.add_argument('--baseline-rows', type=int, default=2000, help='Rows created one by one for the baseline')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(workdir, 'facilities.csv')
+            geojson_path = os.path.join(workdir, 'facilities.geojson')
+            write_csv(csv_path, facility_rows(random.Random(1), options['rows']))
+            write_geojson(geojson_path, facility_rows(random.Random(1), options['rows']))
+            self.stdout.write(
+                f"{options['rows']} rows: CSV {os.path.getsize(csv_path) / 1e6:.0f}MB, "
+                f"GeoJSON {os.path.getsize(geojson_path) / 1e6:.0f}MB"
+            )
+            with scratch_database():
+                self.baseline(csv_path, options['baseline_rows'])
+                for batch_size in (int(size) for size in options['batch_sizes'].split(',')):
+                    Hospital.objects.all().delete()
+                    self.stdout.write(f"== batch size {batch_size}")
+                    self.run('CSV insert', csv_path, 'registry', batch_size)
+                    self.run('CSV re-import', csv_path, 'registry', batch_size)
+                self.run('GeoJSON insert', geojson_path, 'osm', 5000)
+                self.stdout.write(
+                    f"{Hospital.objects.filter(source='registry').count()} registry and "
+                    f"{Hospital.objects.filter(source='osm').count()} GeoJSON hospitals stored"
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def baseline(self, path, count):
+        """``objects.create`` per row in autocommit, the way the views write."""
+        rows = read_rows(path)
+        started = time.perf_counter()
+        created = 0
+        for row in rows:
+            if created == count:
+                break
+            try:
+                values = normalize_row(row, field_columns(row))
+            except ValueError:
+                continue
+            Hospital.objects.create(source='baseline', **values)
+            created += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{'objects.create':<16} {created:>7} rows in {elapsed:6.1f}s  {created / elapsed:8.0f} rows/s")
+        Hospital.objects.filter(source='baseline').delete()
+
+    def run(self, label, path, source, batch_size):
+        started = time.perf_counter()
+        read, written, rejected = import_hospitals(read_rows(path), source, batch_size)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:<16} {read:>7} rows in {elapsed:6.1f}s  {read / elapsed:8.0f} rows/s  "
+            f"({written} written, {sum(rejected.values())} rejected)"
+        )
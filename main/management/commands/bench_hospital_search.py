@@ -0,0 +1,85 @@
+import random
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from main.hospital_index import HospitalIndex
+from main.models import Hospital
+from ._bench import INDIA_BOUNDS, format_summary, hospital_points, scratch_database
+
+
+def query_points(rng, count):
+    """Half in a city, half anywhere in the country."""
+    points = hospital_points(rng, count // 2)
+    (south, north), (west, east) = INDIA_BOUNDS
+    points += [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(count - len(points))]
+    return points
+
+
+def nearest_sql(cursor, lat, lon, k, emergency):
+    """The nearest ``k`` by an equirectangular ORDER BY over every row, as a plain SQL query would."""
+    scale = np.cos(np.radians(lat)) ** 2
+    cursor.execute(
+        'SELECT id FROM main_hospital WHERE has_emergency OR NOT %s '
+        'ORDER BY (latitude - %s) * (latitude - %s) + (longitude - %s) * (longitude - %s) * %s LIMIT %s',
+        [emergency, lat, lat, lon, lon, float(scale), k]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = 'Time nearest-hospital queries on the grid index against a full scan in numpy and in SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospitals', type=int, default=150_000)
+        parser.add_argument('--emergency-share', type=float, default=0.3)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--sql-queries', type=int, default=50, help='Queries timed against the SQL scan')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--cells', default='0.05,0.1,0.25', help='Comma separated CELL_DEGREES to compare')
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        k = options['k']
+        with scratch_database():
+            started = time.perf_counter()
+            Hospital.objects.bulk_create([
+                Hospital(name=f'Hospital {i}', city='', state='', latitude=lat, longitude=lon,
+                         has_emergency=rng.random() < options['emergency_share'])
+                for i, (lat, lon) in enumerate(hospital_points(rng, options['hospitals']))
+            ], batch_size=5000)
+            self.stdout.write(f"seeded {options['hospitals']} hospitals in {time.perf_counter() - started:.1f}s")
+            queries = query_points(rng, options['queries'])
+
+            for cell in (float(c) for c in options['cells'].split(',')):
+                started = time.perf_counter()
+                index = HospitalIndex.load(cell)
+                self.stdout.write(
+                    f"== CELL_DEGREES={cell}: loaded {len(index.all)} hospitals "
+                    f"({len(index.emergency)} with emergency) in {(time.perf_counter() - started) * 1000:.0f}ms"
+                )
+                for emergency in (False, True):
+                    grid = index.emergency if emergency else index.all
+                    label = 'emergency' if emergency else 'all'
+                    samples, scan_samples, mismatches = [], [], 0
+                    for lat, lon in queries:
+                        started = time.perf_counter()
+                        ids, distances = grid.nearest(lat, lon, k)
+                        samples.append(time.perf_counter() - started)
+                        started = time.perf_counter()
+                        scan_ids, scan_distances = grid.scan(lat, lon, k)
+                        scan_samples.append(time.perf_counter() - started)
+                        # Ties may come back in either order; the distances must agree
+                        if not np.allclose(distances, scan_distances):
+                            mismatches += 1
+                    self.stdout.write(format_summary(f'grid {label}', samples))
+                    self.stdout.write(format_summary(f'numpy scan {label}', scan_samples))
+                    self.stdout.write(f"{mismatches}/{len(queries)} grid results differ from the full scan")
+
+            sql_samples = []
+            with connection.cursor() as cursor:
+                for lat, lon in queries[:options['sql_queries']]:
+                    started = time.perf_counter()
+                    nearest_sql(cursor, lat, lon, k, False)
+                    sql_samples.append(time.perf_counter() - started)
+            self.stdout.write(format_summary(f'{connection.vendor} ORDER BY', sql_samples))
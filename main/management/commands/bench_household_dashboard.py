@@ -0,0 +1,116 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.households import ALERT_HISTORY, dashboard_members
+from main.models import EmergencyAlert, Household, HouseholdMember, MedicalReport, ReportAnalysis
+from ._bench import SAMPLE_REPORT_LINES, format_summary, scratch_database
+
+
+def per_member_dashboard(household):
+    """The dashboard as a loop over members, a handful of queries each."""
+    members = []
+    for member in household.members.filter(accepted_at__isnull=False).select_related('user').order_by('joined_at', 'id'):
+        reports = MedicalReport.objects.filter(user=member.user)
+        last_report = reports.order_by('-uploaded_at', '-id').first()
+        members.append({
+            'report_count': reports.count(),
+            'last_report_at': last_report.uploaded_at if last_report else None,
+            'latest_analysis': ReportAnalysis.objects.filter(report__user=member.user)
+            .order_by('-report__uploaded_at', '-report__id').first(),
+            'alert_count': EmergencyAlert.objects.filter(user=member.user).count(),
+            'recent_alerts': list(EmergencyAlert.objects.filter(user=member.user).order_by('-created_at', '-id')[:ALERT_HISTORY]),
+        })
+    return members
+
+
+class Command(BaseCommand):
+    help = 'Check the household dashboard takes the same number of queries at any household size, and time it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,20', help='Comma separated household sizes')
+        parser.add_argument('--reports', type=int, default=1000, help='Reports per member')
+        parser.add_argument('--alerts', type=int, default=20, help='Emergency alerts per member')
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            households = [self.seed(rng, size, options) for size in sizes]
+            self.stdout.write(
+                f"seeded {sum(sizes)} members with {options['reports']} reports and "
+                f"{options['alerts']} alerts each in {time.perf_counter() - started:.1f}s"
+            )
+
+            query_counts = {}
+            for size, (household, viewer) in zip(sizes, households):
+                client = Client()
+                client.force_login(viewer)
+                url = f'/households/{household.id}/dashboard/'
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                members = response.json()['members']
+                if response.status_code != 200 or len(members) != size:
+                    raise CommandError(f'Dashboard of {size} members answered {response.status_code}')
+                if any(member['report_count'] != options['reports'] for member in members):
+                    raise CommandError('Report counts are wrong')
+                query_counts[size] = len(queries)
+                with CaptureQueriesContext(connection) as loop_queries:
+                    per_member_dashboard(household)
+                self.stdout.write(
+                    f"== {size} members: {query_counts[size]} queries per request (session and user included), "
+                    f"{len(loop_queries)} for the per-member loop"
+                )
+
+                for label, run in (
+                    ('dashboard view', lambda: client.get(url)),
+                    ('dashboard_members', lambda: dashboard_members(household)),
+                    ('per-member loop', lambda: per_member_dashboard(household)),
+                ):
+                    samples = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        run()
+                        samples.append(time.perf_counter() - started)
+                    self.stdout.write(format_summary(label, samples))
+
+            if len(set(query_counts.values())) != 1:
+                raise CommandError(f'Query count grows with the household: {query_counts}')
+            self.stdout.write(f"OK: {query_counts[sizes[0]]} queries at every household size")
+
+    def seed(self, rng, size, options):
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(username=f'member{size}_{i}', first_name=f'Member {i}') for i in range(size)
+        ])
+        household = Household.objects.create(name=f'Household of {size}', created_by=users[0])
+        HouseholdMember.objects.bulk_create([
+            HouseholdMember(household=household, user=user, role='admin' if i == 0 else 'member', accepted_at=now,
+                            relationship='self' if i == 0 else rng.choice(['spouse', 'child', 'parent']))
+            for i, user in enumerate(users)
+        ])
+        for user in users:
+            reports = MedicalReport.objects.bulk_create([
+                MedicalReport(user=user, title=f'Report {i}', report_type='pdf', file=f'medical_reports/{user.id}_{i}.pdf')
+                for i in range(options['reports'])
+            ], batch_size=1000)
+            for i, report in enumerate(reports):
+                report.uploaded_at = now - timedelta(hours=options['reports'] - i)
+            MedicalReport.objects.bulk_update(reports, ['uploaded_at'], batch_size=1000)
+            # The newest reports are still waiting for their analysis
+            ReportAnalysis.objects.bulk_create([
+                ReportAnalysis(report=report, analysis_text='\n'.join(SAMPLE_REPORT_LINES), health_tips='Stay hydrated.',
+                               yoga_suggestions='', source='local')
+                for report in reports[:-3]
+            ], batch_size=1000)
+            EmergencyAlert.objects.bulk_create([
+                EmergencyAlert(user=user, alert_type='family', status='completed') for _ in range(options['alerts'])
+            ])
+        return household, users[0]
@@ -0,0 +1,58 @@
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.ai_analysis import GENERAL_TIPS
+from main.lab_values import ANALYTES, build_lab_analysis, flag_values, parse_lab_values
+from ._bench import format_summary
+
+PRESCRIPTIONS = [
+    'Rx\nTab Paracetamol 500 mg 1-0-1 x 5 days\nSyp Benadryl 10 ml at night\nReview after 1 week',
+    'Discharge summary\nPatient admitted with fever for 3 days. Treated with IV fluids.\nAdvised rest.',
+    'X-Ray chest PA view\nImpression: no active lung lesion. Cardiac size normal.',
+]
+
+
+def lab_report(rng):
+    """A panel-style report with a random subset of analytes and layouts."""
+    lines = ['LABORATORY REPORT', f'Patient ID: {rng.randint(10000, 99999)}']
+    for name in rng.sample(sorted(ANALYTES), rng.randint(3, 10)):
+        analyte = ANALYTES[name]
+        low, high = analyte['range']
+        value = rng.uniform(low * 0.7, high * 1.3 if high else 10)
+        label = rng.choice(analyte['aliases']).upper() if rng.random() < 0.3 else analyte['label']
+        separator = rng.choice([' ', ' : ', '\t'])
+        lines.append(f"{label}{separator}{value:.1f} {analyte['unit']} {low:g} - {high:g}")
+    return '\n'.join(lines)
+
+
+class Command(BaseCommand):
+    help = 'Time the local lab-value extractor and report the share of documents it handles without the model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=5000)
+        parser.add_argument('--unrecognized-share', type=float, default=0.2, help='Share of non-lab documents')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        documents = [
+            rng.choice(PRESCRIPTIONS) if rng.random() < options['unrecognized_share'] else lab_report(rng)
+            for _ in range(options['documents'])
+        ]
+        min_values = settings.LAB_EXTRACTION['MIN_VALUES']
+
+        samples, local = [], 0
+        for text in documents:
+            started = time.perf_counter()
+            lab_values = parse_lab_values(text)
+            if len(lab_values) >= min_values:
+                build_lab_analysis(flag_values(lab_values), GENERAL_TIPS)
+                local += 1
+            samples.append(time.perf_counter() - started)
+
+        self.stdout.write(format_summary('local extraction', samples))
+        self.stdout.write(
+            f"handled locally: {local}/{len(documents)} ({local / len(documents):.1%}), "
+            f"model fallbacks: {len(documents) - local}"
+        )
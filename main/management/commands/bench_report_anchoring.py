@@ -0,0 +1,92 @@
+import hashlib
+import json
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main.models import MedicalReport, ReportAnchor
+from main.report_anchoring import anchor_pending, cut_batches, get_anchor, verify_proof
+from ._bench import format_summary, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Time batching report hashes into Merkle trees and check every stored proof; --chain also anchors them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reports', type=int, default=100000)
+        parser.add_argument('--chain', action='store_true',
+                            help='Anchor on the node in REPORT_ANCHORING (Ganache or anvil with the contract deployed)')
+        parser.add_argument('--sample', type=int, default=20, help='Proofs checked with verifyInclusion on chain')
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        with scratch_database():
+            started = time.perf_counter()
+            reports = self.seed(rng, options)
+            self.stdout.write(f"seeded {reports} hashed reports in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            batches = cut_batches()
+            elapsed = time.perf_counter() - started
+            leaves = sum(batch.leaf_count for batch in batches)
+            self.stdout.write(
+                f"batched {reports} reports ({leaves} distinct hashes) into {len(batches)} roots "
+                f"in {elapsed:.2f}s ({reports / elapsed:.0f} reports/s)"
+            )
+
+            anchors = list(ReportAnchor.objects.select_related('report', 'batch').only(
+                'proof', 'report__content_hash', 'batch__root'
+            ))
+            proof_bytes = [len(json.dumps(anchor.proof)) for anchor in anchors]
+            self.stdout.write(
+                f"proofs: {max(len(anchor.proof) for anchor in anchors)} siblings at most, "
+                f"{sum(proof_bytes) / len(proof_bytes):.0f} bytes of JSON on average"
+            )
+            samples = []
+            for anchor in anchors:
+                started = time.perf_counter()
+                valid = verify_proof(anchor.report.content_hash, anchor.proof, anchor.batch.root)
+                samples.append(time.perf_counter() - started)
+                if not valid:
+                    raise CommandError(f'Proof of report {anchor.report_id} does not lead to its root')
+            self.stdout.write(format_summary('verify_proof', samples))
+            self.stdout.write(f"OK: {len(anchors)} proofs verified; {len(batches)} transactions instead of {reports}")
+
+            if options['chain']:
+                self.anchor_on_chain(rng, anchors, options['sample'])
+
+    def anchor_on_chain(self, rng, anchors, sample):
+        anchor = get_anchor()
+        started = time.perf_counter()
+        batches = anchor_pending(anchor)
+        elapsed = time.perf_counter() - started
+        failed = [batch for batch in batches if batch.status != 'anchored']
+        if failed:
+            raise CommandError(f'{len(failed)} batches failed, e.g. {failed[0].last_error}')
+        gas = sum(batch.gas_used or 0 for batch in batches)
+        self.stdout.write(
+            f"anchored {len(batches)} roots in {elapsed:.2f}s, {gas} gas in all "
+            f"({gas / len(anchors):.2f} gas per report)"
+        )
+        for report_anchor in rng.sample(anchors, min(sample, len(anchors))):
+            if not anchor.verify_inclusion(report_anchor.report.content_hash, report_anchor.proof, report_anchor.batch.root):
+                raise CommandError(f'verifyInclusion rejected the proof of report {report_anchor.report_id}')
+        self.stdout.write(f"OK: verifyInclusion accepted {min(sample, len(anchors))} sampled proofs")
+
+    def seed(self, rng, options):
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['users'])])
+        # In a closed window, with a few files uploaded by more than one user
+        uploaded_at = timezone.now() - timedelta(days=1)
+        reports = []
+        for i in range(options['reports']):
+            content = str(rng.randrange(options['reports'] * 9 // 10) if rng.random() < 0.05 else i)
+            reports.append(MedicalReport(
+                user=users[i % len(users)], title=f'Report {i}', report_type='pdf', file=f'medical_reports/{i}.pdf',
+                content_hash=hashlib.sha256(content.encode()).hexdigest(), uploaded_at=uploaded_at
+            ))
+        MedicalReport.objects.bulk_create(reports, batch_size=5000, ignore_conflicts=True)
+        MedicalReport.objects.update(uploaded_at=uploaded_at)
+        return MedicalReport.objects.count()
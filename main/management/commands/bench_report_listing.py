@@ -0,0 +1,95 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.models import MedicalReport
+from main.report_listing import encode_cursor, related_or_none, report_page, report_queryset
+from ._bench import format_summary, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET + lazy-loaded analyses against keyset pagination over a large seeded report table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reports', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--user-reports', type=int, default=100_000, help='Reports owned by the user being paged')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database() as connection:
+            user = self.seed(connection, options)
+            depths = [0, 1000, options['user_reports'] // 2, options['user_reports'] - options['page_size'] - 1]
+            cursor = None
+            page_size = options['page_size']
+            base = MedicalReport.objects.filter(user=user).order_by('-uploaded_at', '-id')
+
+            for depth in depths:
+                # Naive: OFFSET, then one query per report for its analysis
+                def naive():
+                    for report in base[depth:depth + page_size]:
+                        related_or_none(report, 'reportanalysis')
+
+                cursor = encode_cursor(base.only('id', 'uploaded_at')[depth - 1]) if depth else None
+                self.compare(f'offset {depth}', naive, lambda: report_page(user, cursor, page_size), options['repeat'])
+
+            if connection.vendor == 'sqlite':
+                # Plan of the deepest keyset page
+                sql, params = report_queryset(user, cursor)[:page_size + 1].query.sql_with_params()
+                with connection.cursor() as db_cursor:
+                    db_cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    self.stdout.write('plan: ' + ' | '.join(row[-1] for row in db_cursor.fetchall()))
+
+    def compare(self, label, naive, keyset, repeat):
+        for name, fn in (('offset + N+1', naive), ('keyset', keyset)):
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - started)
+            with CaptureQueriesContext(transaction.get_connection()) as queries:
+                fn()
+            self.stdout.write(format_summary(f'{label} {name}', samples) + f"  queries={len(queries)}")
+
+    def seed(self, connection, options):
+        started = time.perf_counter()
+        User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['users'])])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        user = User.objects.get(username='bench0')
+        others = [user_id for user_id in user_ids if user_id != user.id]
+
+        rng = random.Random(1)
+        now = timezone.now()
+        batch_size = 20_000
+        # Raw inserts: bulk_create would stamp every row with the same
+        # auto_now_add time
+        insert_report = (
+            'INSERT INTO main_medicalreport (user_id, title, report_type, file, content_hash, uploaded_at) '
+            'VALUES (%s, %s, %s, %s, %s, %s)'
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, options['reports'], batch_size):
+                rows = []
+                for i in range(start, min(start + batch_size, options['reports'])):
+                    owner = user.id if i < options['user_reports'] else rng.choice(others)
+                    uploaded_at = now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+                    rows.append((owner, f'Report_{i}', 'image', f'reports/{i:064x}.png', f'{i:064x}', uploaded_at))
+                cursor.executemany(insert_report, rows)
+
+            # Analyses for the paged user's reports, with realistic text sizes
+            text = 'Haemoglobin: 13.5 g/dL (normal, reference 13-17)\n' * 8
+            cursor.execute(
+                'INSERT INTO main_reportanalysis (report_id, analysis_text, health_tips, yoga_suggestions, source, created_at) '
+                'SELECT id, %s, %s, %s, %s, uploaded_at FROM main_medicalreport WHERE user_id = %s',
+                [text, text, text, 'local', user.id]
+            )
+        self.stdout.write(
+            f"seeded {options['reports']} reports ({options['user_reports']} for the paged user) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return user
@@ -0,0 +1,109 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from main.ai_analysis import GENERAL_TIPS, YOGA_SUGGESTIONS
+from main.lab_values import ANALYTES, build_lab_analysis, flag_values
+from main.models import ReportAnalysis
+from main.report_search import search_reports, search_reports_unranked, search_terms
+from ._bench import format_summary, scratch_database
+
+# The last query matches nothing, so the LIKE scan has to read every row of the user
+QUERIES = ['cholesterol', 'haemoglobin low', 'thyroid', 'fasting blood sugar high', 'creatinine normal', 'tuberculosis']
+
+
+def analysis_texts(rng, count):
+    """Lab analyses over random panels, as the local extractor writes them."""
+    texts = []
+    for _ in range(count):
+        lab_values = []
+        for name in rng.sample(sorted(ANALYTES), rng.randint(3, 8)):
+            low, high = ANALYTES[name]['range']
+            lab_values.append({
+                'name': name, 'value': rng.uniform(low * 0.7, high * 1.3 if high else 10),
+                'unit': ANALYTES[name]['unit'], 'low': low, 'high': high,
+            })
+        texts.append(build_lab_analysis(flag_values(lab_values), GENERAL_TIPS))
+    return texts
+
+
+class Command(BaseCommand):
+    help = 'Measure ranked full-text search latency over a growing number of seeded analyses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100000,1000000', help='Comma separated analysis counts to measure at')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--heavy-share', type=float, default=0.02, help='Share of analyses owned by the heavy user')
+        parser.add_argument('--optimize', action='store_true', help="Merge the FTS5 segments ('optimize') before measuring")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--like-repeat', type=int, default=3, help='Runs of the unindexed LIKE scan')
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        texts = analysis_texts(rng, 500)
+        with scratch_database() as connection:
+            User.objects.bulk_create([User(username=f'bench{i}') for i in range(options['users'])])
+            user_ids = list(User.objects.values_list('id', flat=True))
+            seeded = 0
+            for size in (int(s) for s in options['sizes'].split(',')):
+                started = time.perf_counter()
+                self.seed(connection, rng, texts, user_ids, seeded, size, options['heavy_share'])
+                if options['optimize'] and connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute("INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts) VALUES ('optimize')")
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"== {size} analyses (+{size - seeded} indexed incrementally by the triggers "
+                    f"in {elapsed:.1f}s, {(size - seeded) / elapsed:.0f} rows/s)"
+                )
+                seeded = size
+
+                heavy = User.objects.get(id=user_ids[0])
+                typical = User.objects.get(id=user_ids[1])
+                for label, user in (('typical user', typical), ('heavy user', heavy)):
+                    owned = ReportAnalysis.objects.filter(report__user=user).count()
+                    self.stdout.write(f"-- {label} ({owned} analyses)")
+                    self.measure(connection, user, options)
+                results, _ = search_reports(heavy, QUERIES[0], limit=3)
+                for report, rank, snippet in results:
+                    self.stdout.write(f"  {rank:8.3f}  {snippet[:90]!r}")
+
+    def measure(self, connection, user, options):
+        samples, like_samples = [], []
+        for _ in range(options['repeat']):
+            for query in QUERIES:
+                started = time.perf_counter()
+                search_reports(user, query)
+                samples.append(time.perf_counter() - started)
+        for _ in range(options['like_repeat']):
+            for query in QUERIES:
+                started = time.perf_counter()
+                search_reports_unranked(user, search_terms(query), 0, 20)
+                like_samples.append(time.perf_counter() - started)
+        self.stdout.write(format_summary(f'{connection.vendor} ranked', samples))
+        self.stdout.write(format_summary('LIKE scan', like_samples))
+
+    def seed(self, connection, rng, texts, user_ids, start, end, heavy_share):
+        now = timezone.now()
+        batch_size = 10_000
+        with transaction.atomic(), connection.cursor() as cursor:
+            for batch_start in range(start, end, batch_size):
+                batch = range(batch_start, min(batch_start + batch_size, end))
+                cursor.executemany(
+                    'INSERT INTO main_medicalreport (id, user_id, title, report_type, file, content_hash, uploaded_at) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                    [(i + 1, user_ids[0] if rng.random() < heavy_share else rng.choice(user_ids), f'Report_{i}',
+                      'pdf', f'reports/{i:064x}.pdf', f'{i:064x}', now)
+                     for i in batch]
+                )
+                rows = []
+                for i in batch:
+                    analysis_text, health_tips = rng.choice(texts)
+                    rows.append((i + 1, analysis_text, health_tips, YOGA_SUGGESTIONS, '', 'local', now))
+                cursor.executemany(
+                    'INSERT INTO main_reportanalysis (report_id, analysis_text, health_tips, yoga_suggestions, '
+                    'extracted_text, source, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                    rows
+                )
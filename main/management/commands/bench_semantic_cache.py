@@ -0,0 +1,48 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from main.semantic_cache import SemanticCache
+from ._bench import format_summary
+
+QUERIES = [
+    'uploading my medical report steps',
+    'how to add emergency contact',
+    'where is the nearest hospital',
+    'what does the sos button do',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure semantic cache lookup latency as the number of cached questions grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--dimensions', type=int, default=256)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        dimensions = options['dimensions']
+
+        for size in options['sizes']:
+            cache = SemanticCache(dimensions=dimensions, max_entries=size)
+            # Random unit vectors stand in for the bulk of the history
+            for start in range(0, size - len(QUERIES), 100_000):
+                count = min(100_000, size - len(QUERIES) - start)
+                vectors = rng.standard_normal((count, dimensions), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                cache.add_vectors(vectors, [('filler', frozenset())] * count)
+            cache.add('how to upload report', 'upload answer')
+            cache.add('how do I add an emergency contact', 'contact answer')
+
+            samples, hits = [], 0
+            for i in range(options['queries']):
+                started = time.perf_counter()
+                answer = cache.lookup(QUERIES[i % len(QUERIES)])
+                samples.append(time.perf_counter() - started)
+                hits += answer is not None
+
+            self.stdout.write(
+                format_summary(f'lookup @ {size:,}', samples)
+                + f"  hits={hits}/{options['queries']}  matrix={cache._matrix.nbytes / 2**20:.0f}MiB"
+            )
@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ._bench import format_summary
+
+STARTUP_SCRIPT = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eswasthya.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'genai_imported': 'google.generativeai' in sys.modules,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Time django.setup() plus URLconf import in fresh interpreters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+
+    def handle(self, *args, **options):
+        samples = []
+        genai_imported = False
+        for _ in range(options['runs']):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            samples.append(result['seconds'])
+            genai_imported = genai_imported or result['genai_imported']
+
+        self.stdout.write(format_summary('setup + urls', samples))
+        self.stdout.write(f"google.generativeai imported at startup: {genai_imported}")
@@ -0,0 +1,101 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import tracemalloc
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand
+from main.report_uploads import install_upload_handler, save_upload
+
+BOUNDARY = 'BenchBoundary'
+
+
+def write_multipart_body(path, size, chunk_size=1024 * 1024):
+    """Write a multipart body holding one ``size`` byte file, in chunks."""
+    with open(path, 'wb') as body:
+        body.write((
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="report"; filename="scan.pdf"\r\n'
+            'Content-Type: application/pdf\r\n\r\n'
+        ).encode())
+        remaining = size
+        while remaining:
+            chunk = os.urandom(min(chunk_size, remaining))
+            body.write(chunk)
+            remaining -= len(chunk)
+        body.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+    return os.path.getsize(path)
+
+
+def make_request(body_path, body_size):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/upload-report/',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+        'CONTENT_LENGTH': str(body_size),
+        'wsgi.input': open(body_path, 'rb'),
+        'wsgi.url_scheme': 'http',
+    }
+    return WSGIRequest(environ)
+
+
+def ingest(mode, body_path, body_size, media_root):
+    """Parse the upload and save it the old way or the streaming way."""
+    storage = FileSystemStorage(location=media_root)
+    request = make_request(body_path, body_size)
+    if mode == 'read':
+        file = request.FILES['report']
+        data = file.read()
+        hashlib.sha256(data).hexdigest()
+        storage.save('reports/scan.pdf', ContentFile(data))
+    else:
+        upload_handler = install_upload_handler(request, max_size=body_size)
+        file = request.FILES['report']
+        save_upload(file, '.pdf', upload_handler.digests.get('report'), storage, body_size)
+    request.environ['wsgi.input'].close()
+
+
+def measure(mode, body_path, body_size, media_root, results):
+    # Runs in a fresh child so ru_maxrss is this case's own high-water mark
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    ingest(mode, body_path, body_size, media_root)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((peak, max(0, rss - baseline) * 1024))
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory of reading uploads into memory against streaming them to storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50', help='Comma separated file sizes in MB')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        context = multiprocessing.get_context('fork')
+        mb = 1024 * 1024
+        self.stdout.write(f"{'size':>8}  {'mode':<8} {'peak alloc':>12} {'peak RSS growth':>16}")
+        with tempfile.TemporaryDirectory() as workdir:
+            body_path = os.path.join(workdir, 'body')
+            for size in sizes:
+                body_size = write_multipart_body(body_path, size * mb)
+                for mode in ('read', 'stream'):
+                    media_root = tempfile.mkdtemp(dir=workdir)
+                    results = context.Queue()
+                    process = context.Process(
+                        target=measure, args=(mode, body_path, body_size, media_root, results)
+                    )
+                    process.start()
+                    peak, rss = results.get()
+                    process.join()
+                    self.stdout.write(
+                        f"{size:>6}MB  {mode:<8} {peak / mb:>10.2f}MB {rss / mb:>14.2f}MB"
+                    )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.health_summary import check_summaries, rebuild_summaries, user_id_batches
+
+
+class Command(BaseCommand):
+    help = 'Compare every stored health summary with one computed from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', help='Only these user ids')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--fix', action='store_true', help='Rebuild the summaries that are out of date')
+
+    def handle(self, *args, **options):
+        checked = 0
+        stale = set()
+        for batch in user_id_batches(options['batch_size'], options['users']):
+            checked += len(batch)
+            differences = check_summaries(batch)
+            for user_id, field, stored, expected in differences:
+                self.stdout.write(f"user {user_id}: {field} is {stored!r}, expected {expected!r}")
+            batch_stale = sorted({user_id for user_id, *_ in differences})
+            if batch_stale and options['fix']:
+                rebuild_summaries(batch_stale)
+            stale.update(batch_stale)
+
+        self.stdout.write(f"Checked {checked} health summaries, {len(stale)} out of date")
+        if stale:
+            if options['fix']:
+                self.stdout.write(f"Rebuilt {len(stale)} summaries")
+            else:
+                # Writes still in flight can show up here; check again before fixing
+                raise CommandError(f"{len(stale)} health summaries are out of date, run with --fix to rebuild them")
@@ -0,0 +1,48 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from main.hospital_import import import_hospitals, read_rows
+from main.hospital_index import reload_hospital_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Import or update hospitals from a CSV or GeoJSON facility dump. Rows are keyed on '
+        '(--source, id column), so re-importing a newer dump updates them in place'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--source', help='Dataset name the rows are keyed under (default: the file name)')
+        parser.add_argument('--format', choices=['csv', 'geojson'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per transaction')
+        parser.add_argument('--method', choices=['insert', 'copy'], help='Default: copy on PostgreSQL, insert elsewhere')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+        source = options['source'] or os.path.splitext(os.path.basename(path))[0]
+        if len(source) > 50:
+            raise CommandError('--source is limited to 50 characters')
+        started = time.perf_counter()
+
+        def on_batch(read, written):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{read} rows read, {written} written ({read / (time.perf_counter() - started):.0f} rows/s)")
+
+        try:
+            read, written, rejected = import_hospitals(
+                read_rows(path, options['format']), source, options['batch_size'], options['method'], on_batch
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Imported {written} of {read} rows from {path} as {source!r} "
+            f"in {elapsed:.1f}s ({read / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        for reason, count in sorted(rejected.items()):
+            self.stdout.write(f"  skipped {count} rows: {reason}")
+        # Other processes pick the new hospitals up within HOSPITAL_SEARCH['MAX_AGE']
+        reload_hospital_index()
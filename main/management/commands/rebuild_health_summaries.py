@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from main.health_summary import rebuild_summaries, user_id_batches
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored health summary of every user (or --users) from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', help='Only these user ids')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuilt = 0
+        for batch in user_id_batches(options['batch_size'], options['users']):
+            rebuilt += len(rebuild_summaries(batch))
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{rebuilt} summaries rebuilt")
+        self.stdout.write(f"Rebuilt {rebuilt} health summaries in {time.perf_counter() - started:.1f}s")
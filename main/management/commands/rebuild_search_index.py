@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from main.report_search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the report search index (FTS5 table and triggers, or tsvector column) and reindex every analysis'
+
+    def handle(self, *args, **options):
+        install_search_index()
+        self.stdout.write('Search index rebuilt')
@@ -0,0 +1,21 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.alert_fanout import recover_alerts
+
+
+class Command(BaseCommand):
+    help = 'Deliver emergency alerts a worker stopped before sending'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, help='Seconds (default RECOVER_AFTER)')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --older-than seconds')
+
+    def handle(self, *args, **options):
+        interval = options['older_than'] or settings.EMERGENCY_ALERTS['RECOVER_AFTER']
+        while True:
+            for alert in recover_alerts(options['older_than']):
+                self.stdout.write(f"Alert {alert.id}: {alert.status}")
+            if not options['loop']:
+                return
+            time.sleep(interval)
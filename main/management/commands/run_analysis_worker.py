@@ -0,0 +1,30 @@
+import signal
+from django.core.management.base import BaseCommand
+from main.analysis_queue import AnalysisWorkerPool, queue_stats
+from main.report_extraction import shutdown_executor
+
+
+class Command(BaseCommand):
+    help = 'Run report analysis jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Worker threads (default from settings)')
+        parser.add_argument('--poll-interval', type=float, default=None)
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        pool = AnalysisWorkerPool(options['concurrency'], options['poll_interval'])
+        self.stdout.write(f"Starting {pool.concurrency} analysis workers, backlog: {queue_stats()['backlog']}")
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: pool.stop())
+        pool.start(burst=options['burst'])
+        try:
+            # Join with a timeout so Ctrl+C is handled promptly
+            while pool.is_alive():
+                pool.join(timeout=1)
+        except KeyboardInterrupt:
+            pool.stop()
+            pool.join()
+        shutdown_executor()
+
+        self.stdout.write(f"Stopped, queue: {queue_stats()}")
@@ -0,0 +1,93 @@
+import os
+import shutil
+import sys
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import MedicalReport
+from main.report_previews import delete_derivatives
+from main.report_uploads import content_path, file_digest
+
+
+def link_or_copy(storage, source, target):
+    """Place a copy of ``source`` at ``target``, hard-linking when possible."""
+    try:
+        source_path, target_path = storage.path(source), storage.path(target)
+    except NotImplementedError:
+        # Remote storage: stream it across
+        with storage.open(source, 'rb') as f:
+            storage.save(target, f)
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+class Command(BaseCommand):
+    help = 'Move existing report files into the sharded content-addressed layout and update MedicalReport.file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        counts = {'moved': 0, 'deduplicated': 0, 'in_place': 0, 'missing': 0}
+        # Hashes already claimed per owner, to respect the unique constraints
+        claimed = set(
+            MedicalReport.objects.exclude(content_hash=None).values_list('user_id', 'content_hash')
+        )
+
+        placed = set()
+        reports = MedicalReport.objects.only('id', 'user_id', 'file', 'content_hash').order_by('id')
+        batch = []
+        for report in reports.iterator(chunk_size=batch_size):
+            source = report.file.name
+            if not source or not storage.exists(source):
+                counts['missing'] += 1
+                continue
+            with storage.open(source, 'rb') as f:
+                sha256, _ = file_digest(f, max_size=sys.maxsize)
+            target = content_path(sha256, os.path.splitext(source)[1].lower())
+            if source == target:
+                counts['in_place'] += 1
+                continue
+
+            if target in placed or storage.exists(target):
+                counts['deduplicated'] += 1
+            else:
+                placed.add(target)
+                counts['moved'] += 1
+                if not dry_run:
+                    link_or_copy(storage, source, target)
+            report.file.name = target
+            if report.content_hash is None and (report.user_id, sha256) not in claimed:
+                report.content_hash = sha256
+                claimed.add((report.user_id, sha256))
+            batch.append((report, source))
+            if len(batch) >= batch_size:
+                self.flush(batch, dry_run)
+                batch = []
+        self.flush(batch, dry_run)
+
+        self.stdout.write(
+            ', '.join(f"{name}={count}" for name, count in counts.items())
+            + (' (dry run)' if dry_run else '')
+        )
+
+    def flush(self, batch, dry_run):
+        if not batch or dry_run:
+            return
+        with transaction.atomic():
+            MedicalReport.objects.bulk_update([report for report, _ in batch], ['file', 'content_hash'])
+        # Old files (and their previews) go only once nothing points at
+        # them any more
+        sources = {source for _, source in batch}
+        still_used = set(MedicalReport.objects.filter(file__in=sources).values_list('file', flat=True))
+        for source in sources - still_used:
+            default_storage.delete(source)
+            delete_derivatives(source)
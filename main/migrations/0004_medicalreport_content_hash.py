@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_analysisjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalreport',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='medicalreport',
+            constraint=models.UniqueConstraint(fields=('user', 'content_hash'), name='main_report_user_content_hash'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicalreport',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('content_hash',), name='main_report_anon_content_hash'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_medicalreport_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportanalysis',
+            name='source',
+            field=models.CharField(blank=True, choices=[('local', 'Local extractor'), ('model', 'AI model')], max_length=10),
+        ),
+    ]
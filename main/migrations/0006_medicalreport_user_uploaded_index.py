@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_reportanalysis_source'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalreport',
+            index=models.Index(fields=['user', '-uploaded_at', '-id'], name='main_report_user_uploaded'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+# The statements main/report_search.py installed when this migration was
+# written, frozen here so later edits to that module never change history
+
+SQLITE_INSTALL = [
+    """CREATE VIEW IF NOT EXISTS main_reportanalysis_search AS
+        SELECT a.id, 'user' || coalesce(r.user_id, 0) AS owner, a.analysis_text, a.health_tips, a.yoga_suggestions, a.extracted_text
+        FROM main_reportanalysis a JOIN main_medicalreport r ON r.id = a.report_id""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS main_reportanalysis_fts USING fts5(
+        owner, analysis_text, health_tips, yoga_suggestions, extracted_text,
+        content='main_reportanalysis_search', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_insert AFTER INSERT ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        VALUES (new.id, 'user' || coalesce((SELECT user_id FROM main_medicalreport WHERE id = new.report_id), 0), new.analysis_text, new.health_tips, new.yoga_suggestions, new.extracted_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_delete AFTER DELETE ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        VALUES ('delete', old.id, 'user' || coalesce((SELECT user_id FROM main_medicalreport WHERE id = old.report_id), 0), old.analysis_text, old.health_tips, old.yoga_suggestions, old.extracted_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_update
+        AFTER UPDATE OF analysis_text, health_tips, yoga_suggestions, extracted_text ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        VALUES ('delete', old.id, 'user' || coalesce((SELECT user_id FROM main_medicalreport WHERE id = old.report_id), 0), old.analysis_text, old.health_tips, old.yoga_suggestions, old.extracted_text);
+        INSERT INTO main_reportanalysis_fts(rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        VALUES (new.id, 'user' || coalesce((SELECT user_id FROM main_medicalreport WHERE id = new.report_id), 0), new.analysis_text, new.health_tips, new.yoga_suggestions, new.extracted_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_owner
+        AFTER UPDATE OF user_id ON main_medicalreport BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        SELECT 'delete', a.id, 'user' || coalesce(old.user_id, 0), a.analysis_text, a.health_tips, a.yoga_suggestions, a.extracted_text
+        FROM main_reportanalysis a WHERE a.report_id = new.id;
+        INSERT INTO main_reportanalysis_fts(rowid, owner, analysis_text, health_tips, yoga_suggestions, extracted_text)
+        SELECT a.id, 'user' || coalesce(new.user_id, 0), a.analysis_text, a.health_tips, a.yoga_suggestions, a.extracted_text
+        FROM main_reportanalysis a WHERE a.report_id = new.id;
+    END""",
+    "INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_insert',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_delete',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_update',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_owner',
+    'DROP TABLE IF EXISTS main_reportanalysis_fts',
+    'DROP VIEW IF EXISTS main_reportanalysis_search',
+]
+
+POSTGRES_INSTALL = [
+    """ALTER TABLE main_reportanalysis ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(analysis_text, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(extracted_text, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(health_tips, '')), 'C')
+            || setweight(to_tsvector('english', coalesce(yoga_suggestions, '')), 'D')
+        ) STORED""",
+    'CREATE INDEX IF NOT EXISTS main_reportanalysis_search ON main_reportanalysis USING GIN (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS main_reportanalysis_search',
+    'ALTER TABLE main_reportanalysis DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def install(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL})
+
+
+def uninstall(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_medicalreport_user_uploaded_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportanalysis',
+            name='extracted_text',
+            field=models.TextField(blank=True),
+        ),
+        # FTS5 table and triggers on SQLite, tsvector column and GIN index
+        # on PostgreSQL
+        migrations.RunPython(install, uninstall),
+    ]
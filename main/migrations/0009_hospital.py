@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_alert_deliveries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hospital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('address', models.CharField(blank=True, max_length=300)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('phone', models.CharField(blank=True, max_length=30)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('has_emergency', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_hospital'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospital',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='hospital',
+            name='source_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='hospital',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='main_hospital_source_id'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main', '0011_households'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('latest_reports', models.JSONField(default=list)),
+                ('alert_count', models.PositiveIntegerField(default=0)),
+                ('open_alert_count', models.PositiveIntegerField(default=0)),
+                ('open_alerts', models.JSONField(default=list)),
+                ('contact_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
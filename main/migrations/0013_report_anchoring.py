@@ -0,0 +1,43 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_healthsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnchorBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=64, unique=True)),
+                ('leaf_count', models.PositiveIntegerField()),
+                ('window_end', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('anchored', 'Anchored'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('tx_hash', models.CharField(blank=True, max_length=66)),
+                ('block_number', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('gas_used', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('anchored_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='main_anchor_batch_status')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportAnchor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('proof', models.JSONField(default=list)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_anchors', to='main.anchorbatch')),
+                ('report', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anchor', to='main.medicalreport')),
+            ],
+        ),
+    ]
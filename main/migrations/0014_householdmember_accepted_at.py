@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def accept_admins(apps, schema_editor):
+    # Admins created their household; everyone they added has to accept
+    HouseholdMember = apps.get_model('main', 'HouseholdMember')
+    HouseholdMember.objects.filter(role='admin').update(accepted_at=F('joined_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_report_anchoring'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='householdmember',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(accept_admins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+def mark_unreadable(apps, schema_editor):
+    # Analyses of unreadable documents were recorded as local
+    ReportAnalysis = apps.get_model('main', 'ReportAnalysis')
+    ReportAnalysis.objects.filter(
+        source='local', extracted_text='', analysis_text__contains='No readable text was found'
+    ).update(source='unreadable')
+
+
+def mark_local(apps, schema_editor):
+    ReportAnalysis = apps.get_model('main', 'ReportAnalysis')
+    ReportAnalysis.objects.filter(source='unreadable').update(source='local')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_householdmember_accepted_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportanalysis',
+            name='source',
+            field=models.CharField(blank=True, choices=[('local', 'Local extractor'), ('model', 'AI model'), ('unreadable', 'No readable text')], max_length=10),
+        ),
+        migrations.RunPython(mark_unreadable, mark_local),
+    ]
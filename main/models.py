@@ -1,10 +1,12 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class EmergencyContact(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=15)
+    email = models.EmailField(blank=True)
     relationship = models.CharField(max_length=50)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -22,21 +24,74 @@ class MedicalReport(models.Model):
     title = models.CharField(max_length=200)
     report_type = models.CharField(max_length=10, choices=REPORT_TYPES)
     file = models.FileField(upload_to='medical_reports/')
+    # SHA-256 of the file; reports with the same bytes share one stored blob
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's reports, newest first
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='main_report_user_uploaded'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_hash'], name='main_report_user_content_hash'),
+            # NULLs never collide, so anonymous uploads need their own constraint
+            models.UniqueConstraint(
+                fields=['content_hash'],
+                condition=models.Q(user__isnull=True),
+                name='main_report_anon_content_hash'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.user.username if self.user else 'Anonymous'}"
 
 class ReportAnalysis(models.Model):
+    SOURCES = [
+        ('local', 'Local extractor'),
+        ('model', 'AI model'),
+        ('unreadable', 'No readable text'),
+    ]
+    
     report = models.OneToOneField(MedicalReport, on_delete=models.CASCADE)
     analysis_text = models.TextField()
     health_tips = models.TextField()
     yoga_suggestions = models.TextField()
+    # Text read from the report, kept for search
+    extracted_text = models.TextField(blank=True)
+    source = models.CharField(max_length=10, choices=SOURCES, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Analysis for {self.report.title}"
 
+class AnalysisJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    report = models.OneToOneField(MedicalReport, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='main_job_status_run_after'),
+        ]
+    
+    def __str__(self):
+        return f"Analysis job for {self.report.title} - {self.status}"
+
 class EmergencyAlert(models.Model):
     ALERT_TYPES = [
         ('ambulance', 'Ambulance Call'),
@@ -50,6 +105,145 @@ class EmergencyAlert(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     location = models.CharField(max_length=200, null=True, blank=True)
     message = models.TextField(null=True, blank=True)
+    # When the last delivery finished; minus created_at, the time to notify everyone
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # A user's latest alerts, for the household dashboard
+            models.Index(fields=['user', '-created_at'], name='main_alert_user_created'),
+        ]
+    
+    def __str__(self):
+        return f"{self.alert_type} - {self.created_at}"
+
+class AlertDelivery(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    alert = models.ForeignKey(EmergencyAlert, on_delete=models.CASCADE, related_name='deliveries')
+    contact = models.ForeignKey(EmergencyContact, on_delete=models.SET_NULL, null=True, blank=True)
+    channel = models.CharField(max_length=20)
+    # Phone number, email address or URL the notification goes to
+    recipient = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} - {self.status}"
+
+class Hospital(models.Model):
+    name = models.CharField(max_length=200)
+    address = models.CharField(max_length=300, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    state = models.CharField(max_length=100, blank=True)
+    phone = models.CharField(max_length=30, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    has_emergency = models.BooleanField(default=False)
+    # Dataset the row was imported from and its id there; re-imports update
+    # the row in place. Hospitals added by hand have no source_id
+    source = models.CharField(max_length=50, blank=True, default='')
+    source_id = models.CharField(max_length=100, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='main_hospital_source_id'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.city})"
+
+class Household(models.Model):
+    name = models.CharField(max_length=100)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+
+class HouseholdMember(models.Model):
+    ROLES = [
+        ('admin', 'Admin'),
+        ('member', 'Member'),
+    ]
+    
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='household_memberships')
+    relationship = models.CharField(max_length=50, blank=True)
+    role = models.CharField(max_length=10, choices=ROLES, default='member')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # An invitation until the user accepts it; only then do the others see
+    # their health data
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['household', 'user'], name='main_household_member_user'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} in {self.household.name}"
+
+# Per-user dashboard figures, kept current by the write paths (see
+# main/health_summary.py) so the dashboard is one primary key read
+class HealthSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='health_summary')
+    report_count = models.PositiveIntegerField(default=0)
+    # The newest reports, as {'id', 'title', 'uploaded_at', 'analysis_status'}
+    latest_reports = models.JSONField(default=list)
+    alert_count = models.PositiveIntegerField(default=0)
+    # Alerts still pending or sending, newest first, as {'id', 'type', 'created_at'}
+    open_alert_count = models.PositiveIntegerField(default=0)
+    open_alerts = models.JSONField(default=list)
+    contact_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Health summary for {self.user.username}"
+
+class AnchorBatch(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('anchored', 'Anchored'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Hex Merkle root over the batch's report hashes, as stored on chain
+    root = models.CharField(max_length=64, unique=True)
+    leaf_count = models.PositiveIntegerField()
+    # Reports uploaded before this instant (the end of a closed window)
+    window_end = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    tx_hash = models.CharField(max_length=66, blank=True)
+    block_number = models.PositiveBigIntegerField(null=True, blank=True)
+    gas_used = models.PositiveBigIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    anchored_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='main_anchor_batch_status'),
+        ]
+    
+    def __str__(self):
+        return f"Batch {self.root[:12]} ({self.leaf_count} leaves) - {self.status}"
+
+class ReportAnchor(models.Model):
+    report = models.OneToOneField(MedicalReport, on_delete=models.CASCADE, related_name='anchor')
+    batch = models.ForeignKey(AnchorBatch, on_delete=models.CASCADE, related_name='report_anchors')
+    # Hex sibling hashes from the report's leaf up to the batch root
+    proof = models.JSONField(default=list)
     
     def __str__(self):
-        return f"{self.alert_type} - {self.created_at}" 
\ No newline at end of file
+        return f"Anchor of {self.report.title} in {self.batch.root[:12]}"
@@ -0,0 +1,299 @@
+"""
+Batch anchoring of report hashes to the MedicalRecord contract.
+
+Writing every report on chain with ``storeRecord`` costs a transaction, its
+gas and a confirmation wait per upload. Instead reports are anchored in
+batches: ``cut_batches()`` takes the content hashes of every report
+uploaded before the start of the current ``WINDOW``, builds a Merkle tree
+over them and stores the root as an ``AnchorBatch`` with one
+``ReportAnchor`` (the report's inclusion proof) per report.
+``anchor_pending()`` then sends each root to ``MedicalRecord.anchorRoot``
+in a single transaction. Run both with ``manage.py anchor_reports``.
+
+The tree matches ``MedicalRecord.verifyInclusion``: a leaf is
+``sha256(0x00 || content_hash)`` and a node ``sha256(0x01 || lower ||
+higher)`` of its two children in byte order, so a proof is just the
+sibling hashes on the way up. An odd node at the end of a level moves up
+unpaired. Reports sharing a content hash share a leaf. Proofs can be
+checked here with ``verify_proof()`` or on chain with ``verifyInclusion``.
+A batch whose reports hash to a root already anchored joins that batch.
+
+Reports uploaded before uploads were hashed have no content hash and are
+not anchored.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import AnchorBatch, MedicalReport, ReportAnchor
+
+logger = logging.getLogger(__name__)
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+# The part of the contract's ABI the anchoring uses, so an artifact
+# compiled before anchorRoot existed still works for everything else
+ANCHOR_ABI = [
+    {
+        'type': 'function',
+        'name': 'anchorRoot',
+        'stateMutability': 'nonpayable',
+        'inputs': [{'name': '_root', 'type': 'bytes32'}, {'name': '_leafCount', 'type': 'uint256'}],
+        'outputs': [],
+    },
+    {
+        'type': 'function',
+        'name': 'getAnchor',
+        'stateMutability': 'view',
+        'inputs': [{'name': '_root', 'type': 'bytes32'}],
+        'outputs': [{'name': 'timestamp', 'type': 'uint256'}, {'name': 'leafCount', 'type': 'uint256'}],
+    },
+    {
+        'type': 'function',
+        'name': 'verifyInclusion',
+        'stateMutability': 'view',
+        'inputs': [
+            {'name': '_root', 'type': 'bytes32'},
+            {'name': '_contentHash', 'type': 'bytes32'},
+            {'name': '_proof', 'type': 'bytes32[]'},
+        ],
+        'outputs': [{'name': '', 'type': 'bool'}],
+    },
+]
+
+
+class AnchorError(Exception):
+    pass
+
+
+def merkle_leaf(content_hash):
+    """The leaf of a report's hex sha256 ``content_hash``."""
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(content_hash)).digest()
+
+
+def merkle_parent(left, right):
+    if right < left:
+        left, right = right, left
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def merkle_levels(leaves):
+    """Every level of the tree over ``leaves``, from the leaves up to ``[root]``."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [merkle_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_proof(levels, index):
+    """The sibling hashes from leaf ``index`` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify_proof(content_hash, proof, root):
+    """Whether ``proof`` (hex siblings) leads from ``content_hash`` to the hex ``root``."""
+    node = merkle_leaf(content_hash)
+    for sibling in proof:
+        node = merkle_parent(node, bytes.fromhex(sibling))
+    return node.hex() == root
+
+
+def window_start(now=None):
+    """The start of the anchoring window ``now`` falls in."""
+    now = now or timezone.now()
+    window = settings.REPORT_ANCHORING['WINDOW']
+    seconds = int(now.timestamp()) // window * window
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def build_batch(reports, window_end):
+    """
+    Store the tree over ``reports`` (``(id, content_hash)`` pairs) as an
+    ``AnchorBatch`` with every report's proof. Returns the batch.
+    """
+    hashes = sorted({content_hash for _, content_hash in reports})
+    levels = merkle_levels([merkle_leaf(content_hash) for content_hash in hashes])
+    proofs = {
+        content_hash: [sibling.hex() for sibling in merkle_proof(levels, index)]
+        for index, content_hash in enumerate(hashes)
+    }
+    with transaction.atomic():
+        batch, _ = AnchorBatch.objects.get_or_create(
+            root=levels[-1][0].hex(),
+            defaults={'leaf_count': len(hashes), 'window_end': window_end}
+        )
+        insert_anchors(batch, reports, proofs)
+    return batch
+
+
+def insert_anchors(batch, reports, proofs):
+    # One prepared statement run per report: bulk_create spends most of a
+    # large batch building SQL for every field of every row
+    quote = connection.ops.quote_name
+    statement = (
+        f'INSERT INTO {quote(ReportAnchor._meta.db_table)} '
+        f'({quote("report_id")}, {quote("batch_id")}, {quote("proof")}) VALUES (%s, %s, %s)'
+    )
+    encoded = {content_hash: json.dumps(proof) for content_hash, proof in proofs.items()}
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            statement, [(report_id, batch.id, encoded[content_hash]) for report_id, content_hash in reports]
+        )
+
+
+def cut_batches(now=None, until=None):
+    """
+    Batch every unanchored report uploaded before ``until`` (by default the
+    start of the current window), at most ``MAX_LEAVES`` reports a batch.
+    Returns the new batches. Safe to run from several processes at once.
+    """
+    until = until or window_start(now)
+    limit = settings.REPORT_ANCHORING['MAX_LEAVES']
+    batches = []
+    while True:
+        # Concurrent runs must not batch the same reports: the rows stay
+        # locked until their anchors exist (on SQLite the IMMEDIATE
+        # transaction serializes the runs instead)
+        with transaction.atomic():
+            reports = list(
+                MedicalReport.objects
+                .filter(uploaded_at__lt=until, content_hash__isnull=False, anchor__isnull=True)
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('id')
+                .values_list('id', 'content_hash')[:limit]
+            )
+            if not reports:
+                return batches
+            batches.append(build_batch(reports, until))
+
+
+_anchor = None
+_anchor_lock = threading.Lock()
+
+
+def get_anchor():
+    """The chain backend from ``REPORT_ANCHORING``, created on first use."""
+    global _anchor
+    if _anchor is None:
+        with _anchor_lock:
+            if _anchor is None:
+                config = settings.REPORT_ANCHORING
+                _anchor = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _anchor
+
+
+def anchor_batch(batch, anchor=None):
+    """Send ``batch``'s root to the contract and record the outcome on the batch."""
+    anchor = anchor or get_anchor()
+    batch.attempts += 1
+    try:
+        # An earlier attempt may have got through before its outcome was saved
+        if anchor.anchored_at(batch.root) is None:
+            receipt = anchor.anchor_root(batch.root, batch.leaf_count)
+            batch.tx_hash = receipt['tx_hash']
+            batch.block_number = receipt['block_number']
+            batch.gas_used = receipt['gas_used']
+        batch.status = 'anchored'
+        batch.anchored_at = timezone.now()
+        batch.last_error = ''
+    except Exception as e:
+        logger.warning('Anchoring batch %s failed: %s', batch.root, e)
+        batch.status = 'failed'
+        batch.last_error = str(e)[:1000]
+    batch.save()
+    return batch
+
+
+def anchor_pending(anchor=None):
+    """Anchor every batch that is pending or failed, oldest first; returns them."""
+    anchor = anchor or get_anchor()
+    batches = AnchorBatch.objects.filter(status__in=['pending', 'failed']).order_by('id')
+    return [anchor_batch(batch, anchor) for batch in batches]
+
+
+def report_proof(report):
+    """The anchoring state of ``report`` as the API returns it."""
+    anchor = ReportAnchor.objects.filter(report=report).select_related('batch').first()
+    if anchor is None:
+        return {
+            'status': 'unanchored' if report.content_hash else 'unhashed',
+            'content_hash': report.content_hash,
+        }
+    batch = anchor.batch
+    return {
+        'status': batch.status,
+        'content_hash': report.content_hash,
+        'root': batch.root,
+        'proof': anchor.proof,
+        'leaf_count': batch.leaf_count,
+        'window_end': batch.window_end.isoformat(),
+        'tx_hash': batch.tx_hash or None,
+        'block_number': batch.block_number,
+        'anchored_at': batch.anchored_at.isoformat() if batch.anchored_at else None,
+        'valid': verify_proof(report.content_hash, anchor.proof, batch.root),
+    }
+
+
+class Web3Anchor:
+    """
+    Anchors roots through ``web3`` on the node at ``rpc_url`` (Ganache or
+    anvil locally), signing with ``private_key``.
+
+    Experimental: not yet exercised against a running node.
+    """
+
+    def __init__(self, rpc_url, contract_address, private_key, chain_id=1337, receipt_timeout=120):
+        from web3 import Web3
+        from eth_account import Account
+
+        if not contract_address or not private_key:
+            raise AnchorError('MEDICAL_RECORD_ADDRESS and ETHEREUM_PRIVATE_KEY must be set')
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.account = Account.from_key(private_key)
+        self.contract = self.w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=ANCHOR_ABI)
+        self.chain_id = chain_id
+        self.receipt_timeout = receipt_timeout
+
+    def anchored_at(self, root):
+        """When ``root`` was anchored, or None."""
+        timestamp, _ = self.contract.functions.getAnchor(bytes.fromhex(root)).call()
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) if timestamp else None
+
+    def anchor_root(self, root, leaf_count):
+        txn = self.contract.functions.anchorRoot(bytes.fromhex(root), leaf_count).build_transaction({
+            'from': self.account.address,
+            'chainId': self.chain_id,
+            'nonce': self.w3.eth.get_transaction_count(self.account.address, 'pending'),
+        })
+        signed_txn = self.account.sign_transaction(txn)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.receipt_timeout)
+        if receipt['status'] != 1:
+            raise AnchorError(f'Transaction {tx_hash.hex()} reverted')
+        return {
+            'tx_hash': tx_hash.hex(),
+            'block_number': receipt['blockNumber'],
+            'gas_used': receipt['gasUsed'],
+        }
+
+    def verify_inclusion(self, content_hash, proof, root):
+        """``verify_proof()`` as the contract computes it."""
+        return self.contract.functions.verifyInclusion(
+            bytes.fromhex(root), bytes.fromhex(content_hash), [bytes.fromhex(sibling) for sibling in proof]
+        ).call()
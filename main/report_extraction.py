@@ -0,0 +1,167 @@
+"""
+Text extraction for uploaded reports.
+
+PDF pages are read from their text layer; scanned pages (and PNG/JPG
+uploads) are OCRed with Tesseract. Extraction is CPU-bound, so the pages are split into
+one run of consecutive pages per worker of a process pool: a long PDF
+spreads over all cores, each worker parses the file once for its run, and
+the OCR never holds the GIL of the process serving requests.
+
+The worker functions take plain arguments and do not touch Django settings,
+so they run the same in pool processes as inline.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def ocr_image(image, lang):
+    import pytesseract
+    from PIL import Image
+
+    if not isinstance(image, Image.Image):
+        image = Image.open(io.BytesIO(image))
+    # Tesseract reads greyscale text more reliably than palette or alpha images
+    return pytesseract.image_to_string(image.convert('L'), lang=lang)
+
+
+def extract_page(page, page_number, lang='eng', min_text_chars=20):
+    """
+    Extract one page: a parsed PDF page, or an image file's bytes (images
+    have a single page 0). Returns a dict with ``page``, ``text``,
+    ``method``, ``seconds`` and ``error``.
+    """
+    started = time.perf_counter()
+    text, method, error = '', 'none', ''
+    try:
+        if isinstance(page, bytes):
+            method = 'ocr'
+            text = ocr_image(page, lang)
+        else:
+            method = 'text'
+            text = page.extract_text() or ''
+            if len(text.strip()) < min_text_chars:
+                # No usable text layer: OCR the scanned images on the page
+                method = 'ocr'
+                text = '\n'.join(ocr_image(image.data, lang) for image in page.images)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'page': page_number,
+        'text': text.strip(),
+        'method': method,
+        'seconds': time.perf_counter() - started,
+        'error': error,
+    }
+
+
+def extract_pages(file_path, page_numbers, lang='eng', min_text_chars=20):
+    """
+    Extract ``page_numbers`` of ``file_path``, parsing the file once for
+    all of them. A file that cannot be read fails each of its pages.
+    """
+    started = time.perf_counter()
+    try:
+        if os.path.splitext(file_path)[1].lower() in PDF_EXTENSIONS:
+            from pypdf import PdfReader
+
+            pdf_pages = PdfReader(file_path).pages
+            pages = [pdf_pages[number] for number in page_numbers]
+        else:
+            with open(file_path, 'rb') as f:
+                pages = [f.read()]
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+        return [
+            {'page': number, 'text': '', 'method': 'none', 'seconds': seconds, 'error': error}
+            for number in page_numbers
+        ]
+    return [extract_page(page, number, lang, min_text_chars) for page, number in zip(pages, page_numbers)]
+
+
+def count_pages(file_path):
+    if os.path.splitext(file_path)[1].lower() in PDF_EXTENSIONS:
+        from pypdf import PdfReader
+        return len(PdfReader(file_path).pages)
+    return 1
+
+
+def page_chunks(count, chunks):
+    """Split pages ``0..count-1`` into at most ``chunks`` runs of consecutive pages."""
+    size = -(-count // max(1, chunks)) if count else 1
+    return [range(first, min(first + size, count)) for first in range(0, count, size)]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide extraction pool, or None when it is disabled."""
+    global _executor
+    workers = settings.REPORT_EXTRACTION['WORKERS']
+    if not workers:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Spawn rather than fork: the parent runs request and queue
+                # threads whose locks must not be copied into the workers
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def extract_report(file_path, executor=None, workers=None):
+    """
+    Extract every page of ``file_path`` and return ``{'text', 'pages',
+    'seconds'}``, with per-page results in page order. Pages run on
+    ``executor`` (the shared pool by default) in one chunk per worker
+    (``workers``, by default ``WORKERS``), or inline when there is none.
+    """
+    config = settings.REPORT_EXTRACTION
+    started = time.perf_counter()
+    executor = executor if executor is not None else get_executor()
+    args = (config['OCR_LANG'], config['MIN_TEXT_CHARS'])
+    page_count = count_pages(file_path)
+
+    if executor is None:
+        pages = extract_pages(file_path, range(page_count), *args)
+    else:
+        chunks = page_chunks(page_count, workers or config['WORKERS'])
+        futures = [(executor.submit(extract_pages, file_path, chunk, *args), chunk) for chunk in chunks]
+        pages = [
+            page
+            for future, chunk in futures
+            for page in future.result(timeout=config['PAGE_TIMEOUT'] * len(chunk))
+        ]
+
+    for page in pages:
+        if page['error']:
+            logger.warning(f"Extracting page {page['page']} of {file_path} failed: {page['error']}")
+    return {
+        'text': '\n\n'.join(page['text'] for page in pages if page['text']),
+        'pages': pages,
+        'seconds': time.perf_counter() - started,
+    }
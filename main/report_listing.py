@@ -0,0 +1,103 @@
+"""
+Keyset-paginated listing of a user's reports, newest first.
+
+Pages are addressed by an opaque cursor holding the ``(uploaded_at, id)``
+of the last row served, so fetching page N costs the same as page 1 (no
+OFFSET scan) and rows inserted meanwhile never shift a page. The query
+walks the ``main_report_user_uploaded`` index and loads each report's
+analysis and job with a single join.
+"""
+import base64
+import json
+from datetime import datetime
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from .models import MedicalReport
+
+REPORT_FIELDS = (
+    'id', 'title', 'report_type', 'file', 'content_hash', 'uploaded_at',
+    'reportanalysis__id', 'reportanalysis__source', 'reportanalysis__created_at',
+    'analysisjob__id', 'analysisjob__status',
+)
+
+# The large text columns, only loaded when the caller asks for them
+ANALYSIS_FIELDS = (
+    'reportanalysis__analysis_text', 'reportanalysis__health_tips', 'reportanalysis__yoga_suggestions',
+)
+
+MAX_PAGE_SIZE = 100
+
+# Session key listing the reports an anonymous visitor uploaded, the only
+# anonymous reports they can open
+ANONYMOUS_REPORTS_KEY = 'uploaded_reports'
+MAX_ANONYMOUS_REPORTS = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def remember_anonymous_report(session, report_id):
+    """Let the anonymous visitor holding ``session`` open the report they uploaded."""
+    report_ids = [id for id in session.get(ANONYMOUS_REPORTS_KEY, []) if id != report_id]
+    session[ANONYMOUS_REPORTS_KEY] = (report_ids + [report_id])[-MAX_ANONYMOUS_REPORTS:]
+
+
+def visible_reports(request):
+    """The reports the requester owns: their own, or an anonymous session's uploads."""
+    if request.user.is_authenticated:
+        return MedicalReport.objects.filter(user=request.user)
+    return MedicalReport.objects.filter(user=None, id__in=request.session.get(ANONYMOUS_REPORTS_KEY, []))
+
+
+def encode_cursor(report):
+    payload = json.dumps([report.uploaded_at.isoformat(), report.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        uploaded_at, report_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(uploaded_at), int(report_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def report_queryset(user, cursor=None, include_analysis=False):
+    fields = REPORT_FIELDS + (ANALYSIS_FIELDS if include_analysis else ())
+    reports = (
+        MedicalReport.objects
+        .filter(user=user)
+        .select_related('reportanalysis', 'analysisjob')
+        .only(*fields)
+        .order_by('-uploaded_at', '-id')
+    )
+    if cursor:
+        uploaded_at, report_id = decode_cursor(cursor)
+        # (uploaded_at, id) < cursor, with a plain range on uploaded_at
+        # first so the index scan starts at the cursor instead of the top
+        reports = reports.filter(uploaded_at__lte=uploaded_at).filter(
+            Q(uploaded_at__lt=uploaded_at) | Q(id__lt=report_id)
+        )
+    return reports
+
+
+def report_page(user, cursor=None, limit=20, include_analysis=False):
+    """
+    Return ``(reports, next_cursor)`` for ``user``'s reports after
+    ``cursor``. ``next_cursor`` is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # One extra row tells us whether there is a next page
+    rows = list(report_queryset(user, cursor, include_analysis)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def related_or_none(report, name):
+    """The report's analysis or job, or None (select_related has cached it)."""
+    try:
+        return getattr(report, name)
+    except ObjectDoesNotExist:
+        return None
@@ -0,0 +1,102 @@
+"""
+Small WebP derivatives of uploaded reports for list and preview views.
+
+Each size is rendered once (from the image, or the first page of a PDF) and
+stored next to the original as ``<original>.<size>.webp``. Originals are
+content-addressed, so a derivative never changes once written and can be
+cached by browsers indefinitely.
+"""
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_path(file_name, size):
+    return f"{file_name}.{size}.webp"
+
+
+def open_first_page(file_name, storage, max_side):
+    """Return the image, or the first page of a PDF, as a PIL image."""
+    from PIL import Image
+
+    with storage.open(file_name, 'rb') as f:
+        if os.path.splitext(file_name)[1].lower() != '.pdf':
+            image = Image.open(f)
+            # Let the JPEG decoder downscale while decoding
+            image.draft('RGB', (max_side, max_side))
+            image.load()
+            return image
+        data = f.read()
+
+    import pypdfium2
+
+    document = pypdfium2.PdfDocument(data)
+    try:
+        page = document[0]
+        width, height = page.get_size()
+        # Render at just the resolution the largest derivative needs
+        scale = min(4.0, max_side / max(width, height))
+        return page.render(scale=scale).to_pil()
+    finally:
+        document.close()
+
+
+def generate_derivatives(file_name, storage=None):
+    """
+    Write every configured size that is missing for ``file_name`` and
+    return ``{size: path}``.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    config = settings.REPORT_PREVIEWS
+    paths = {size: derivative_path(file_name, size) for size in config['SIZES']}
+    missing = [size for size, path in paths.items() if not storage.exists(path)]
+    if not missing:
+        return paths
+
+    image = open_first_page(file_name, storage, max(config['SIZES'][size] for size in missing))
+    # Phone photos carry their rotation in EXIF
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    # Largest first, so each smaller size is resized from the previous one
+    for size in sorted(missing, key=lambda size: config['SIZES'][size], reverse=True):
+        max_side = config['SIZES'][size]
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=config['QUALITY'], method=4)
+        saved = storage.save(paths[size], ContentFile(buffer.getvalue()))
+        if saved != paths[size]:
+            # Generated concurrently by another request
+            storage.delete(saved)
+    return paths
+
+
+def delete_derivatives(file_name, storage=None):
+    """Remove every configured size of ``file_name``'s derivatives."""
+    storage = storage or default_storage
+    for size in settings.REPORT_PREVIEWS['SIZES']:
+        storage.delete(derivative_path(file_name, size))
+
+
+def warm_derivatives(report):
+    """Render the derivatives ahead of the first request; failures are only logged."""
+    try:
+        generate_derivatives(report.file.name)
+    except Exception as e:
+        logger.warning(f"Could not render previews for report {report.id}: {str(e)}")
+
+
+def derivative_urls(report):
+    """URLs of the report's derivatives, rendered on first request."""
+    return {
+        f"{size}_url": reverse('main:get_report_derivative', args=[report.id, size])
+        for size in settings.REPORT_PREVIEWS['SIZES']
+    }
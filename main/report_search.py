@@ -0,0 +1,275 @@
+"""
+Ranked full-text search over report analyses.
+
+SQLite uses an FTS5 table kept in sync with ``main_reportanalysis`` by
+triggers; PostgreSQL uses a stored generated ``tsvector`` column with a GIN
+index. Either way the index is updated in the same statement that saves a
+``ReportAnalysis`` (including ``update_or_create`` and bulk writes), so
+there is no separate indexing step. Other databases fall back to an
+unranked ``icontains`` scan.
+
+Ranking scores every candidate, so only a user's most recent
+``REPORT_SEARCH['MAX_CANDIDATES']`` matches are ranked.
+
+SQLite drops a table's triggers when Django rebuilds the table in a
+migration. After every ``migrate`` ``repair_search_index()`` reinstalls
+whatever is missing (logging a warning), and the ``main.W001`` database
+check reports it.
+"""
+import logging
+import re
+from django.conf import settings
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from .models import ReportAnalysis
+
+logger = logging.getLogger(__name__)
+
+# The migration that first installs the index
+SEARCH_MIGRATION = ('main', '0007_reportanalysis_search')
+
+SEARCH_COLUMNS = ('analysis_text', 'health_tips', 'yoga_suggestions', 'extracted_text')
+
+MAX_PAGE = 50
+
+REPORT_FIELDS = ('id', 'title', 'report_type', 'file', 'content_hash', 'uploaded_at')
+
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# FTS5 reads rows through this view, which adds the owner of each analysis
+# as a token so a user's matches are found by intersecting doclists
+# instead of filtering every match in the table
+SQLITE_COLUMNS = ('owner',) + SEARCH_COLUMNS
+
+
+def _values(prefix):
+    return ', '.join(
+        f"'user' || coalesce((SELECT user_id FROM main_medicalreport WHERE id = {prefix}.report_id), 0)"
+        if column == 'owner' else f'{prefix}.{column}'
+        for column in SQLITE_COLUMNS
+    )
+
+
+SQLITE_INSTALL = [
+    f"""CREATE VIEW IF NOT EXISTS main_reportanalysis_search AS
+        SELECT a.id, 'user' || coalesce(r.user_id, 0) AS owner, {', '.join(f'a.{c}' for c in SEARCH_COLUMNS)}
+        FROM main_reportanalysis a JOIN main_medicalreport r ON r.id = a.report_id""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS main_reportanalysis_fts USING fts5(
+        {', '.join(SQLITE_COLUMNS)},
+        content='main_reportanalysis_search', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_insert AFTER INSERT ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(rowid, {', '.join(SQLITE_COLUMNS)})
+        VALUES (new.id, {_values('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_delete AFTER DELETE ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, {', '.join(SQLITE_COLUMNS)})
+        VALUES ('delete', old.id, {_values('old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_update
+        AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON main_reportanalysis BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, {', '.join(SQLITE_COLUMNS)})
+        VALUES ('delete', old.id, {_values('old')});
+        INSERT INTO main_reportanalysis_fts(rowid, {', '.join(SQLITE_COLUMNS)})
+        VALUES (new.id, {_values('new')});
+    END""",
+    # Re-tag the analysis when a report changes owner
+    f"""CREATE TRIGGER IF NOT EXISTS main_reportanalysis_fts_owner
+        AFTER UPDATE OF user_id ON main_medicalreport BEGIN
+        INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts, rowid, {', '.join(SQLITE_COLUMNS)})
+        SELECT 'delete', a.id, 'user' || coalesce(old.user_id, 0), {', '.join(f'a.{c}' for c in SEARCH_COLUMNS)}
+        FROM main_reportanalysis a WHERE a.report_id = new.id;
+        INSERT INTO main_reportanalysis_fts(rowid, {', '.join(SQLITE_COLUMNS)})
+        SELECT a.id, 'user' || coalesce(new.user_id, 0), {', '.join(f'a.{c}' for c in SEARCH_COLUMNS)}
+        FROM main_reportanalysis a WHERE a.report_id = new.id;
+    END""",
+    "INSERT INTO main_reportanalysis_fts(main_reportanalysis_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_insert',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_delete',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_update',
+    'DROP TRIGGER IF EXISTS main_reportanalysis_fts_owner',
+    'DROP TABLE IF EXISTS main_reportanalysis_fts',
+    'DROP VIEW IF EXISTS main_reportanalysis_search',
+]
+
+SQLITE_OBJECTS = (
+    'main_reportanalysis_search',
+    'main_reportanalysis_fts',
+    'main_reportanalysis_fts_insert',
+    'main_reportanalysis_fts_delete',
+    'main_reportanalysis_fts_update',
+    'main_reportanalysis_fts_owner',
+)
+
+POSTGRES_INSTALL = [
+    # Weighted so matches in the analysis itself rank above tips
+    """ALTER TABLE main_reportanalysis ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(analysis_text, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(extracted_text, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(health_tips, '')), 'C')
+            || setweight(to_tsvector('english', coalesce(yoga_suggestions, '')), 'D')
+        ) STORED""",
+    'CREATE INDEX IF NOT EXISTS main_reportanalysis_search ON main_reportanalysis USING GIN (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS main_reportanalysis_search',
+    'ALTER TABLE main_reportanalysis DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def install_search_index(schema_editor=None):
+    """
+    Create (or repair) the search index for the current database and index
+    existing rows.
+    """
+    db = schema_editor.connection if schema_editor else connection
+    run_statements(db, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL})
+
+
+def run_statements(db, statements):
+    with db.cursor() as cursor:
+        for statement in statements.get(db.vendor, []):
+            cursor.execute(statement)
+
+
+def missing_search_objects(db=None):
+    """
+    Names of the index's views, tables, triggers or columns missing from
+    ``db``, once the migration installing them has run.
+    """
+    db = db or connection
+    if db.vendor not in ('sqlite', 'postgresql') or SEARCH_MIGRATION not in MigrationRecorder(db).applied_migrations():
+        return []
+    with db.cursor() as cursor:
+        if db.vendor == 'sqlite':
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(SQLITE_OBJECTS))})",
+                SQLITE_OBJECTS
+            )
+            present = {name for name, in cursor.fetchall()}
+            return [name for name in SQLITE_OBJECTS if name not in present]
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'main_reportanalysis' AND column_name = 'search_vector'"
+        )
+        return [] if cursor.fetchone() else ['main_reportanalysis.search_vector']
+
+
+def repair_search_index(using='default', **kwargs):
+    """``post_migrate`` receiver reinstalling the parts of the index a migration dropped."""
+    db = connections[using]
+    missing = missing_search_objects(db)
+    if missing:
+        logger.warning(f"Report search index incomplete after migrating ({', '.join(missing)}), reinstalling it")
+        run_statements(db, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL})
+
+
+def uninstall_search_index(schema_editor=None):
+    db = schema_editor.connection if schema_editor else connection
+    run_statements(db, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL})
+
+
+def search_terms(query):
+    return TERM_PATTERN.findall(query.lower())[:10]
+
+
+def fts5_query(terms):
+    # Quote every term so user input can never be FTS5 syntax. Terms match
+    # whole stemmed words: a prefix query expands to every indexed word
+    # that starts with it, which is far slower on a large table
+    return '{' + ' '.join(SEARCH_COLUMNS) + '} : (' + ' '.join(f'"{term}"' for term in terms) + ')'
+
+
+def search_reports(user, query, page=1, limit=20):
+    """
+    Return ``(results, has_next)`` for ``user``'s analyses matching every
+    term of ``query``, best match first. Each result is a
+    ``(report, rank, snippet)`` tuple.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    page = max(1, min(page, MAX_PAGE))
+    offset = (page - 1) * limit
+
+    if connection.vendor == 'sqlite':
+        rows = search_sqlite(user, terms, offset, limit)
+    elif connection.vendor == 'postgresql':
+        rows = search_postgres(user, terms, offset, limit)
+    else:
+        return search_reports_unranked(user, terms, offset, limit)
+
+    analyses = (
+        ReportAnalysis.objects
+        .select_related('report')
+        .only(*(f'report__{field}' for field in REPORT_FIELDS))
+        .in_bulk([analysis_id for analysis_id, _, _ in rows[:limit]])
+    )
+    results = [
+        (analyses[analysis_id].report, float(rank), snippet)
+        for analysis_id, rank, snippet in rows[:limit]
+        if analysis_id in analyses
+    ]
+    return results, len(rows) > limit
+
+
+def search_sqlite(user, terms, offset, limit):
+    match = f'owner:user{user.id} AND ({fts5_query(terms)})'
+    with connection.cursor() as cursor:
+        # Rank only the newest MAX_CANDIDATES matches (rowid order is
+        # analysis order); bm25 has to score every row it sorts
+        cursor.execute("""
+            SELECT min(rowid) FROM (
+                SELECT rowid FROM main_reportanalysis_fts
+                WHERE main_reportanalysis_fts MATCH %s ORDER BY rowid DESC LIMIT %s
+            )
+        """, [match, settings.REPORT_SEARCH['MAX_CANDIDATES']])
+        oldest = cursor.fetchone()[0]
+        if oldest is None:
+            return []
+        cursor.execute("""
+            SELECT rowid, bm25(main_reportanalysis_fts, 0.0, 4.0, 1.0, 1.0, 2.0) AS rank,
+                   snippet(main_reportanalysis_fts, 1, '[', ']', '...', 12)
+            FROM main_reportanalysis_fts
+            WHERE main_reportanalysis_fts MATCH %s AND rowid >= %s
+            ORDER BY rank, rowid DESC
+            LIMIT %s OFFSET %s
+        """, [match, oldest, limit + 1, offset])
+        return cursor.fetchall()
+
+
+def search_postgres(user, terms, offset, limit):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT a.id, ts_rank_cd(a.search_vector, q) AS rank,
+                   ts_headline('english', a.analysis_text, q, 'StartSel=[, StopSel=], MaxFragments=1, MaxWords=20')
+            FROM (
+                SELECT a.id, a.analysis_text, a.search_vector
+                FROM main_reportanalysis a
+                JOIN main_medicalreport r ON r.id = a.report_id
+                WHERE a.search_vector @@ websearch_to_tsquery('english', %s) AND r.user_id = %s
+                ORDER BY a.id DESC
+                LIMIT %s
+            ) a, websearch_to_tsquery('english', %s) q
+            ORDER BY rank DESC, a.id DESC
+            LIMIT %s OFFSET %s
+        """, [' '.join(terms), user.id, settings.REPORT_SEARCH['MAX_CANDIDATES'], ' '.join(terms), limit + 1, offset])
+        return cursor.fetchall()
+
+
+def search_reports_unranked(user, terms, offset, limit):
+    analyses = ReportAnalysis.objects.filter(report__user=user)
+    for term in terms:
+        analyses = analyses.filter(
+            Q(analysis_text__icontains=term) | Q(extracted_text__icontains=term) | Q(health_tips__icontains=term)
+        )
+    rows = list(
+        analyses.select_related('report').order_by('-report__uploaded_at')[offset:offset + limit + 1]
+    )
+    results = [(analysis.report, 0.0, analysis.analysis_text[:120]) for analysis in rows[:limit]]
+    return results, len(rows) > limit
@@ -0,0 +1,132 @@
+"""
+Streaming ingestion of uploaded report files.
+
+``HashingUploadHandler`` sits in front of Django's own upload handlers and
+hashes each file as its chunks arrive from the request body, dropping it as
+soon as it grows past the configured size limit. A body whose declared
+length is already over the limit is turned away before it is read. The file then reaches
+storage without ever being read into memory as a whole: small uploads are
+written out chunk by chunk, large ones (already spooled to a temporary file
+by Django) are moved into place. Files are stored under their hash, so
+identical uploads share one blob and names never collide.
+"""
+import hashlib
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+# Room in a multipart body for the boundaries, part headers and small form
+# fields next to a file of the maximum size
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        super().__init__(f"File is larger than the upload limit of {max_size} bytes")
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Record ``(sha256, size)`` per file field in ``digests`` and the names of
+    fields skipped for exceeding ``max_size`` in ``rejected``. ``too_large``
+    is set when the whole body was refused unread for its Content-Length.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.REPORT_UPLOADS['MAX_SIZE']
+        self.digests = {}
+        self.rejected = set()
+        self.too_large = False
+        self._sha256 = None
+        self._size = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Chunked bodies have no length; the per-chunk check covers them
+        if content_length and content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.too_large = True
+            # Parsed as empty, so the rest of the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self._size += len(raw_data)
+        if self._size > self.max_size:
+            # Stop here instead of spooling the rest of the file
+            self.rejected.add(self.field_name)
+            raise SkipFile()
+        self._sha256.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = (self._sha256.hexdigest(), file_size)
+        # Let the next handler build the file object
+        return None
+
+
+def install_upload_handler(request, max_size=None):
+    """
+    Put a ``HashingUploadHandler`` first in the request's handler chain.
+    Must be called before ``request.POST`` or ``request.FILES`` is read.
+    """
+    handler = HashingUploadHandler(request, max_size)
+    request.upload_handlers.insert(0, handler)
+    return handler
+
+
+def file_digest(file, max_size=None, chunk_size=None):
+    """Return ``(sha256, size)`` for ``file``, reading it in chunks."""
+    max_size = max_size or settings.REPORT_UPLOADS['MAX_SIZE']
+    chunk_size = chunk_size or settings.REPORT_UPLOADS['CHUNK_SIZE']
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks(chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLarge(max_size)
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest(), size
+
+
+def content_path(sha256, extension):
+    """
+    Shard blobs over two levels of hash-prefix directories
+    (``reports/ab/cd/abcd...``) so no directory grows past 65,536 entries.
+    """
+    return f'reports/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def save_upload(file, extension, digest=None, storage=None, max_size=None):
+    """
+    Store an uploaded file at its content-addressed path without loading it
+    into memory and return ``(path, sha256, size, created)``. Bytes that are
+    already stored are not written again. ``digest`` is the
+    ``(sha256, size)`` recorded by ``HashingUploadHandler``; without it the
+    file is hashed here.
+    """
+    storage = storage or default_storage
+    max_size = max_size or settings.REPORT_UPLOADS['MAX_SIZE']
+    if digest is None:
+        digest = file_digest(file, max_size)
+    sha256, size = digest
+    if size > max_size:
+        raise UploadTooLarge(max_size)
+
+    path = content_path(sha256, extension)
+    if storage.exists(path):
+        return path, sha256, size, False
+    saved_path = storage.save(path, file)
+    if saved_path != path:
+        # A concurrent upload of the same bytes got there first
+        storage.delete(saved_path)
+        return path, sha256, size, False
+    return path, sha256, size, True
@@ -0,0 +1,193 @@
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from django.conf import settings
+from . import metrics
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset("""
+a an and are as at be can could do does for from have how i in is it me my
+of on or please should steps the to what when where which with would you your
+""".split())
+
+# Questions that only differ in one of these verbs ("add" vs "delete an
+# emergency contact") embed close together but need different answers.
+ACTION_WORDS = frozenset("""
+add create delete remove update edit change upload download view share
+cancel call find search set trigger register login logout
+""".split())
+
+
+def tokenize(text):
+    return [w for w in TOKEN_PATTERN.findall(text.casefold()) if w not in STOP_WORDS]
+
+
+def stem(word):
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def action_words(text):
+    return frozenset(w for w in map(stem, tokenize(text)) if w in ACTION_WORDS)
+
+
+class HashingVectorizer:
+    """
+    Embed text locally with the hashing trick over word unigrams and
+    character n-grams, so paraphrases sharing word stems land close together.
+    """
+
+    def __init__(self, dimensions=256, ngram_range=(3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def features(self, text):
+        """
+        Yield ``(feature, weight)`` pairs. Every word carries the same total
+        weight, so long words do not drown out short ones.
+        """
+        low, high = self.ngram_range
+        for word in tokenize(text):
+            padded = f' {word} '
+            ngrams = [
+                padded[i:i + n]
+                for n in range(low, high + 1)
+                for i in range(len(padded) - n + 1)
+            ]
+            yield 'w:' + stem(word), 1.0
+            for ngram in ngrams:
+                yield ngram, 1.0 / len(ngrams)
+
+    def transform(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self.features(text):
+            # crc32 is stable across processes, unlike hash()
+            h = zlib.crc32(feature.encode('utf-8'))
+            vector[h % self.dimensions] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """
+    Answers for previously seen questions, looked up by cosine similarity.
+
+    Embeddings live in one preallocated float32 matrix so a lookup is a
+    single matrix-vector product. When full, the oldest entry is replaced.
+    Entries older than ``ttl`` seconds (if set) are never returned.
+    """
+
+    def __init__(self, threshold=0.75, dimensions=256, max_entries=10000, candidates=5, ttl=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.candidates = candidates
+        self.ttl = ttl
+        self.vectorizer = HashingVectorizer(dimensions)
+        self._matrix = np.zeros((min(max_entries, 1024), dimensions), dtype=np.float32)
+        # time.monotonic() each matrix row was stored at
+        self._added = np.zeros(self._matrix.shape[0], dtype=np.float64)
+        # (answer, action words) per matrix row
+        self._entries = []
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, count):
+        needed = min(self.max_entries, self._size + count)
+        capacity = self._matrix.shape[0]
+        if needed > capacity:
+            capacity = min(self.max_entries, max(needed, capacity * 2))
+            grown = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+            added = np.zeros(capacity, dtype=np.float64)
+            added[:self._size] = self._added[:self._size]
+            self._added = added
+
+    def add_vectors(self, vectors, entries):
+        """Store ``(answer, action words)`` entries under precomputed vectors."""
+        now = time.monotonic()
+        with self._lock:
+            self._reserve(len(entries))
+            for vector, entry in zip(vectors, entries):
+                slot = self._next
+                self._matrix[slot] = vector
+                self._added[slot] = now
+                if slot < len(self._entries):
+                    self._entries[slot] = entry
+                else:
+                    self._entries.append(entry)
+                self._next = (slot + 1) % self.max_entries
+                self._size = min(self._size + 1, self.max_entries)
+
+    def add(self, question, answer):
+        self.add_vectors([self.vectorizer.transform(question)], [(answer, action_words(question))])
+
+    def search_vector(self, vector, k=1):
+        """Return up to ``k`` ``(score, answer, action words)`` tuples, best first."""
+        with self._lock:
+            size = self._size
+            if not size:
+                return []
+            scores = self._matrix[:size] @ vector
+            if self.ttl is not None:
+                scores[self._added[:size] < time.monotonic() - self.ttl] = -np.inf
+            k = min(k, size)
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(scores[top])[::-1]]
+            return [(float(scores[i]),) + self._entries[i] for i in top if scores[i] > -np.inf]
+
+    def lookup(self, question):
+        """Return the cached answer for a near-duplicate question, or None."""
+        actions = action_words(question)
+        matches = self.search_vector(self.vectorizer.transform(question), self.candidates)
+        for score, answer, cached_actions in matches:
+            if score < self.threshold:
+                break
+            if cached_actions == actions:
+                metrics.increment('semantic_cache.hit')
+                return answer
+        metrics.increment('semantic_cache.miss')
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._size = 0
+            self._next = 0
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Return the process-wide cache configured by ``AI_SEMANTIC_CACHE``, or
+    None when it is disabled. Entries expire after ``AI_RESPONSE_CACHE['TTL']``
+    like exact-match replies.
+    """
+    global _semantic_cache
+    config = settings.AI_SEMANTIC_CACHE
+    if not config['ENABLED']:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    threshold=config['THRESHOLD'],
+                    dimensions=config['DIMENSIONS'],
+                    max_entries=config['MAX_ENTRIES'],
+                    ttl=settings.AI_RESPONSE_CACHE['TTL']
+                )
+    return _semantic_cache
@@ -0,0 +1,37 @@
+"""
+SQLite backend that runs ``OPTIONS['init_command']`` (e.g. tuning pragmas)
+on every new connection and opens transactions with
+``BEGIN <OPTIONS['transaction_mode']>``.
+
+Both options mirror the ones Django 5.1 adds to its own SQLite backend, so
+after upgrading ENGINE can go back to ``django.db.backends.sqlite3`` with
+the same OPTIONS.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in {'DEFERRED', 'EXCLUSIVE', 'IMMEDIATE'}:
+            raise ImproperlyConfigured(
+                "settings.DATABASES['OPTIONS']['transaction_mode'] must be DEFERRED, EXCLUSIVE or IMMEDIATE"
+            )
+        self.transaction_mode = transaction_mode.upper() if transaction_mode else None
+        self.init_commands = kwargs.pop('init_command', '').split(';')
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for init_command in self.init_commands:
+            if init_command := init_command.strip():
+                conn.execute(init_command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            self.cursor().execute('BEGIN')
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
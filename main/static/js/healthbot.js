@@ -98,7 +98,7 @@ class HealthAssistant {
         this.chatInput.value = '';
 
         try {
-            const response = await fetch('/chat/process/', {
+            const response = await fetch('/chat/stream/', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -108,51 +108,47 @@ class HealthAssistant {
             });
 
             if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.message || `HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-            
-            if (data.status === 'error') {
-                throw new Error(data.message || 'Unknown error occurred');
-            }
+            // Read server-sent events as they arrive
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let botMessage = null;
+            let replyText = '';
 
-            // Handle symptom analysis if available
-            if (data.symptom_analysis && data.symptom_analysis.analysis) {
-                const analysis = data.symptom_analysis.analysis;
-                let analysisMessage = '🔍 Symptom Analysis:\n';
-                
-                // Add identified symptoms
-                if (analysis.identified_symptoms.length > 0) {
-                    analysisMessage += '\nIdentified Symptoms:\n';
-                    analysis.identified_symptoms.forEach(symptom => {
-                        analysisMessage += `• ${symptom.symptom} (Severity: ${symptom.severity})\n`;
-                    });
-                }
-                
-                // Add possible conditions
-                if (analysis.possible_conditions.length > 0) {
-                    analysisMessage += '\nPossible Conditions:\n';
-                    analysis.possible_conditions.forEach(condition => {
-                        analysisMessage += `• ${condition}\n`;
-                    });
-                }
-                
-                // Add recommended action
-                analysisMessage += `\nRecommended Action: ${analysis.recommended_action}`;
-                
-                // Add additional notes if available
-                if (analysis.additional_notes) {
-                    analysisMessage += `\n\nNote: ${analysis.additional_notes}`;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const event = this.parseServerEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+
+                    if (event.type === 'token') {
+                        replyText += event.data.text;
+                        if (!botMessage) {
+                            botMessage = this.addBotMessage(replyText);
+                        } else {
+                            botMessage.textContent = replyText;
+                            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+                        }
+                    } else if (event.type === 'symptom_analysis') {
+                        if (event.data && event.data.analysis) {
+                            this.showSymptomAnalysis(event.data.analysis);
+                        }
+                    } else if (event.type === 'error') {
+                        throw new Error(event.data.details || event.data.message || 'Unknown error occurred');
+                    }
                 }
-                
-                this.addSystemMessage(analysisMessage);
             }
 
-            // Add bot response
-            if (data.response) {
-                const botMessage = this.addBotMessage(data.response);
-                this.speak(data.response, botMessage);
+            if (botMessage) {
+                this.speak(replyText, botMessage);
             }
 
         } catch (error) {
@@ -161,6 +157,50 @@ class HealthAssistant {
         }
     }
 
+    parseServerEvent(block) {
+        const event = { type: 'message', data: null };
+        const dataLines = [];
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event.type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        event.data = dataLines.length ? JSON.parse(dataLines.join('\n')) : null;
+        return event;
+    }
+
+    showSymptomAnalysis(analysis) {
+        let analysisMessage = '🔍 Symptom Analysis:\n';
+        
+        // Add identified symptoms
+        if (analysis.identified_symptoms.length > 0) {
+            analysisMessage += '\nIdentified Symptoms:\n';
+            analysis.identified_symptoms.forEach(symptom => {
+                analysisMessage += `• ${symptom.symptom} (Severity: ${symptom.severity})\n`;
+            });
+        }
+        
+        // Add possible conditions
+        if (analysis.possible_conditions.length > 0) {
+            analysisMessage += '\nPossible Conditions:\n';
+            analysis.possible_conditions.forEach(condition => {
+                analysisMessage += `• ${condition}\n`;
+            });
+        }
+        
+        // Add recommended action
+        analysisMessage += `\nRecommended Action: ${analysis.recommended_action}`;
+        
+        // Add additional notes if available
+        if (analysis.additional_notes) {
+            analysisMessage += `\n\nNote: ${analysis.additional_notes}`;
+        }
+        
+        this.addSystemMessage(analysisMessage);
+    }
+
     addUserMessage(text) {
         const messageDiv = document.createElement('div');
         messageDiv.className = 'message user-message';
@@ -1,22 +1,13 @@
-import google.generativeai as genai
-import os
 import json
 import logging
-from dotenv import load_dotenv
+from .ai_handler import strip_json_fence
+from .ai_clients import get_model
+from .ai_cache import MISS, get_response_cache, make_key
 
 logger = logging.getLogger(__name__)
 
 class SymptomChecker:
-    def __init__(self):
-        load_dotenv()
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            logger.error("Google API key not found in environment variables")
-            raise ValueError("Google API key not found")
-            
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        
+    def __init__(self, model=None, cache=None):
         self.system_prompt = """You are a medical symptom analysis AI. Your role is to:
 1. Identify potential symptoms from user messages
 2. Assess their severity (Low, Medium, High)
@@ -38,6 +29,12 @@ Important guidelines:
 - Do not make definitive diagnoses
 """
 
+        if model is None:
+            model = get_model(self.system_prompt)
+        self.model = model
+        self.model_name = getattr(model, 'model_name', type(model).__name__)
+        self.cache = cache if cache is not None else get_response_cache()
+
     def check_symptoms(self, user_message):
         try:
             if not user_message:
@@ -46,37 +43,43 @@ Important guidelines:
                     'message': 'Empty message provided'
                 }
 
+            cache_key = self.cache_key(user_message)
+            cached = self.cache.get(cache_key)
+            if cached is not MISS:
+                return cached
+
             # Prepare the conversation
             conversation = self.model.start_chat(history=[])
-            conversation.send_message(f"{self.system_prompt}\n\nAnalyze this message: {user_message}")
+            conversation.send_message(self.build_prompt(user_message))
             
-            response = conversation.last.text
-            
-            try:
-                # Try to parse the response as JSON
-                analysis = json.loads(response)
+            return self.store_result(cache_key, self.parse_response(conversation.last.text))
                 
-                # Validate required fields
-                required_fields = ['identified_symptoms', 'possible_conditions', 'recommended_action']
-                if not all(field in analysis for field in required_fields):
-                    logger.error(f"Missing required fields in analysis: {response}")
-                    return {
-                        'status': 'error',
-                        'message': 'Invalid analysis format from AI'
-                    }
-                    
-                return {
-                    'status': 'success',
-                    'analysis': analysis
-                }
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse AI response as JSON: {response}")
+        except Exception as e:
+            logger.error(f"Symptom checker error: {str(e)}")
+            return {
+                'status': 'error',
+                'message': f'Failed to analyze symptoms: {str(e)}'
+            }
+
+    async def acheck_symptoms(self, user_message):
+        """Async counterpart of ``check_symptoms`` for ASGI views."""
+        try:
+            if not user_message:
                 return {
                     'status': 'error',
-                    'message': 'Invalid response format from AI'
+                    'message': 'Empty message provided'
                 }
-                
+
+            cache_key = self.cache_key(user_message)
+            cached = self.cache.get(cache_key)
+            if cached is not MISS:
+                return cached
+
+            conversation = self.model.start_chat(history=[])
+            response = await conversation.send_message_async(self.build_prompt(user_message))
+
+            return self.store_result(cache_key, self.parse_response(response.text))
+
         except Exception as e:
             logger.error(f"Symptom checker error: {str(e)}")
             return {
@@ -84,4 +87,43 @@ Important guidelines:
                 'message': f'Failed to analyze symptoms: {str(e)}'
             }
 
-symptom_checker = SymptomChecker() 
\ No newline at end of file
+    def cache_key(self, user_message):
+        return make_key('symptoms', user_message, self.system_prompt, self.model_name)
+
+    def store_result(self, cache_key, result):
+        # Only successful analyses are worth replaying
+        if result['status'] == 'success':
+            self.cache.set(cache_key, result)
+        return result
+
+    def build_prompt(self, user_message):
+        # The system prompt is the model's system instruction
+        return f"Analyze this message: {user_message}"
+
+    def parse_response(self, response):
+        try:
+            # Try to parse the response as JSON
+            analysis = json.loads(strip_json_fence(response))
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse AI response as JSON: {response}")
+            return {
+                'status': 'error',
+                'message': 'Invalid response format from AI'
+            }
+
+        return self.validate_analysis(analysis)
+
+    def validate_analysis(self, analysis):
+        # Validate required fields
+        required_fields = ['identified_symptoms', 'possible_conditions', 'recommended_action']
+        if not isinstance(analysis, dict) or not all(field in analysis for field in required_fields):
+            logger.error(f"Missing required fields in analysis: {analysis}")
+            return {
+                'status': 'error',
+                'message': 'Invalid analysis format from AI'
+            }
+
+        return {
+            'status': 'success',
+            'analysis': analysis
+        }
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from main.analysis_queue import analysis_source_stats, claim_job, run_job
+from main.models import AnalysisJob, MedicalReport, ReportAnalysis
+
+ANALYSIS = {'analysis_text': 'Normal', 'health_tips': '', 'yoga_suggestions': '', 'source': 'local'}
+
+
+@mock.patch('main.analysis_queue.warm_derivatives')
+class AnalysisQueueTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='patient')
+        report = MedicalReport.objects.create(user=user, title='Report', report_type='pdf', file='medical_reports/a.pdf')
+        self.job = AnalysisJob.objects.create(report=report, max_attempts=2)
+
+    def expire_lease(self):
+        AnalysisJob.objects.filter(id=self.job.id).update(locked_at=timezone.now() - timedelta(days=1))
+
+    def test_expired_job_is_reclaimed_until_attempts_run_out(self, warm):
+        self.assertIsNotNone(claim_job('worker-1'))
+        self.expire_lease()
+        self.assertEqual(claim_job('worker-2').locked_by, 'worker-2')
+        self.expire_lease()
+        self.assertIsNone(claim_job('worker-3'))
+        job = AnalysisJob.objects.get(id=self.job.id)
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('failed', 2, ''))
+
+    def test_worker_that_lost_its_lease_does_not_finish_the_job(self, warm):
+        stale = claim_job('worker-1')
+        self.expire_lease()
+        claim_job('worker-2')
+        with mock.patch('main.analysis_queue.analyze_medical_report', return_value=ANALYSIS):
+            self.assertFalse(run_job(stale))
+        job = AnalysisJob.objects.get(id=self.job.id)
+        self.assertEqual((job.status, job.locked_by), ('running', 'worker-2'))
+
+        current = AnalysisJob.objects.select_related('report').get(id=self.job.id)
+        with mock.patch('main.analysis_queue.analyze_medical_report', return_value=ANALYSIS):
+            self.assertTrue(run_job(current))
+        self.assertEqual(AnalysisJob.objects.get(id=self.job.id).status, 'done')
+
+    def test_failed_attempt_is_retried_then_failed(self, warm):
+        with mock.patch('main.analysis_queue.analyze_medical_report', side_effect=RuntimeError('OCR crashed')):
+            self.assertFalse(run_job(claim_job('worker-1')))
+            job = AnalysisJob.objects.get(id=self.job.id)
+            self.assertEqual((job.status, job.locked_by, job.last_error), ('pending', '', 'OCR crashed'))
+            AnalysisJob.objects.filter(id=self.job.id).update(run_after=timezone.now())
+            self.assertFalse(run_job(claim_job('worker-1')))
+        self.assertEqual(AnalysisJob.objects.get(id=self.job.id).status, 'failed')
+
+
+class AnalysisSourceStatsTests(TestCase):
+
+    def test_unreadable_documents_are_not_counted_as_local(self):
+        user = User.objects.create(username='patient')
+        for i, source in enumerate(['local', 'model', 'unreadable', 'unreadable']):
+            report = MedicalReport.objects.create(user=user, title=f'Report {i}', report_type='pdf', file=f'medical_reports/{i}.pdf')
+            ReportAnalysis.objects.create(report=report, analysis_text='', health_tips='', yoga_suggestions='', source=source)
+        self.assertEqual(analysis_source_stats(), {'local': 1, 'model': 1, 'unreadable': 2, 'local_fraction': 0.5})
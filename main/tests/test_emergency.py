@@ -0,0 +1,191 @@
+import asyncio
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from main.alert_dedup import PENDING_TTL, claim_trigger, trigger_keys
+from main.alert_fanout import StubChannel
+from main.models import EmergencyAlert, EmergencyContact
+
+STUB_CHANNELS = {
+    name: {'BACKEND': 'main.alert_fanout.StubChannel', 'TIMEOUT': 1, 'ATTEMPTS': 1, 'OPTIONS': {'CONTACT_FIELD': field}}
+    for name, field in (('sms', 'phone_number'), ('email', 'email'))
+}
+EAGER_ALERTS = dict(settings.EMERGENCY_ALERTS, EAGER=True, CHANNELS=STUB_CHANNELS)
+
+
+@override_settings(EMERGENCY_ALERTS=EAGER_ALERTS)
+class EmergencyTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        StubChannel.outbox.clear()
+
+    def trigger(self, client=None, alert_type='family'):
+        return (client or self.client).post(
+            '/trigger-emergency/', {'type': alert_type, 'location': '12.97,77.59'}, content_type='application/json'
+        )
+
+    def add_contact(self, phone='+911234567890'):
+        return self.client.post(
+            '/emergency-contacts/add/',
+            {'name': 'Contact', 'phone': phone, 'relationship': 'family'},
+            content_type='application/json'
+        )
+
+
+class AnonymousEmergencyTests(EmergencyTestCase):
+
+    def test_anonymous_visitors_cannot_add_contacts(self):
+        self.assertEqual(self.add_contact().status_code, 401)
+        self.assertFalse(EmergencyContact.objects.exists())
+
+    def test_anonymous_alert_never_reaches_unowned_contacts(self):
+        # Left over from when anonymous visitors could save contacts
+        EmergencyContact.objects.create(user=None, name='Stranger', phone_number='+919999999999', relationship='friend')
+        response = self.trigger()
+        self.assertEqual(response.json()['deliveries'], 0)
+        self.assertEqual(list(StubChannel.outbox), [])
+        self.assertEqual(self.client.get('/emergency-contacts/').json()['contacts'], [])
+
+    def test_anonymous_alert_is_only_visible_to_its_session(self):
+        alert_id = self.trigger().json()['alert_id']
+        self.assertEqual(self.client.get(f'/emergency-alerts/{alert_id}/').status_code, 200)
+        other = self.client_class()
+        self.assertEqual(other.get(f'/emergency-alerts/{alert_id}/').status_code, 404)
+
+
+class UserEmergencyTests(EmergencyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='patient')
+        self.client.force_login(self.user)
+
+    def test_alert_notifies_own_contacts(self):
+        self.add_contact()
+        response = self.trigger()
+        self.assertEqual(response.json()['deliveries'], 1)
+        self.assertEqual([message['to'] for message in StubChannel.outbox], ['+911234567890'])
+        self.assertEqual(EmergencyAlert.objects.get(id=response.json()['alert_id']).status, 'completed')
+
+    def test_alert_without_contacts_does_not_block_the_next_press(self):
+        first = self.trigger().json()
+        self.assertEqual(first['deliveries'], 0)
+        self.add_contact()
+        second = self.trigger().json()
+        self.assertFalse(second['duplicate'])
+        self.assertEqual(second['deliveries'], 1)
+        self.assertTrue(self.trigger().json()['duplicate'])
+
+    def test_alert_whose_deliveries_all_failed_does_not_block_the_next_press(self):
+        self.add_contact()
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'press-1'}
+        with mock.patch.object(StubChannel, 'send', side_effect=RuntimeError('gateway down')):
+            first = self.client.post('/trigger-emergency/', {'type': 'family'}, content_type='application/json', **headers).json()
+        self.assertEqual(EmergencyAlert.objects.get(id=first['alert_id']).status, 'failed')
+        # A retry of the same request still gets the original alert back
+        retried = self.client.post('/trigger-emergency/', {'type': 'family'}, content_type='application/json', **headers).json()
+        self.assertEqual((retried['alert_id'], retried['duplicate']), (first['alert_id'], True))
+
+        second = self.trigger().json()
+        self.assertFalse(second['duplicate'])
+        self.assertEqual(EmergencyAlert.objects.get(id=second['alert_id']).status, 'completed')
+        self.assertEqual(len(StubChannel.outbox), 1)
+
+    def test_reservation_of_a_lost_request_expires_quickly(self):
+        keys = trigger_keys(self.user, 'family', 'retry-key')
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.assertIsNone(claim_trigger(keys))
+        self.assertEqual([call.args[2] for call in add.call_args_list], [PENDING_TTL] * len(keys))
+        self.assertTrue(all(timeout > PENDING_TTL for _, timeout in keys))
+
+    def test_contacts_are_read_from_the_database_without_a_shared_cache(self):
+        from main.alert_fanout import contact_list
+
+        self.assertEqual(contact_list(self.user), [])
+        # As another worker would see it: saved without a cache refresh here
+        EmergencyContact.objects.create(user=self.user, name='New', phone_number='+910000000000', relationship='family')
+        self.assertEqual([contact['name'] for contact in contact_list(self.user)], ['New'])
+
+    def test_alert_lost_before_its_deliveries_is_recovered(self):
+        from main.alert_fanout import recover_alerts
+
+        self.add_contact()
+        # A worker died after the INSERT, before planning any delivery
+        alert = EmergencyAlert.objects.create(user=self.user, alert_type='family')
+        self.assertEqual(recover_alerts(older_than=60), [])
+        [recovered] = recover_alerts(older_than=0)
+        self.assertEqual(recovered.id, alert.id)
+        self.assertEqual(recovered.status, 'completed')
+        self.assertEqual(len(StubChannel.outbox), 1)
+        self.assertEqual(recover_alerts(older_than=0), [])
+
+
+SMS_WITHOUT_GATEWAY = {
+    'sms': {'BACKEND': 'main.alert_fanout.SmsChannel', 'TIMEOUT': 1, 'ATTEMPTS': 1, 'OPTIONS': {'URL': ''}},
+}
+
+
+@override_settings(EMERGENCY_ALERTS=dict(settings.EMERGENCY_ALERTS, EAGER=True, CHANNELS=SMS_WITHOUT_GATEWAY))
+class DefaultChannelTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sms_without_a_gateway_fails_instead_of_reporting_sent(self):
+        user = User.objects.create(username='patient')
+        self.client.force_login(user)
+        EmergencyContact.objects.create(user=user, name='Contact', phone_number='+911234567890', relationship='family')
+        response = self.client.post('/trigger-emergency/', {'type': 'family'}, content_type='application/json')
+        alert = EmergencyAlert.objects.get(id=response.json()['alert_id'])
+        self.assertEqual(alert.status, 'failed')
+        [delivery] = alert.deliveries.all()
+        self.assertEqual((delivery.status, delivery.sent_at), ('failed', None))
+        self.assertEqual(delivery.last_error, 'SMS gateway URL is not configured')
+
+
+class AlertEventStreamTests(TestCase):
+
+    @override_settings(EMERGENCY_ALERTS=dict(EAGER_ALERTS, EVENTS=dict(EAGER_ALERTS['EVENTS'], HEARTBEAT=0.01)))
+    def test_stream_ends_on_a_final_status_published_later(self):
+        from main.alert_events import InProcessBroker, stream_alert_events
+
+        broker = InProcessBroker()
+        snapshot = {'alert_id': 1, 'status': 'sending', 'deliveries': 1, 'sent': 0, 'failed': 0}
+
+        async def read_stream():
+            loop = asyncio.get_running_loop()
+            # The poller publishing the unchanged state, then the final one
+            loop.call_later(0.015, broker.publish, 1, snapshot)
+            loop.call_later(0.035, broker.publish, 1, dict(snapshot, status='completed', sent=1))
+            return [event async for event in stream_alert_events(broker, broker.subscribe(1), snapshot)]
+
+        events = asyncio.run(read_stream())
+        self.assertGreaterEqual(events.count(': keep-alive\n\n'), 1)
+        self.assertEqual(sum(event.startswith('event: status') for event in events), 2)
+        self.assertIn('"completed"', events[-1])
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+    def test_poller_reads_subscribed_alerts_in_one_query(self):
+        from main.alert_events import AlertPoller, InProcessBroker
+
+        user = User.objects.create(username='patient')
+        alerts = [EmergencyAlert.objects.create(user=user, alert_type='family', status='sending') for _ in range(3)]
+        broker = InProcessBroker()
+        subscriptions = [broker.subscribe(alert.id) for alert in alerts[:2]]
+        poller = AlertPoller(broker, interval=60)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(poller.poll(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(poller.poll(), 0)
+        EmergencyAlert.objects.filter(id=alerts[0].id).update(status='failed')
+        self.assertEqual(poller.poll(), 1)
+        self.assertEqual(subscriptions[0].latest['status'], 'failed')
+
+        for subscription in subscriptions:
+            broker.unsubscribe(subscription)
+        with self.assertNumQueries(0):
+            self.assertEqual(poller.poll(), 0)
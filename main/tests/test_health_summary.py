@@ -0,0 +1,113 @@
+import asyncio
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from main.alert_fanout import StubChannel, deliver_alert, plan_deliveries, recover_alerts
+from main.analysis_queue import claim_job, run_job
+from main.health_summary import OPEN_ALERTS, alert_closed, alert_opened, check_summaries, get_summary
+from main.models import EmergencyAlert, EmergencyContact, HealthSummary
+from main.tests.test_emergency import EAGER_ALERTS
+from main.tests.test_reports import ReportTestCase
+
+ANALYSIS = {'analysis_text': 'Normal', 'health_tips': '', 'yoga_suggestions': '', 'source': 'local'}
+
+
+@override_settings(EMERGENCY_ALERTS=dict(EAGER_ALERTS, DEDUP_WINDOW=0))
+@mock.patch('main.analysis_queue.warm_derivatives')
+class IncrementalSummaryTests(ReportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        StubChannel.outbox.clear()
+        self.client.force_login(self.owner)
+        # Stored up front, so every write below updates it incrementally
+        get_summary(self.owner)
+
+    def assertInSync(self):
+        self.assertEqual(check_summaries([self.owner.id]), [])
+
+    def test_reports_and_analysis_queue(self, warm):
+        report_ids = [self.upload(self.client, color) for color in ('red', 'green', 'blue', 'white', 'black', 'gray')]
+        self.assertInSync()
+        with mock.patch('main.analysis_queue.analyze_medical_report', return_value=ANALYSIS):
+            run_job(claim_job('worker', job_id=report_ids[-1]))
+        self.assertInSync()
+        with mock.patch('main.analysis_queue.analyze_medical_report', side_effect=RuntimeError('OCR crashed')):
+            job = claim_job('worker', job_id=report_ids[-2])
+            job.max_attempts = job.attempts
+            run_job(job)
+        self.assertInSync()
+        self.assertEqual(
+            [entry['analysis_status'] for entry in HealthSummary.objects.get(user=self.owner).latest_reports[:2]],
+            ['done', 'failed']
+        )
+
+    def test_contacts_and_triggers(self, warm):
+        # Nobody to notify: the alert is final when created
+        self.client.post('/trigger-emergency/', {'type': 'family'}, content_type='application/json')
+        self.assertInSync()
+        for phone in ('+911111111111', '+912222222222'):
+            self.client.post('/emergency-contacts/add/', {'name': 'Contact', 'phone': phone, 'relationship': 'family'},
+                             content_type='application/json')
+        self.assertInSync()
+        self.client.delete(f'/emergency-contacts/{EmergencyContact.objects.first().id}/delete/')
+        self.assertInSync()
+        self.client.post('/trigger-emergency/', {'type': 'ambulance'}, content_type='application/json')
+        self.assertInSync()
+
+    def add_contact(self, phone='+911111111111'):
+        self.client.post('/emergency-contacts/add/', {'name': 'Contact', 'phone': phone, 'relationship': 'family'},
+                         content_type='application/json')
+
+    def test_closing_tops_up_the_open_list(self, warm):
+        self.add_contact()
+        alerts = [EmergencyAlert.objects.create(user=self.owner, alert_type='family') for _ in range(OPEN_ALERTS + 2)]
+        for alert in alerts:
+            plan_deliveries(alert, [('sms', None, '+911111111111')])
+
+        async def deliver_all():
+            # More fan-outs in flight at once than the summary lists
+            await asyncio.gather(*(deliver_alert(alert.id) for alert in alerts))
+
+        slow_channels = {'sms': dict(EAGER_ALERTS['CHANNELS']['sms'], OPTIONS={'CONTACT_FIELD': 'phone_number', 'DELAY': 0.01})}
+        with override_settings(EMERGENCY_ALERTS=dict(EAGER_ALERTS, CHANNELS=slow_channels)):
+            async_to_sync(deliver_all)()
+        self.assertInSync()
+        summary = HealthSummary.objects.get(user=self.owner)
+        self.assertEqual((summary.open_alert_count, summary.open_alerts, summary.alert_count), (0, [], OPEN_ALERTS + 2))
+
+    def open_alerts_of_dead_workers(self):
+        self.add_contact()
+        alerts = [EmergencyAlert.objects.create(user=self.owner, alert_type='family') for _ in range(OPEN_ALERTS + 2)]
+        for alert in alerts:
+            # Workers that opened their alert and died before sending
+            alert.status = 'sending'
+            alert.save(update_fields=['status'])
+            alert_opened(alert)
+        self.assertInSync()
+        return alerts
+
+    def test_recovered_alerts_are_counted_once(self, warm):
+        self.open_alerts_of_dead_workers()
+        # Oldest first, including alerts the open list has no room for
+        self.assertEqual(len(recover_alerts(older_than=0)), OPEN_ALERTS + 2)
+        self.assertInSync()
+
+    def test_closing_a_listed_alert_tops_up_the_open_list(self, warm):
+        alerts = self.open_alerts_of_dead_workers()
+        differences = []
+
+        def closed(alert):
+            alert_closed(alert)
+            differences.extend(check_summaries([self.owner.id]))
+
+        with mock.patch('main.alert_fanout.alert_closed', side_effect=closed):
+            # Newest first: closing a listed alert while more than
+            # OPEN_ALERTS are open moves an older one up into the list
+            for alert in reversed(alerts):
+                async_to_sync(deliver_alert)(alert.id)
+        self.assertEqual(differences, [])
+        self.assertInSync()
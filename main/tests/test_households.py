@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from main.models import EmergencyAlert, Household, HouseholdMember, MedicalReport, ReportAnalysis
+
+
+class HouseholdTestCase(TestCase):
+
+    def make_household(self, size):
+        users = [User.objects.create(username=f'member{size}_{i}') for i in range(size)]
+        household = Household.objects.create(name=f'Household of {size}', created_by=users[0])
+        for i, user in enumerate(users):
+            HouseholdMember.objects.create(
+                household=household, user=user, role='admin' if i == 0 else 'member', accepted_at=timezone.now()
+            )
+            for n in range(3):
+                report = MedicalReport.objects.create(
+                    user=user, title=f'Report {n}', report_type='pdf', file=f'medical_reports/{user.id}_{n}.pdf'
+                )
+                ReportAnalysis.objects.create(report=report, analysis_text='Normal', health_tips='', yoga_suggestions='')
+                EmergencyAlert.objects.create(user=user, alert_type='family', status='completed')
+        return household, users
+
+    def post_json(self, url, body):
+        return self.client.post(url, body, content_type='application/json')
+
+
+class HouseholdDashboardQueryTests(HouseholdTestCase):
+
+    def assert_dashboard_queries(self, size, count):
+        household, users = self.make_household(size)
+        self.client.force_login(users[0])
+        with self.assertNumQueries(count):
+            response = self.client.get(f'/households/{household.id}/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        members = response.json()['members']
+        self.assertEqual(len(members), size)
+        self.assertTrue(all(member['report_count'] == 3 for member in members))
+
+    def test_query_count_does_not_grow_with_members(self):
+        # Session, user, household, members, analyses, alerts
+        self.assert_dashboard_queries(1, 6)
+        self.assert_dashboard_queries(8, 6)
+
+
+class HouseholdInvitationTests(HouseholdTestCase):
+
+    def setUp(self):
+        self.household, (self.admin,) = self.make_household(1)
+        self.invitee = User.objects.create(username='invitee')
+        MedicalReport.objects.create(user=self.invitee, title='Private', report_type='pdf', file='medical_reports/private.pdf')
+
+    def invite(self):
+        self.client.force_login(self.admin)
+        return self.post_json(f'/households/{self.household.id}/members/add/', {'username': 'invitee'})
+
+    def dashboard_usernames(self, user):
+        self.client.force_login(user)
+        response = self.client.get(f'/households/{self.household.id}/dashboard/')
+        if response.status_code != 200:
+            return None
+        return [member['username'] for member in response.json()['members']]
+
+    def test_invited_user_is_hidden_until_they_accept(self):
+        response = self.invite()
+        self.assertEqual(response.json()['message'], 'Invitation sent')
+        self.assertEqual(self.dashboard_usernames(self.admin), [self.admin.username])
+        self.assertIsNone(self.dashboard_usernames(self.invitee))
+
+        self.client.force_login(self.invitee)
+        self.assertEqual(self.client.get('/households/').json()['invitations'][0]['id'], self.household.id)
+        response = self.client.post(f'/households/{self.household.id}/invitation/accept/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.dashboard_usernames(self.admin), [self.admin.username, 'invitee'])
+
+    def test_declined_invitation_is_removed(self):
+        self.invite()
+        self.client.force_login(self.invitee)
+        response = self.client.post(f'/households/{self.household.id}/invitation/decline/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(HouseholdMember.objects.filter(user=self.invitee).exists())
+        response = self.client.post(f'/households/{self.household.id}/invitation/accept/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_invited_user_cannot_invite(self):
+        self.invite()
+        other = User.objects.create(username='other')
+        self.client.force_login(self.invitee)
+        response = self.post_json(f'/households/{self.household.id}/members/add/', {'username': other.username})
+        self.assertEqual(response.status_code, 404)
+
+    def test_body_that_is_not_an_object_is_rejected(self):
+        self.client.force_login(self.admin)
+        for body in ([], 'invitee', 3):
+            response = self.post_json(f'/households/{self.household.id}/members/add/', body)
+            self.assertEqual(response.status_code, 400)
+            response = self.post_json('/households/create/', body)
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+from main.lab_values import parse_lab_values
+
+
+def parsed(text):
+    return {value['name']: round(value['value'], 2) for value in parse_lab_values(text)}
+
+
+class ShortAliasTests(SimpleTestCase):
+
+    def test_short_aliases_need_a_value_in_a_known_unit(self):
+        self.assertEqual(parsed('Hb 13.2 g/dL\nTG: 180 mg/dl\nPLT 2.5 lakhs/cumm\nBUN - 14 mg/dl'),
+                         {'hemoglobin': 13.2, 'triglycerides': 180.0, 'platelets': 250.0, 'urea': 14.0})
+
+    def test_short_aliases_in_free_text_are_ignored(self):
+        self.assertEqual(parsed('Bought a bun for 2 rupees. Call TG at 5 pm. Hb of 3 weeks ago. PLT 4'), {})
+
+    def test_rejected_short_alias_does_not_hide_the_full_name(self):
+        self.assertEqual(parsed('Hb (Haemoglobin) 11.1 g/dL'), {'hemoglobin': 11.1})
+        self.assertEqual(parsed('HbA1c 6.1 %'), {'hba1c': 6.1})
+
+
+class NoteDateTests(SimpleTestCase):
+
+    def test_collection_date_in_the_note_is_not_the_value(self):
+        self.assertEqual(parsed('Hemoglobin (collected 12/03/2024) 13.5 g/dL'), {'hemoglobin': 13.5})
+        self.assertEqual(parsed('HbA1c (done on 12/03/2024) 6.1 %'), {'hba1c': 6.1})
+
+    def test_range_without_a_value_is_not_read(self):
+        self.assertEqual(parsed('Platelets 150-400'), {})
@@ -0,0 +1,135 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from main import report_anchoring
+from main.models import AnchorBatch, MedicalReport, ReportAnchor
+from main.report_anchoring import (
+    anchor_batch, anchor_pending, cut_batches, get_anchor, merkle_leaf, merkle_levels, merkle_proof,
+    report_proof, verify_proof
+)
+
+
+def content_hash(n):
+    return hashlib.sha256(f'report {n}'.encode()).hexdigest()
+
+
+class FakeAnchor:
+    """Records anchored roots in memory; fails while ``fail`` is set."""
+    instances = []
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.roots = {}
+        self.sent = []
+        FakeAnchor.instances.append(self)
+
+    def anchored_at(self, root):
+        return self.roots.get(root)
+
+    def anchor_root(self, root, leaf_count):
+        if self.fail:
+            raise ConnectionError('node unreachable')
+        self.sent.append(root)
+        self.roots[root] = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        return {'tx_hash': '0x' + root, 'block_number': len(self.sent), 'gas_used': 50000}
+
+
+class MerkleTests(SimpleTestCase):
+
+    def proofs_hold(self, count):
+        hashes = [content_hash(n) for n in range(count)]
+        levels = merkle_levels([merkle_leaf(h) for h in hashes])
+        root = levels[-1][0].hex()
+        for index, h in enumerate(hashes):
+            proof = [sibling.hex() for sibling in merkle_proof(levels, index)]
+            self.assertTrue(verify_proof(h, proof, root), f'leaf {index} of {count}')
+            self.assertFalse(verify_proof(content_hash(count + 1), proof, root))
+        return levels
+
+    def test_single_leaf_tree_is_its_own_root(self):
+        levels = self.proofs_hold(1)
+        self.assertEqual(levels[-1][0], merkle_leaf(content_hash(0)))
+        self.assertEqual(merkle_proof(levels, 0), [])
+
+    def test_odd_trees(self):
+        for count in (3, 5, 7, 9):
+            self.proofs_hold(count)
+
+
+@override_settings(REPORT_ANCHORING=dict(settings.REPORT_ANCHORING, BACKEND='main.tests.test_report_anchoring.FakeAnchor', OPTIONS={}))
+class AnchoringTests(TestCase):
+
+    def setUp(self):
+        FakeAnchor.instances.clear()
+        patcher = mock.patch.object(report_anchoring, '_anchor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [User.objects.create(username=f'patient{i}') for i in range(2)]
+        self.until = timezone.now() + timedelta(seconds=1)
+
+    def report(self, n, user=0):
+        return MedicalReport.objects.create(
+            user=self.users[user], title=f'Report {n}', report_type='pdf', file=f'medical_reports/{n}.pdf',
+            content_hash=content_hash(n)
+        )
+
+    def test_reports_with_the_same_hash_share_a_leaf(self):
+        first, copy, other = self.report(1, user=0), self.report(1, user=1), self.report(2)
+        [batch] = cut_batches(until=self.until)
+        self.assertEqual(batch.leaf_count, 2)
+        self.assertEqual(ReportAnchor.objects.get(report=first).proof, ReportAnchor.objects.get(report=copy).proof)
+        for report in (first, copy, other):
+            proof = report_proof(report)
+            self.assertEqual((proof['status'], proof['root'], proof['valid']), ('pending', batch.root, True))
+        self.assertEqual(cut_batches(until=self.until), [])
+
+    def test_batches_are_cut_at_max_leaves(self):
+        for n in range(5):
+            self.report(n)
+        with override_settings(REPORT_ANCHORING=dict(settings.REPORT_ANCHORING, MAX_LEAVES=2)):
+            batches = cut_batches(until=self.until)
+        self.assertEqual([batch.leaf_count for batch in batches], [2, 2, 1])
+        self.assertEqual(ReportAnchor.objects.count(), 5)
+
+    def test_anchor_pending_uses_the_configured_backend(self):
+        report = self.report(1)
+        [batch] = cut_batches(until=self.until)
+        [anchored] = anchor_pending()
+        self.assertIs(get_anchor(), FakeAnchor.instances[0])
+        self.assertEqual(FakeAnchor.instances[0].sent, [batch.root])
+        self.assertEqual((anchored.status, anchored.attempts, anchored.tx_hash), ('anchored', 1, '0x' + batch.root))
+        self.assertEqual(report_proof(report)['status'], 'anchored')
+        self.assertEqual(anchor_pending(), [])
+
+    def test_root_already_on_chain_is_not_sent_again(self):
+        self.report(1)
+        [batch] = cut_batches(until=self.until)
+        anchor = FakeAnchor()
+        # An earlier attempt got through before its outcome was saved
+        anchor.roots[batch.root] = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        batch = anchor_batch(batch, anchor)
+        self.assertEqual(anchor.sent, [])
+        self.assertEqual((batch.status, batch.last_error), ('anchored', ''))
+
+    def test_failed_batch_is_retried(self):
+        self.report(1)
+        [batch] = cut_batches(until=self.until)
+        anchor = FakeAnchor(fail=True)
+        [failed] = anchor_pending(anchor)
+        self.assertEqual((failed.status, failed.attempts), ('failed', 1))
+        self.assertIn('node unreachable', failed.last_error)
+
+        anchor.fail = False
+        [retried] = anchor_pending(anchor)
+        self.assertEqual((retried.id, retried.status, retried.attempts), (batch.id, 'anchored', 2))
+        self.assertEqual(AnchorBatch.objects.get(id=batch.id).last_error, '')
+
+    def test_unhashed_and_unbatched_reports(self):
+        report = self.report(1)
+        self.assertEqual(report_proof(report)['status'], 'unanchored')
+        report.content_hash = None
+        self.assertEqual(report_proof(report)['status'], 'unhashed')
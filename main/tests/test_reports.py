@@ -0,0 +1,130 @@
+import io
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+
+def png_upload(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(buffer, 'PNG')
+    return SimpleUploadedFile('report.png', buffer.getvalue(), content_type='image/png')
+
+
+class ReportTestCase(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.owner = User.objects.create(username='owner')
+        self.other = User.objects.create(username='other')
+
+    def upload(self, client, color='red'):
+        response = client.post('/upload-report/', {'report': png_upload(color)})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['report_id']
+
+
+class ReportPreviewTests(ReportTestCase):
+
+    def test_preview_is_private_to_its_owner(self):
+        self.client.force_login(self.owner)
+        report_id = self.upload(self.client)
+        response = self.client.get(f'/reports/{report_id}/thumbnail.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private,'))
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(f'/reports/{report_id}/thumbnail.webp').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(f'/reports/{report_id}/thumbnail.webp').status_code, 404)
+
+    def test_anonymous_upload_is_only_visible_to_its_session(self):
+        report_id = self.upload(self.client, 'blue')
+        self.assertEqual(self.client.get(f'/reports/{report_id}/thumbnail.webp').status_code, 200)
+        other = self.client_class()
+        self.assertEqual(other.get(f'/reports/{report_id}/thumbnail.webp').status_code, 404)
+
+
+class ReportAnalysisTests(ReportTestCase):
+
+    def test_analysis_is_private_to_its_owner(self):
+        self.client.force_login(self.owner)
+        report_id = self.upload(self.client)
+        self.assertIn(self.client.get(f'/report-analysis/{report_id}/').status_code, (200, 202))
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(f'/report-analysis/{report_id}/').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(f'/report-analysis/{report_id}/').status_code, 404)
+
+
+class ReportAnchorTests(ReportTestCase):
+
+    def test_anchor_is_private_to_its_owner(self):
+        self.client.force_login(self.owner)
+        report_id = self.upload(self.client)
+        response = self.client.get(f'/reports/{report_id}/anchor/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['anchor']['status'], 'unanchored')
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(f'/reports/{report_id}/anchor/').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(f'/reports/{report_id}/anchor/').status_code, 404)
+
+
+class ShardReportFilesTests(ReportTestCase):
+
+    def test_moved_file_takes_its_previews_along(self):
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+        from main.models import MedicalReport
+        from main.report_previews import generate_derivatives
+
+        source = default_storage.save('medical_reports/legacy.png', png_upload('red'))
+        report = MedicalReport.objects.create(user=self.owner, title='Legacy', report_type='png', file=source)
+        old_previews = list(generate_derivatives(source).values())
+        self.assertTrue(all(default_storage.exists(path) for path in old_previews))
+
+        call_command('shard_report_files', stdout=io.StringIO())
+        report.refresh_from_db()
+        self.assertNotEqual(report.file.name, source)
+        self.assertFalse(default_storage.exists(source))
+        self.assertFalse(any(default_storage.exists(path) for path in old_previews))
+
+
+@override_settings(REPORT_UPLOADS={'MAX_SIZE': 4096, 'CHUNK_SIZE': 1024})
+class UploadLimitTests(ReportTestCase):
+
+    def post(self, size):
+        from unittest import mock
+        from django.test import RequestFactory
+        from main.views import upload_report
+
+        upload = SimpleUploadedFile('report.pdf', b'%PDF' + b'0' * (size - 4), content_type='application/pdf')
+        request = RequestFactory().post('/upload-report/', {'report': upload})
+        request.user = self.owner
+        request.session = self.client.session
+        stream_read = request._stream.read
+        read = []
+        with mock.patch.object(request._stream, 'read', side_effect=lambda *args: read.append(stream_read(*args)) or read[-1]):
+            response = upload_report(request)
+        return response, sum(len(chunk) for chunk in read)
+
+    def test_body_over_the_limit_is_refused_unread(self):
+        from main.report_uploads import MULTIPART_OVERHEAD
+
+        response, read = self.post(4096 + MULTIPART_OVERHEAD + 1)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(read, 0)
+
+    def test_file_over_the_limit_within_the_overhead_is_dropped_while_parsing(self):
+        response, read = self.post(8192)
+        self.assertEqual(response.status_code, 413)
+        self.assertGreater(read, 0)
@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from main.apps import check_search_index
+from main.models import MedicalReport, ReportAnalysis
+from main.report_search import missing_search_objects, repair_search_index, search_reports
+
+
+class SearchIndexRepairTests(TestCase):
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+
+    def test_dropped_trigger_is_reported_and_reinstalled(self):
+        self.assertEqual(missing_search_objects(), [])
+        with connection.cursor() as cursor:
+            # As a migration rebuilding main_reportanalysis leaves it
+            cursor.execute('DROP TRIGGER main_reportanalysis_fts_insert')
+        self.assertEqual(missing_search_objects(), ['main_reportanalysis_fts_insert'])
+        self.assertEqual([warning.id for warning in check_search_index(databases=['default'])], ['main.W001'])
+
+        repair_search_index(using='default')
+        self.assertEqual(missing_search_objects(), [])
+        user = User.objects.create(username='patient')
+        report = MedicalReport.objects.create(user=user, title='Blood test', report_type='pdf', file='medical_reports/a.pdf')
+        ReportAnalysis.objects.create(report=report, analysis_text='Haemoglobin is low', health_tips='', yoga_suggestions='')
+        results, _ = search_reports(user, 'haemoglobin')
+        self.assertEqual([found.id for found, _, _ in results], [report.id])
@@ -0,0 +1,26 @@
+from unittest import mock
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from main import semantic_cache
+from main.semantic_cache import SemanticCache, get_semantic_cache
+
+
+class SemanticCacheTests(SimpleTestCase):
+
+    def test_entries_expire_after_ttl(self):
+        cache = SemanticCache(ttl=60)
+        with mock.patch('main.semantic_cache.time.monotonic', return_value=1000.0):
+            cache.add('How do I upload a report?', 'Open Reports')
+            self.assertEqual(cache.lookup('how do i upload a report'), 'Open Reports')
+        with mock.patch('main.semantic_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.lookup('how do i upload a report'))
+            cache.add('How do I upload a report?', 'Open Reports again')
+            self.assertEqual(cache.lookup('how do i upload a report'), 'Open Reports again')
+
+    @mock.patch.object(semantic_cache, '_semantic_cache', None)
+    def test_settings_switch_and_ttl(self):
+        with override_settings(AI_SEMANTIC_CACHE=dict(settings.AI_SEMANTIC_CACHE, ENABLED=False)):
+            self.assertIsNone(get_semantic_cache())
+        with override_settings(AI_SEMANTIC_CACHE=dict(settings.AI_SEMANTIC_CACHE, ENABLED=True),
+                               AI_RESPONSE_CACHE=dict(settings.AI_RESPONSE_CACHE, TTL=42)):
+            self.assertEqual(get_semantic_cache().ttl, 42)
@@ -1,9 +1,15 @@
 from django.urls import path
 from .views import (
-    index, upload_report, get_report_analysis,
-    process_chat,
-    trigger_emergency, get_emergency_contacts,
-    add_emergency_contact, delete_emergency_contact
+    index, upload_report, get_report_analysis, get_report_derivative, get_report_anchor,
+    list_reports, search_report_analyses,
+    process_chat, process_chat_stream,
+    trigger_emergency, get_emergency_alert, emergency_alert_events, get_emergency_contacts,
+    add_emergency_contact, delete_emergency_contact,
+    find_nearby_hospitals,
+    list_households, create_household, add_household_member, accept_household_invitation,
+    decline_household_invitation, household_dashboard,
+    get_health_summary,
+    get_metrics
 )
 
 app_name = 'main'
@@ -12,9 +18,25 @@ urlpatterns = [
     path('', index, name='index'),
     path('upload-report/', upload_report, name='upload_report'),
     path('report-analysis/<int:report_id>/', get_report_analysis, name='get_report_analysis'),
+    path('reports/', list_reports, name='list_reports'),
+    path('reports/search/', search_report_analyses, name='search_report_analyses'),
+    path('reports/<int:report_id>/anchor/', get_report_anchor, name='get_report_anchor'),
+    path('reports/<int:report_id>/<str:size>.webp', get_report_derivative, name='get_report_derivative'),
     path('trigger-emergency/', trigger_emergency, name='trigger_emergency'),
+    path('emergency-alerts/<int:alert_id>/', get_emergency_alert, name='get_emergency_alert'),
+    path('emergency-alerts/<int:alert_id>/events/', emergency_alert_events, name='emergency_alert_events'),
     path('emergency-contacts/', get_emergency_contacts, name='get_emergency_contacts'),
     path('emergency-contacts/add/', add_emergency_contact, name='add_emergency_contact'),
     path('emergency-contacts/<int:contact_id>/delete/', delete_emergency_contact, name='delete_emergency_contact'),
+    path('hospitals/nearby/', find_nearby_hospitals, name='find_nearby_hospitals'),
+    path('households/', list_households, name='list_households'),
+    path('households/create/', create_household, name='create_household'),
+    path('households/<int:household_id>/members/add/', add_household_member, name='add_household_member'),
+    path('households/<int:household_id>/invitation/accept/', accept_household_invitation, name='accept_household_invitation'),
+    path('households/<int:household_id>/invitation/decline/', decline_household_invitation, name='decline_household_invitation'),
+    path('households/<int:household_id>/dashboard/', household_dashboard, name='household_dashboard'),
+    path('health-summary/', get_health_summary, name='get_health_summary'),
     path('chat/process/', process_chat, name='process_chat'),
+    path('chat/stream/', process_chat_stream, name='process_chat_stream'),
+    path('metrics/', get_metrics, name='get_metrics'),
 ]
\ No newline at end of file
@@ -1,8 +1,29 @@
-from .medical_record_views import index, upload_report, get_report_analysis
-from .chat_views import process_chat
+from .medical_record_views import (
+    index,
+    upload_report,
+    get_report_analysis,
+    get_report_derivative,
+    get_report_anchor,
+    list_reports,
+    search_report_analyses
+)
+from .chat_views import process_chat, process_chat_stream
 from .emergency_views import (
     trigger_emergency,
+    get_emergency_alert,
+    emergency_alert_events,
     get_emergency_contacts,
     add_emergency_contact,
     delete_emergency_contact
-) 
\ No newline at end of file
+)
+from .hospital_views import find_nearby_hospitals
+from .household_views import (
+    list_households,
+    create_household,
+    add_household_member,
+    accept_household_invitation,
+    decline_household_invitation,
+    household_dashboard
+)
+from .dashboard_views import get_health_summary
+from .metrics_views import get_metrics
@@ -1,13 +1,23 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from asgiref.sync import sync_to_async
+import asyncio
 import json
-from ..ai_handler import ai_handler
-from ..symptom_checker import symptom_checker
+from ..ai_clients import get_ai_handler, get_symptom_checker
+from ..chat_pipeline import run_chat, needs_symptom_context, symptom_context
 import logging
 
 logger = logging.getLogger(__name__)
 
+def chat_session_id(request):
+    """Key the conversation history on the user, or on the browser session."""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    if not request.session.session_key:
+        request.session.create()
+    return f"session:{request.session.session_key}"
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def process_chat(request):
@@ -29,20 +39,13 @@ def process_chat(request):
                 'message': 'Message cannot be empty'
             }, status=400)
 
-        # First, check for symptoms using Gemini model
-        try:
-            symptom_result = symptom_checker.check_symptoms(user_message)
-            if symptom_result['status'] == 'error':
-                logger.error(f"Symptom checker error: {symptom_result['message']}")
-        except Exception as e:
-            logger.error(f"Symptom checker exception: {str(e)}")
-            symptom_result = {'status': 'error', 'message': str(e)}
-        
-        # Get response from Gemini AI
+        # Check for symptoms and get the assistant reply from Gemini
         try:
-            ai_response = ai_handler.get_response(
-                user_message, 
-                symptom_result if symptom_result['status'] == 'success' else None
+            symptom_result, ai_response = run_chat(
+                user_message,
+                get_symptom_checker(),
+                get_ai_handler(),
+                session_id=chat_session_id(request)
             )
             
             if ai_response['status'] == 'error':
@@ -73,4 +76,85 @@ def process_chat(request):
             'status': 'error',
             'message': 'Internal server error',
             'details': str(e)
-        }, status=500) 
\ No newline at end of file
+        }, status=500) 
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_chat_events(user_message, symptom_checker, ai_handler, session_id=None):
+    """
+    Yield server-sent events for one chat message: the symptom analysis as
+    soon as it is known, then the assistant reply token by token.
+    """
+    symptom_task = asyncio.create_task(symptom_checker.acheck_symptoms(user_message))
+    symptom_sent = False
+    try:
+        context = None
+        if needs_symptom_context(user_message):
+            symptom_result = await symptom_task
+            context = symptom_context(symptom_result)
+            symptom_sent = True
+            yield sse_event('symptom_analysis', context)
+
+        async for chunk in ai_handler.astream_response(user_message, context, session_id):
+            yield sse_event('token', {'text': chunk})
+
+        if not symptom_sent:
+            symptom_result = await symptom_task
+            yield sse_event('symptom_analysis', symptom_context(symptom_result))
+
+        yield sse_event('done', {'status': 'success'})
+
+    except Exception as e:
+        logger.error(f"Chat stream exception: {str(e)}")
+        yield sse_event('error', {
+            'status': 'error',
+            'message': 'Failed to process message',
+            'details': str(e)
+        })
+
+    finally:
+        # The client may disconnect mid-stream
+        if not symptom_task.done():
+            symptom_task.cancel()
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def process_chat_stream(request):
+    try:
+        data = json.loads(request.body)
+        user_message = data.get('message', '').strip()
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON format'
+        }, status=400)
+
+    if not user_message:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Message cannot be empty'
+        }, status=400)
+
+    try:
+        symptom_checker = get_symptom_checker()
+        ai_handler = get_ai_handler()
+        session_id = await sync_to_async(chat_session_id)(request)
+    except Exception as e:
+        logger.error(f"AI client initialization error: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Failed to process message',
+            'details': str(e)
+        }, status=500)
+
+    response = StreamingHttpResponse(
+        stream_chat_events(user_message, symptom_checker, ai_handler, session_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,24 @@
+from django.http import JsonResponse
+from ..health_summary import get_summary
+
+def get_health_summary(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    
+    # One primary key read; the write paths keep the row current
+    summary = get_summary(request.user)
+    return JsonResponse({
+        'status': 'success',
+        'summary': {
+            'report_count': summary.report_count,
+            'latest_reports': summary.latest_reports,
+            'alert_count': summary.alert_count,
+            'open_alert_count': summary.open_alert_count,
+            'open_alerts': summary.open_alerts,
+            'contact_count': summary.contact_count,
+            'updated_at': summary.updated_at.isoformat() if summary.updated_at else None
+        }
+    })
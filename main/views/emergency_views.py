@@ -1,7 +1,35 @@
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from django.utils import timezone
 import json
+from ..alert_events import (
+    TooManySubscribers, get_broker, get_poller, load_snapshot, remember_anonymous_alert, stream_alert_events, visible_alerts
+)
+from ..alert_fanout import CONTACT_FIELDS, contact_list, dispatch_alert, plan_recipients, record_slo, refresh_contact_list
+from ..alert_dedup import (
+    MAX_KEY_LENGTH, TriggerInProgress, claim_trigger, release_trigger, remember_trigger, trigger_keys
+)
+from ..health_summary import alert_added, contacts_changed
 from ..models import EmergencyContact, EmergencyAlert
+from .. import metrics
+
+def authentication_required():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Authentication required'
+    }, status=401)
+
+def contact_json(contact):
+    return {
+        'id': contact['id'],
+        'name': contact['name'],
+        'phone': contact['phone_number'],
+        'email': contact['email'],
+        'relationship': contact['relationship']
+    }
 
 @csrf_exempt
 def trigger_emergency(request):
@@ -12,33 +40,83 @@ def trigger_emergency(request):
             location = data.get('location')
             message = data.get('message', '')
             
-            # Create emergency alert
-            alert = EmergencyAlert.objects.create(
-                alert_type=alert_type,
-                location=location,
-                message=message
-            )
+            if alert_type not in dict(EmergencyAlert.ALERT_TYPES):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Invalid alert type'
+                }, status=400)
             
-            # Handle different alert types
-            if alert_type == 'ambulance':
-                alert.status = 'completed'
-                alert.message = 'Ambulance has been called and is on the way.'
-                alert.save()
-                
-            elif alert_type == 'family':
-                alert.status = 'completed'
-                alert.message = 'Family members have been notified.'
-                alert.save()
-                
-            elif alert_type == 'location':
-                alert.status = 'completed'
-                alert.message = 'Location has been shared with emergency contacts.'
-                alert.save()
+            idempotency_key = request.headers.get('Idempotency-Key', '')
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Idempotency-Key is too long'
+                }, status=400)
+            
+            user = request.user if request.user.is_authenticated else None
+            # Retries and repeated presses get the original alert back
+            # without touching the database or notifying anyone again
+            keys = trigger_keys(user, alert_type, idempotency_key)
+            try:
+                original_id = claim_trigger(keys)
+            except TriggerInProgress as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=409)
+            if original_id is not None:
+                metrics.increment('emergency.trigger.deduplicated')
+                return JsonResponse({
+                    'status': 'success',
+                    'message': 'This alert has already been triggered',
+                    'alert_id': original_id,
+                    'duplicate': True
+                })
+            
+            try:
+                # Recipients come from the cached contact list, so the alert
+                # is a single INSERT, final status included when nobody can
+                # be told
+                recipients = plan_recipients(contact_list(user))
+                undeliverable = {} if recipients else {'status': 'failed', 'completed_at': timezone.now()}
+                alert = EmergencyAlert.objects.create(
+                    alert_type=alert_type,
+                    location=location,
+                    message=message,
+                    user=user,
+                    **undeliverable
+                )
+            except Exception:
+                release_trigger(keys)
+                raise
+            if recipients:
+                remember_trigger(keys, alert.id)
+            else:
+                # Nobody was notified: pressing again (after adding a
+                # contact) must not be answered with this alert
+                release_trigger(keys)
+            if user is None:
+                remember_anonymous_alert(request.session, alert.id)
+            
+            if recipients:
+                # Sent concurrently in the background
+                alert = dispatch_alert(alert, recipients)
+                response_message = f"{alert.get_alert_type_display()}: notifying {len(recipients)} recipient(s)"
+            else:
+                alert_added(alert)
+                record_slo(alert)
+                response_message = (
+                    'No emergency contacts to notify. Please add a contact.' if user
+                    else 'Log in and add emergency contacts to notify them.'
+                )
             
             return JsonResponse({
                 'status': 'success',
-                'message': alert.message,
-                'alert_id': alert.id
+                'message': response_message,
+                'alert_id': alert.id,
+                'alert_status': alert.status,
+                'deliveries': len(recipients),
+                'duplicate': False
             })
             
         except Exception as e:
@@ -55,22 +133,23 @@ def trigger_emergency(request):
 @csrf_exempt
 def add_emergency_contact(request):
     if request.method == 'POST':
+        if not request.user.is_authenticated:
+            return authentication_required()
         try:
             data = json.loads(request.body)
+            user = request.user
             contact = EmergencyContact.objects.create(
+                user=user,
                 name=data.get('name'),
-                phone=data.get('phone'),
+                phone_number=data.get('phone'),
+                email=data.get('email') or '',
                 relationship=data.get('relationship')
             )
+            contacts_changed(user, refresh_contact_list(user))
             return JsonResponse({
                 'status': 'success',
                 'message': 'Contact added successfully',
-                'contact': {
-                    'id': contact.id,
-                    'name': contact.name,
-                    'phone': contact.phone,
-                    'relationship': contact.relationship
-                }
+                'contact': contact_json({field: getattr(contact, field) for field in CONTACT_FIELDS})
             })
         except Exception as e:
             return JsonResponse({
@@ -83,24 +162,99 @@ def add_emergency_contact(request):
     }, status=405)
 
 def get_emergency_contacts(request):
-    contacts = EmergencyContact.objects.all()
-    contacts_list = [{
-        'id': contact.id,
-        'name': contact.name,
-        'phone': contact.phone,
-        'relationship': contact.relationship
-    } for contact in contacts]
+    # Anonymous visitors have no contacts
+    user = request.user if request.user.is_authenticated else None
     return JsonResponse({
         'status': 'success',
-        'contacts': contacts_list
+        'contacts': [contact_json(contact) for contact in contact_list(user)]
     })
 
+def get_emergency_alert(request, alert_id):
+    user = request.user if request.user.is_authenticated else None
+    try:
+        alert = visible_alerts(user, request.session).get(id=alert_id)
+    except EmergencyAlert.DoesNotExist:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Alert not found'
+        }, status=404)
+    
+    return JsonResponse({
+        'status': 'success',
+        'alert': {
+            'id': alert.id,
+            'type': alert.alert_type,
+            'status': alert.status,
+            'created_at': alert.created_at.isoformat(),
+            'completed_at': alert.completed_at.isoformat() if alert.completed_at else None
+        },
+        'deliveries': [
+            {
+                'channel': delivery.channel,
+                'recipient': delivery.recipient,
+                'contact_id': delivery.contact_id,
+                'status': delivery.status,
+                'attempts': delivery.attempts,
+                'last_error': delivery.last_error,
+                'sent_at': delivery.sent_at.isoformat() if delivery.sent_at else None
+            }
+            for delivery in alert.deliveries.order_by('id')
+        ]
+    })
+
+def load_alert_events_snapshot(request, alert_id):
+    try:
+        user = request.user if request.user.is_authenticated else None
+        return load_snapshot(alert_id, user, request.session)
+    finally:
+        # Idle streams must not each hold a database connection
+        connection.close()
+
+
+@require_GET
+async def emergency_alert_events(request, alert_id):
+    # Under ASGI main.alert_events.AlertEventsApp answers this path first
+    broker = get_broker()
+    try:
+        # Subscribe before reading the current state so no change is missed
+        subscription = broker.subscribe(alert_id)
+    except TooManySubscribers as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=503)
+    try:
+        snapshot = await sync_to_async(load_alert_events_snapshot)(request, alert_id)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+    if snapshot is None:
+        broker.unsubscribe(subscription)
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Alert not found'
+        }, status=404)
+
+    get_poller()
+    response = StreamingHttpResponse(
+        stream_alert_events(broker, subscription, snapshot),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 def delete_emergency_contact(request, contact_id):
     if request.method == 'DELETE':
+        if not request.user.is_authenticated:
+            return authentication_required()
         try:
-            contact = EmergencyContact.objects.get(id=contact_id)
+            user = request.user
+            contact = EmergencyContact.objects.get(id=contact_id, user=user)
             contact.delete()
+            contacts_changed(user, refresh_contact_list(user))
             return JsonResponse({
                 'status': 'success',
                 'message': 'Contact deleted successfully'
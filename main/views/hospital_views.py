@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.http import JsonResponse
+from ..hospital_index import nearest_hospitals
+
+def hospital_json(hospital, distance_km):
+    return {
+        'id': hospital.id,
+        'name': hospital.name,
+        'address': hospital.address,
+        'city': hospital.city,
+        'state': hospital.state,
+        'phone': hospital.phone,
+        'latitude': hospital.latitude,
+        'longitude': hospital.longitude,
+        'has_emergency': hospital.has_emergency,
+        'distance_km': round(distance_km, 2)
+    }
+
+def find_nearby_hospitals(request):
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+        k = int(request.GET.get('k', 10))
+    except (KeyError, ValueError):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'lat and lon are required numbers'
+        }, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'lat or lon is out of range'
+        }, status=400)
+    k = max(1, min(k, settings.HOSPITAL_SEARCH['MAX_RESULTS']))
+    emergency = request.GET.get('emergency', '').lower() in ('1', 'true', 'yes')
+    
+    return JsonResponse({
+        'status': 'success',
+        'hospitals': [
+            hospital_json(hospital, distance_km)
+            for hospital, distance_km in nearest_hospitals(lat, lon, k, emergency)
+        ]
+    })
@@ -0,0 +1,222 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+import json
+from ..households import MAX_MEMBERS, dashboard_members, household_for
+from ..models import Household, HouseholdMember
+
+def authentication_required():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Authentication required'
+    }, status=401)
+
+def household_not_found():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Household not found'
+    }, status=404)
+
+def invitation_not_found():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Invitation not found'
+    }, status=404)
+
+def invalid_json():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Invalid JSON'
+    }, status=400)
+
+def invalid_method():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Invalid request method'
+    }, status=405)
+
+def json_object(request):
+    """The request body's JSON object, or None when it is not one."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def member_json(member):
+    analysis = member.latest_analysis
+    return {
+        'user_id': member.user.id,
+        'username': member.user.username,
+        'name': member.user.get_full_name() or member.user.username,
+        'relationship': member.relationship,
+        'role': member.role,
+        'report_count': member.report_count,
+        'last_report_at': member.last_report_at.isoformat() if member.last_report_at else None,
+        'latest_analysis': {
+            'report_id': analysis.report_id,
+            'report_title': analysis.report.title,
+            'text': analysis.analysis_text,
+            'health_tips': analysis.health_tips,
+            'created_at': analysis.created_at.isoformat()
+        } if analysis else None,
+        'alert_count': member.alert_count,
+        'recent_alerts': [
+            {
+                'id': alert.id,
+                'type': alert.alert_type,
+                'status': alert.status,
+                'created_at': alert.created_at.isoformat()
+            }
+            for alert in member.user.recent_alerts
+        ]
+    }
+
+def list_households(request):
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    memberships = HouseholdMember.objects.filter(user=request.user).select_related('household')
+    return JsonResponse({
+        'status': 'success',
+        'households': [
+            {
+                'id': membership.household.id,
+                'name': membership.household.name,
+                'role': membership.role
+            }
+            for membership in memberships if membership.accepted_at
+        ],
+        'invitations': [
+            {
+                'id': membership.household.id,
+                'name': membership.household.name,
+                'relationship': membership.relationship
+            }
+            for membership in memberships if not membership.accepted_at
+        ]
+    })
+
+@csrf_exempt
+def create_household(request):
+    if request.method != 'POST':
+        return invalid_method()
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    data = json_object(request)
+    if data is None:
+        return invalid_json()
+    name = str(data.get('name') or '').strip()
+    if not name:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'A household name is required'
+        }, status=400)
+
+    with transaction.atomic():
+        household = Household.objects.create(name=name[:100], created_by=request.user)
+        HouseholdMember.objects.create(household=household, user=request.user, role='admin', accepted_at=timezone.now())
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Household created successfully',
+        'household': {'id': household.id, 'name': household.name}
+    })
+
+@csrf_exempt
+def add_household_member(request, household_id):
+    if request.method != 'POST':
+        return invalid_method()
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    if not HouseholdMember.objects.filter(
+        household_id=household_id, user=request.user, role='admin', accepted_at__isnull=False
+    ).exists():
+        return household_not_found()
+    data = json_object(request)
+    if data is None:
+        return invalid_json()
+    try:
+        user = User.objects.get(username=str(data.get('username') or ''))
+    except User.DoesNotExist:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'User not found'
+        }, status=404)
+
+    if HouseholdMember.objects.filter(household_id=household_id).count() >= MAX_MEMBERS:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'A household can have at most {MAX_MEMBERS} members'
+        }, status=400)
+    # Only an invitation: the user's data stays hidden until they accept
+    member, created = HouseholdMember.objects.get_or_create(
+        household_id=household_id,
+        user=user,
+        defaults={'relationship': str(data.get('relationship') or '')[:50]}
+    )
+    if created:
+        message = 'Invitation sent'
+    else:
+        message = 'Already a member' if member.accepted_at else 'Already invited'
+    return JsonResponse({
+        'status': 'success',
+        'message': message,
+        'member': {
+            'user_id': user.id,
+            'username': user.username,
+            'relationship': member.relationship,
+            'accepted': member.accepted_at is not None
+        }
+    })
+
+@csrf_exempt
+def accept_household_invitation(request, household_id):
+    if request.method != 'POST':
+        return invalid_method()
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    accepted = HouseholdMember.objects.filter(
+        household_id=household_id, user=request.user, accepted_at__isnull=True
+    ).update(accepted_at=timezone.now())
+    if not accepted:
+        return invitation_not_found()
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Invitation accepted'
+    })
+
+@csrf_exempt
+def decline_household_invitation(request, household_id):
+    if request.method != 'POST':
+        return invalid_method()
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    declined, _ = HouseholdMember.objects.filter(
+        household_id=household_id, user=request.user, accepted_at__isnull=True
+    ).delete()
+    if not declined:
+        return invitation_not_found()
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Invitation declined'
+    })
+
+def household_dashboard(request, household_id):
+    if not request.user.is_authenticated:
+        return authentication_required()
+
+    household = household_for(request.user, household_id)
+    if household is None:
+        return household_not_found()
+
+    return JsonResponse({
+        'status': 'success',
+        'household': {'id': household.id, 'name': household.name},
+        'members': [member_json(member) for member in dashboard_members(household)]
+    })
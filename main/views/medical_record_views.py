@@ -1,13 +1,20 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
+from django.db import IntegrityError, transaction
 from django.shortcuts import render
-from ..models import MedicalReport, ReportAnalysis
-from ..ai_analysis import analyze_medical_report
+from ..models import MedicalReport, ReportAnalysis, AnalysisJob
+from ..analysis_queue import enqueue_analysis
+from ..health_summary import report_added
+from ..report_uploads import UploadTooLarge, install_upload_handler, save_upload
+from ..report_anchoring import report_proof
+from ..report_previews import derivative_urls, generate_derivatives
+from ..report_listing import InvalidCursor, related_or_none, remember_anonymous_report, report_page, visible_reports
+from ..report_search import search_reports
 import os
 from datetime import datetime
-from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 
 def index(request):
     return render(request, 'main/index.html')
@@ -16,57 +23,82 @@ def index(request):
 def upload_report(request):
     if request.method == 'POST':
         try:
+            # Hash the file and enforce the size limit while the body is parsed
+            upload_handler = install_upload_handler(request)
             file = request.FILES.get('report')
+            if upload_handler.too_large or 'report' in upload_handler.rejected:
+                raise UploadTooLarge(upload_handler.max_size)
             if not file:
                 return JsonResponse({
                     'status': 'error',
                     'message': 'No file uploaded'
                 }, status=400)
 
-            # Generate a unique filename
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             file_extension = os.path.splitext(file.name)[1].lower()
-            filename = f'reports/{timestamp}{file_extension}'
-            
-            # Save the file using default_storage
-            file_path = default_storage.save(filename, ContentFile(file.read()))
+            user = request.user if request.user.is_authenticated else None
             
-            # Create report object
-            report = MedicalReport.objects.create(
-                title=f"Report_{timestamp}",
-                report_type='pdf' if file_extension == '.pdf' else 'image',
-                file=file_path
+            # Stream the file to its content-addressed path; identical bytes
+            # are stored once
+            file_path, sha256, size, created = save_upload(
+                file, file_extension, upload_handler.digests.get('report')
             )
             
-            # Get the full file path
-            full_file_path = os.path.join(settings.MEDIA_ROOT, file_path)
+            # Re-uploading the same file returns the existing report
+            report = MedicalReport.objects.filter(user=user, content_hash=sha256).first()
+            duplicate = report is not None
+            if not duplicate:
+                try:
+                    with transaction.atomic():
+                        # Create report object
+                        report = MedicalReport.objects.create(
+                            user=user,
+                            title=f"Report_{timestamp}",
+                            report_type='pdf' if file_extension == '.pdf' else 'image',
+                            file=file_path,
+                            content_hash=sha256
+                        )
+                        report_added(report)
+                except IntegrityError:
+                    # The same file was uploaded concurrently
+                    report = MedicalReport.objects.get(user=user, content_hash=sha256)
+                    duplicate = True
             
-            # Analyze the report using AI
-            analysis_result = analyze_medical_report(full_file_path)
+            if user is None:
+                remember_anonymous_report(request.session, report.id)
             
-            # Create analysis object
-            analysis = ReportAnalysis.objects.create(
-                report=report,
-                analysis_text=analysis_result['analysis_text'],
-                health_tips=analysis_result['health_tips'],
-                yoga_suggestions=analysis_result['yoga_suggestions']
-            )
+            job = AnalysisJob.objects.filter(report=report).first()
+            if job is None:
+                # Reuses the analysis of identical bytes when there is one
+                job = enqueue_analysis(report)
+            
+            if duplicate:
+                message = 'Report already uploaded'
+            elif job.status == 'done':
+                message = 'Report uploaded'
+            else:
+                message = 'Report uploaded, analysis pending'
             
             return JsonResponse({
                 'status': 'success',
-                'message': 'Report uploaded and analyzed successfully',
+                'message': message,
                 'report_id': report.id,
                 'file_url': report.file.url if report.file else None,
-                'analysis': {
-                    'text': analysis.analysis_text,
-                    'health_tips': analysis.health_tips,
-                    'yoga_suggestions': analysis.yoga_suggestions
-                }
+                'sha256': sha256,
+                'size': size,
+                'duplicate': duplicate,
+                'analysis_status': 'pending' if job.status == 'running' else job.status,
+                **derivative_urls(report)
             })
             
+        except UploadTooLarge as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=413)
         except Exception as e:
-            # Clean up the uploaded file if analysis fails
-            if 'file_path' in locals():
+            # Clean up the uploaded file if the upload fails
+            if locals().get('created'):
                 default_storage.delete(file_path)
             
             return JsonResponse({
@@ -81,16 +113,18 @@ def upload_report(request):
 
 def get_report_analysis(request, report_id):
     try:
-        report = MedicalReport.objects.get(id=report_id)
+        report = visible_reports(request).get(id=report_id)
         analysis = ReportAnalysis.objects.get(report=report)
         
         return JsonResponse({
             'status': 'success',
+            'analysis_status': 'done',
             'analysis': {
                 'text': analysis.analysis_text,
                 'health_tips': analysis.health_tips,
                 'yoga_suggestions': analysis.yoga_suggestions
-            }
+            },
+            **derivative_urls(report)
         })
     except MedicalReport.DoesNotExist:
         return JsonResponse({
@@ -98,7 +132,168 @@ def get_report_analysis(request, report_id):
             'message': 'Report not found'
         }, status=404)
     except ReportAnalysis.DoesNotExist:
+        pass
+
+    job = AnalysisJob.objects.filter(report=report).only('status', 'last_error').first()
+    if job is None:
         return JsonResponse({
             'status': 'error',
             'message': 'Analysis not found'
-        }, status=404) 
\ No newline at end of file
+        }, status=404)
+    
+    if job.status == 'failed':
+        return JsonResponse({
+            'status': 'error',
+            'analysis_status': 'failed',
+            'message': 'Analysis failed',
+            'details': job.last_error
+        })
+    
+    # Queued, running or waiting to be retried
+    return JsonResponse({
+        'status': 'pending',
+        'analysis_status': 'pending',
+        'message': 'Analysis in progress'
+    }, status=202)
+
+def get_report_anchor(request, report_id):
+    report = visible_reports(request).filter(id=report_id).only('id', 'content_hash').first()
+    if report is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Report not found'
+        }, status=404)
+
+    return JsonResponse({
+        'status': 'success',
+        'anchor': report_proof(report)
+    })
+
+def list_reports(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    
+    try:
+        limit = int(request.GET.get('limit', 20))
+        include_analysis = request.GET.get('include') == 'analysis'
+        reports, next_cursor = report_page(
+            request.user, request.GET.get('cursor'), limit, include_analysis
+        )
+    except (ValueError, InvalidCursor) as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+    
+    items = []
+    for report in reports:
+        analysis = related_or_none(report, 'reportanalysis')
+        job = related_or_none(report, 'analysisjob')
+        if analysis is not None:
+            analysis_status = 'done'
+        elif job is not None and job.status == 'failed':
+            analysis_status = 'failed'
+        else:
+            analysis_status = 'pending'
+        
+        item = {
+            'id': report.id,
+            'title': report.title,
+            'report_type': report.report_type,
+            'uploaded_at': report.uploaded_at.isoformat(),
+            'file_url': report.file.url if report.file else None,
+            'analysis_status': analysis_status,
+            **derivative_urls(report)
+        }
+        if include_analysis and analysis is not None:
+            item['analysis'] = {
+                'text': analysis.analysis_text,
+                'health_tips': analysis.health_tips,
+                'yoga_suggestions': analysis.yoga_suggestions
+            }
+        items.append(item)
+    
+    return JsonResponse({
+        'status': 'success',
+        'reports': items,
+        'next_cursor': next_cursor
+    })
+
+def search_report_analyses(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'No search query provided'
+        }, status=400)
+    
+    try:
+        page = int(request.GET.get('page', 1))
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid page or limit'
+        }, status=400)
+    
+    results, has_next = search_reports(request.user, query, page, limit)
+    return JsonResponse({
+        'status': 'success',
+        'results': [
+            {
+                'report_id': report.id,
+                'title': report.title,
+                'uploaded_at': report.uploaded_at.isoformat(),
+                'rank': rank,
+                'snippet': snippet,
+                **derivative_urls(report)
+            }
+            for report, rank, snippet in results
+        ],
+        'page': page,
+        'has_next': has_next
+    })
+
+def derivative_etag(request, report_id, size):
+    report = visible_reports(request).filter(id=report_id).only('content_hash', 'file').first()
+    if report is None:
+        return None
+    return f"{report.content_hash or report.file.name}-{size}"
+
+@etag(derivative_etag)
+def get_report_derivative(request, report_id, size):
+    if size not in settings.REPORT_PREVIEWS['SIZES']:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Unknown preview size'
+        }, status=404)
+    
+    try:
+        report = visible_reports(request).only('file').get(id=report_id)
+        # Rendered on first request, then served from storage
+        path = generate_derivatives(report.file.name)[size]
+    except MedicalReport.DoesNotExist:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Report not found'
+        }, status=404)
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Preview not available: {str(e)}'
+        }, status=404)
+    
+    response = FileResponse(default_storage.open(path, 'rb'), content_type='image/webp')
+    # The original never changes, so neither does its preview; a medical
+    # document is only for the browser's own cache, never a shared one
+    response['Cache-Control'] = f"private, max-age={settings.REPORT_PREVIEWS['CACHE_MAX_AGE']}, immutable"
+    return response
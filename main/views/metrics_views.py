@@ -0,0 +1,17 @@
+from django.http import JsonResponse
+from .. import metrics
+from ..ai_cache import get_response_cache
+from ..alert_events import get_broker
+from ..alert_fanout import alert_slo_stats
+from ..analysis_queue import analysis_source_stats, queue_stats
+
+def get_metrics(request):
+    return JsonResponse({
+        'status': 'success',
+        'metrics': metrics.snapshot(),
+        'ai_cache': get_response_cache().stats(),
+        'analysis_queue': queue_stats(),
+        'report_analysis': analysis_source_stats(),
+        'emergency_alerts': alert_slo_stats(),
+        'emergency_alert_streams': get_broker().stats()
+    })
@@ -1,5 +1,41 @@
+const crypto = require("crypto");
 const MedicalRecord = artifacts.require("MedicalRecord");
 
+// The tree main/report_anchoring.py builds: sha256 leaves and sorted-pair nodes
+const sha256 = (...parts) => crypto.createHash("sha256").update(Buffer.concat(parts)).digest();
+const merkleLeaf = contentHash => sha256(Buffer.from([0]), contentHash);
+const merkleParent = (a, b) => Buffer.compare(a, b) <= 0
+  ? sha256(Buffer.from([1]), a, b)
+  : sha256(Buffer.from([1]), b, a);
+const toHex = buffer => "0x" + buffer.toString("hex");
+
+function merkleTree(contentHashes) {
+  const levels = [contentHashes.map(merkleLeaf)];
+  while (levels[levels.length - 1].length > 1) {
+    const level = levels[levels.length - 1];
+    const parents = [];
+    for (let i = 0; i + 1 < level.length; i += 2) {
+      parents.push(merkleParent(level[i], level[i + 1]));
+    }
+    if (level.length % 2) {
+      parents.push(level[level.length - 1]);
+    }
+    levels.push(parents);
+  }
+  return levels;
+}
+
+function merkleProof(levels, index) {
+  const proof = [];
+  for (const level of levels.slice(0, -1)) {
+    if ((index ^ 1) < level.length) {
+      proof.push(toHex(level[index ^ 1]));
+    }
+    index = Math.floor(index / 2);
+  }
+  return proof;
+}
+
 contract("MedicalRecord", accounts => {
   let medicalRecord;
   const owner = accounts[0];
@@ -39,4 +75,56 @@ contract("MedicalRecord", accounts => {
     const isValid = await medicalRecord.isRecordValid(patientId, reportHash);
     assert.equal(isValid, false, "Record should be invalid");
   });
-}); 
\ No newline at end of file
+
+  describe("anchoring", () => {
+    const contentHashes = ["report-1", "report-2", "report-3", "report-4", "report-5"]
+      .map(name => sha256(Buffer.from(name)));
+    const levels = merkleTree(contentHashes);
+    const root = toHex(levels[levels.length - 1][0]);
+
+    it("should anchor a Merkle root", async () => {
+      const result = await medicalRecord.anchorRoot(root, contentHashes.length, { from: owner });
+      assert.equal(result.logs[0].event, "RootAnchored", "RootAnchored wasn't emitted");
+
+      const anchor = await medicalRecord.getAnchor(root);
+      assert.equal(anchor.leafCount.toNumber(), contentHashes.length, "Leaf count doesn't match");
+      assert.isAbove(anchor.timestamp.toNumber(), 0, "Anchor should have a timestamp");
+    });
+
+    it("should reject a root anchored twice", async () => {
+      await medicalRecord.anchorRoot(root, contentHashes.length, { from: owner });
+      try {
+        await medicalRecord.anchorRoot(root, contentHashes.length, { from: owner });
+        assert.fail("Anchoring the same root twice should revert");
+      } catch (error) {
+        assert.include(error.message, "Root already anchored");
+      }
+    });
+
+    it("should only let the owner anchor", async () => {
+      try {
+        await medicalRecord.anchorRoot(root, contentHashes.length, { from: accounts[1] });
+        assert.fail("Anchoring from another account should revert");
+      } catch (error) {
+        assert.include(error.message, "Only owner can perform this action");
+      }
+    });
+
+    it("should verify inclusion proofs of every report", async () => {
+      await medicalRecord.anchorRoot(root, contentHashes.length, { from: owner });
+      for (let i = 0; i < contentHashes.length; i++) {
+        const included = await medicalRecord.verifyInclusion(root, toHex(contentHashes[i]), merkleProof(levels, i));
+        assert.equal(included, true, `Proof of report ${i} should verify`);
+      }
+
+      const other = toHex(sha256(Buffer.from("report-6")));
+      const included = await medicalRecord.verifyInclusion(root, other, merkleProof(levels, 0));
+      assert.equal(included, false, "A report outside the batch shouldn't verify");
+    });
+
+    it("should not verify proofs against a root that isn't anchored", async () => {
+      const included = await medicalRecord.verifyInclusion(root, toHex(contentHashes[0]), merkleProof(levels, 0));
+      assert.equal(included, false, "Proofs against an unanchored root shouldn't verify");
+    });
+  });
+});